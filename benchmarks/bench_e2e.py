@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""End-to-end throughput benchmark: the real bot driven by the fake Telegram client.
+
+``telethon.TelegramClient`` is replaced by ``FakeTelegramClient`` before
+``bot`` is imported, with all paths pointing at a temporary directory; the
+app from ``bot.create_app()`` is started inside the benchmark's loop. Then
+N chats x M files are "forwarded" to the bot at once and we wait until every
+download has reached a final state. Reported:
+
+- files completed/failed, bytes written, wall time, throughput, chunks
+  handled per second (each chunk is a trip through the event loop);
+- event-loop lag (p50/p99/max from a 10 ms probe);
+- Telegram RPCs issued by the bot: sends, edits, deletes, get_messages;
+- peak RSS (and peak Python heap with ``--tracemalloc``);
+- with ``--sessions N`` / ``--processes N``, transfers handled by each extra
+  download session / worker process (worker processes get the same
+  simulated network).
+
+Network behaviour is configurable (per-transfer and session bandwidth, chunk
+latency, stalls, FloodWait, errors), so scheduler/dashboard changes can be
+compared in CI without credentials or network.
+
+Usage::
+
+    python benchmarks/bench_e2e.py [--chats 4] [--files 10] [--audio-mb 8] [--video-mb 64] \\
+        [--video-ratio 0.2] [--bandwidth-mbps 0] [--session-mbps 0] [--chunk-latency-ms 0] \\
+        [--stall-rate 0] [--flood-rate 0] [--error-rate 0] [--concurrency 3] [--sessions 0] [--processes 0] \\
+        [--loop asyncio|uvloop] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_telegram import FakeNetwork, FakeTelegramClient, install_network  # noqa: E402
+
+FINAL_STATES = {"completed", "failed", "cancelled"}
+
+
+def load_bot(workdir: str, env: dict):
+    """Import bot.py (no side effects) wired to the fake client and a scratch directory."""
+    import telethon
+
+    for sub in ("Music", "Video", "Download", "cache", "logs"):
+        os.makedirs(os.path.join(workdir, sub), exist_ok=True)
+    os.environ.update(
+        {
+            "API_ID": "1",
+            "API_HASH": "bench",
+            "BOT_TOKEN": "1:bench",
+            "MUSIC_PATH": os.path.join(workdir, "Music"),
+            "VIDEO_PATH": os.path.join(workdir, "Video"),
+            "DOWNLOAD_PATH": os.path.join(workdir, "Download"),
+            "CACHE_PATH": os.path.join(workdir, "cache"),
+            "LOG_DIR": os.path.join(workdir, "logs"),
+        }
+    )
+    os.environ.update(env)
+    telethon.TelegramClient = FakeTelegramClient  # type: ignore[misc]
+    import bot  # noqa: E402
+
+    return bot
+
+
+def create_app(bot):
+    """Build the app (logging, env check) with console logging quieted."""
+    app = bot.create_app()
+    # 控制台只保留警告，INFO 日志仍写入 workdir/logs
+    if bot.log_queue is not None:
+        for h in bot.log_queue.handlers:
+            if type(h) is logging.StreamHandler:
+                h.setLevel(logging.WARNING)
+    return app
+
+
+async def _lag_probe(stop: asyncio.Event, out: list, interval: float = 0.01) -> None:
+    # perf_counter rather than loop.time(): uvloop's clock has 1 ms resolution
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        out.append(max(0.0, time.perf_counter() - t - interval))
+
+
+def _pct(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def _cancel_pending() -> None:
+    # 面板兜底刷新、延迟移除等后台任务在 app.stop() 后仍在等待：事件循环关闭前取消并等它们结束
+    current = asyncio.current_task()
+    pending = [t for t in asyncio.all_tasks() if t is not current]
+    for t in pending:
+        t.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def run_workload(bot, args) -> dict:
+    app = create_app(bot)
+    client = await app.start()
+    try:
+        return await _run_jobs(bot, client, args)
+    finally:
+        await app.stop()
+        await _cancel_pending()
+
+
+async def _run_jobs(bot, client, args) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_lag_probe(stop, lags))
+
+    n_video = int(round(args.files * args.video_ratio))
+    jobs = []
+    for c in range(args.chats):
+        chat_id = 1000 + c
+        for i in range(args.files):
+            if i < n_video:
+                msg = client.make_file(
+                    chat_id, f"Show{c}.S01E{i + 1:02d}.WEB-DL.mkv", args.video_mb << 20, kind="video"
+                )
+            else:
+                msg = client.make_file(
+                    chat_id,
+                    f"track_{c}_{i}.flac",
+                    args.audio_mb << 20,
+                    kind="audio",
+                    title=f"Track {c}-{i}",
+                    performer=f"Artist {c}",
+                )
+            jobs.append(msg)
+
+    t0 = time.perf_counter()
+    dispatch = [client.dispatch_message(m, is_private=True) for m in jobs]
+    await asyncio.gather(*dispatch)
+
+    # 等待所有下载进入终态
+    expected = len(jobs)
+    seen: dict = {}
+    while True:
+        for did, it in list(bot.active_downloads.items()):
+            seen[did] = it
+        finished = sum(1 for it in seen.values() if it.get("state") in FINAL_STATES)
+        if len(seen) >= expected and finished >= expected:
+            break
+        if time.perf_counter() - t0 > args.timeout:
+            print(f"timeout: {finished}/{expected} finished", file=sys.stderr)
+            break
+        await asyncio.sleep(0.05)
+    wall = time.perf_counter() - t0
+    stop.set()
+    await probe
+    sessions = {st["name"]: st["transfers"] for st in bot.process_pool.stats() + bot.session_pool.stats()}
+
+    states: dict = {}
+    nbytes = 0
+    for it in seen.values():
+        st = it.get("state")
+        states[st] = states.get(st, 0) + 1
+        if st == "completed":
+            nbytes += int(it.get("file_size", 0) or 0)
+
+    return {
+        "jobs": expected,
+        "states": states,
+        "bytes": nbytes,
+        "wall_s": round(wall, 3),
+        "throughput_mb_s": round(nbytes / wall / (1 << 20), 2) if wall > 0 else 0.0,
+        "chunks_per_s": round(client.stats.chunks / wall) if wall > 0 else 0,
+        "loop": type(asyncio.get_running_loop()).__module__.split(".")[0],
+        "loop_lag_ms": {
+            "p50": round(_pct(lags, 0.5) * 1000, 2),
+            "p99": round(_pct(lags, 0.99) * 1000, 2),
+            "max": round(max(lags, default=0.0) * 1000, 2),
+        },
+        "rpc": client.stats.to_dict(),
+        "sessions": sessions,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--chats", type=int, default=4)
+    ap.add_argument("--files", type=int, default=10, help="files per chat")
+    ap.add_argument("--audio-mb", type=int, default=8)
+    ap.add_argument("--video-mb", type=int, default=64)
+    ap.add_argument("--video-ratio", type=float, default=0.2)
+    ap.add_argument("--chunk-kb", type=int, default=128)
+    ap.add_argument("--bandwidth-mbps", type=float, default=0.0, help="per transfer, MB/s (0 = unlimited)")
+    ap.add_argument("--session-mbps", type=float, default=0.0, help="whole session, MB/s (0 = unlimited)")
+    ap.add_argument("--chunk-latency-ms", type=float, default=0.0)
+    ap.add_argument("--rpc-latency-ms", type=float, default=0.0)
+    ap.add_argument("--stall-rate", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--flood-rate", type=float, default=0.0)
+    ap.add_argument("--concurrency", type=int, default=3)
+    ap.add_argument("--sessions", type=int, default=0, help="extra download sessions (DOWNLOAD_SESSIONS)")
+    ap.add_argument("--processes", type=int, default=0, help="download worker processes (DOWNLOAD_WORKER_PROCESSES)")
+    ap.add_argument("--loop", default="asyncio", help="event loop via the bot's EVENT_LOOP option: asyncio, uvloop, auto")
+    ap.add_argument("--stall-timeout", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=600.0)
+    ap.add_argument("--workdir", default=None, help="scratch directory (default: a new temp dir)")
+    ap.add_argument("--tracemalloc", action="store_true")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args()
+
+    FakeTelegramClient.network = FakeNetwork(
+        chunk_size=args.chunk_kb * 1024,
+        chunk_latency_s=args.chunk_latency_ms / 1000.0,
+        bandwidth_bps=args.bandwidth_mbps * (1 << 20),
+        session_bandwidth_bps=args.session_mbps * (1 << 20),
+        stall_rate=args.stall_rate,
+        error_rate=args.error_rate,
+        flood_rate=args.flood_rate,
+        rpc_latency_s=args.rpc_latency_ms / 1000.0,
+    )
+    workdir = args.workdir or tempfile.mkdtemp(prefix="teleflux-e2e-")
+    bot = load_bot(
+        workdir,
+        {
+            "MAX_CONCURRENT_DOWNLOADS": str(args.concurrency),
+            "DOWNLOAD_STALL_TIMEOUT_S": str(args.stall_timeout),
+            "DOWNLOAD_SESSIONS": str(args.sessions),
+            "DOWNLOAD_WORKER_PROCESSES": str(args.processes),
+            "EVENT_LOOP": args.loop,
+        },
+    )
+    bot.process_pool.initializer = install_network
+    bot.process_pool.initargs = (replace(FakeTelegramClient.network, messages={}),)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    with asyncio.Runner(loop_factory=bot._loop_factory()) as runner:
+        result = runner.run(run_workload(bot, args))
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    if args.tracemalloc:
+        result["peak_heap_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+    if bot.log_queue is not None:
+        bot.log_queue.stop()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    print(f"jobs: {result['jobs']}  states: {result['states']}")
+    print(
+        f"bytes: {result['bytes'] / (1 << 20):.0f} MB  wall: {result['wall_s']:.2f}s"
+        f"  throughput: {result['throughput_mb_s']:.1f} MB/s  chunks/s: {result['chunks_per_s']}"
+    )
+    lag = result["loop_lag_ms"]
+    print(f"loop ({result['loop']}) lag: p50 {lag['p50']} ms  p99 {lag['p99']} ms  max {lag['max']} ms")
+    rpc = result["rpc"]
+    print(
+        f"rpc: sends {rpc['sends']}  edits {rpc['edits']}  deletes {rpc['deletes']}"
+        f"  get_messages {rpc['get_messages']}  floodwaits {rpc['floods']}"
+    )
+    if result["sessions"]:
+        print("sessions: " + "  ".join(f"{k} {v}" for k, v in result["sessions"].items()))
+    mem = f"peak rss: {result['peak_rss_mb']} MB"
+    if "peak_heap_mb" in result:
+        mem += f"  peak heap: {result['peak_heap_mb']} MB"
+    print(mem)
+
+
+if __name__ == "__main__":
+    main()
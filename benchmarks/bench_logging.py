@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: event-loop time spent in logging, direct handlers vs. queue handler.
+
+Concurrent coroutines emit the log lines the download hot path produces
+(task start/finish, DC line, completion) with the bot's formatter, a
+``RotatingFileHandler`` and a stream handler. We measure the loop-thread time
+spent inside ``logger.info`` calls, the wall time of the run and the loop lag
+seen by a probe.
+
+- direct: handlers attached to the root logger (previous setup);
+- queue: ``QueueLogging`` (bounded queue + listener thread).
+
+``--write-delay-ms`` adds a sleep to every file write to mimic a slow NAS
+mount. ``--dir`` points the log file at a real volume.
+
+Usage::
+
+    python benchmarks/bench_logging.py [--records 20000] [--tasks 50] [--write-delay-ms 0] [--dir /tmp]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queue_logging import QueueLogging  # noqa: E402
+
+
+class SlowRotatingFileHandler(RotatingFileHandler):
+    def __init__(self, *args, delay_s: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay_s = delay_s
+
+    def emit(self, record):
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        super().emit(record)
+
+
+def _handlers(path: str, delay_s: float):
+    fmt = logging.Formatter(
+        fmt="%(asctime)s | %(name)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    sh = logging.StreamHandler(io.StringIO())
+    sh.setFormatter(fmt)
+    fh = SlowRotatingFileHandler(
+        path, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8", delay_s=delay_s
+    )
+    fh.setFormatter(fmt)
+    return [sh, fh]
+
+
+async def _workload(log: logging.Logger, records: int, tasks: int) -> float:
+    """Return loop-thread seconds spent inside logging calls."""
+    spent = 0.0
+    per_task = max(1, records // (tasks * 4))
+
+    async def one(i: int) -> None:
+        nonlocal spent
+        for j in range(per_task):
+            t0 = time.perf_counter()
+            log.info("任务开始：chat_id=%s 当前任务数=%s", i, j)
+            log.info("下载目标 DC：chat_id=%s download_id=%s dc_id=%s", i, j, 4)
+            log.info("恢复下载从 %s 字节: %s", j * 131072, f"file_{i}_{j}.flac")
+            log.info("任务结束：chat_id=%s 剩余任务数=%s", i, j)
+            spent += time.perf_counter() - t0
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(one(i) for i in range(tasks)))
+    return spent
+
+
+async def _lag_probe(stop: asyncio.Event, out: list) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        t = loop.time()
+        await asyncio.sleep(0.005)
+        out.append(max(0.0, loop.time() - t - 0.005))
+
+
+async def _run(mode: str, args, path: str) -> dict:
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    handlers = _handlers(path, args.write_delay_ms / 1000.0)
+    ql = None
+    if mode == "direct":
+        root.setLevel(logging.INFO)
+        for h in handlers:
+            root.addHandler(h)
+    else:
+        ql = QueueLogging(handlers, queue_size=args.queue_size).start()
+
+    log = logging.getLogger("bench")
+    lags: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_lag_probe(stop, lags))
+    t0 = time.perf_counter()
+    spent = await _workload(log, args.records, args.tasks)
+    wall = time.perf_counter() - t0
+    stop.set()
+    await probe
+
+    t1 = time.perf_counter()
+    if ql is not None:
+        ql.stop()
+    else:
+        for h in handlers:
+            root.removeHandler(h)
+    drain = time.perf_counter() - t1
+    for h in handlers:
+        h.close()
+    lags.sort()
+    return {
+        "spent": spent,
+        "wall": wall,
+        "drain": drain,
+        "lag_p99": lags[int(len(lags) * 0.99)] if lags else 0.0,
+        "lag_max": lags[-1] if lags else 0.0,
+        "dropped": ql.dropped if ql is not None else 0,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--records", type=int, default=20000)
+    ap.add_argument("--tasks", type=int, default=50)
+    ap.add_argument("--write-delay-ms", type=float, default=0.0)
+    ap.add_argument("--queue-size", type=int, default=10000)
+    ap.add_argument("--dir", default=None)
+    args = ap.parse_args()
+
+    base = args.dir or tempfile.mkdtemp(prefix="teleflux-bench-")
+    print(f"records: {args.records}  tasks: {args.tasks}  write delay: {args.write_delay_ms} ms")
+    results = {}
+    for mode in ("direct", "queue"):
+        path = os.path.join(base, f"bench-{mode}.log")
+        results[mode] = asyncio.run(_run(mode, args, path))
+        r = results[mode]
+        print(
+            f"{mode:6}  loop time in logging {r['spent'] * 1000:8.1f} ms"
+            f"  ({r['spent'] / args.records * 1e6:6.2f} us/record)"
+            f"  wall {r['wall'] * 1000:8.1f} ms  lag p99 {r['lag_p99'] * 1000:6.1f} ms"
+            f"  max {r['lag_max'] * 1000:6.1f} ms  drain {r['drain'] * 1000:7.1f} ms"
+            f"  dropped {r['dropped']}"
+        )
+    saved = results["direct"]["spent"] - results["queue"]["spent"]
+    print(f"loop time saved: {saved * 1000:.1f} ms ({saved / max(results['direct']['spent'], 1e-9) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
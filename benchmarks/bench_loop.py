@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Event loop comparison: standard asyncio vs uvloop at 10/50/200 concurrent transfers.
+
+Runs ``bench_e2e.py`` (the real download and dashboard paths driven by the
+fake client) once per loop implementation and transfer count, each in a
+fresh interpreter, selecting the loop through the bot's ``EVENT_LOOP``
+option. All transfers get a concurrency slot. Two runs per cell:
+
+- paced: every transfer is bandwidth-limited so that all of them overlap
+  for a couple of seconds; reports event loop lag (p50/p99/max from a
+  10 ms probe) under that steady load;
+- unpaced: no bandwidth limit, so the loop itself is the bottleneck;
+  reports chunks handled per second (each chunk is at least one callback on
+  the loop) and throughput.
+
+uvloop rows are skipped when uvloop is not installed.
+
+Usage::
+
+    python benchmarks/bench_loop.py [--transfers 10,50,200] [--file-mb 4] [--bandwidth-mbps 2] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _run(loop: str, transfers: int, args, bandwidth_mbps: float) -> dict:
+    chats = max(1, transfers // 10)
+    files = math.ceil(transfers / chats)
+    cmd = [
+        sys.executable, os.path.join(HERE, "bench_e2e.py"), "--json",
+        "--loop", loop,
+        "--chats", str(chats),
+        "--files", str(files),
+        "--video-ratio", "0",
+        "--audio-mb", str(args.file_mb),
+        "--chunk-kb", str(args.chunk_kb),
+        "--bandwidth-mbps", str(bandwidth_mbps),
+        "--concurrency", str(chats * files),
+        "--workdir", tempfile.mkdtemp(prefix="teleflux-loop-"),
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--transfers", default="10,50,200", help="comma-separated concurrent transfer counts")
+    ap.add_argument("--file-mb", type=int, default=4)
+    ap.add_argument("--chunk-kb", type=int, default=64)
+    ap.add_argument("--bandwidth-mbps", type=float, default=2.0, help="per transfer, MB/s")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args()
+
+    loops = ["asyncio"]
+    if importlib.util.find_spec("uvloop") is not None:
+        loops.append("uvloop")
+    rows = []
+    for n in (int(x) for x in args.transfers.split(",") if x.strip()):
+        for loop in loops:
+            paced = _run(loop, n, args, args.bandwidth_mbps)
+            free = _run(loop, n, args, 0.0)
+            rows.append(
+                {
+                    "transfers": n,
+                    "loop": paced["loop"],
+                    "lag_p50_ms": paced["loop_lag_ms"]["p50"],
+                    "lag_p99_ms": paced["loop_lag_ms"]["p99"],
+                    "lag_max_ms": paced["loop_lag_ms"]["max"],
+                    "chunks_per_s": free["chunks_per_s"],
+                    "throughput_mb_s": free["throughput_mb_s"],
+                    "states": {"paced": paced["states"], "unpaced": free["states"]},
+                }
+            )
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False))
+        return
+    if len(loops) == 1:
+        print("uvloop is not installed; showing asyncio only")
+    print(f"{'':>19}{'paced: loop lag (ms)':^28}  {'unpaced':^18}")
+    print(f"{'transfers':>9}  {'loop':<8} {'p50':>8} {'p99':>8} {'max':>8}  {'chunks/s':>9} {'MB/s':>8}")
+    for r in rows:
+        print(
+            f"{r['transfers']:>9}  {r['loop']:<8} {r['lag_p50_ms']:>8.2f} {r['lag_p99_ms']:>8.2f}"
+            f" {r['lag_max_ms']:>8.2f}  {r['chunks_per_s']:>9} {r['throughput_mb_s']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: legacy per-call regex naming vs. the precompiled NamingRules engine.
+
+Runs both implementations over a caption/filename corpus (JSON lines with
+``filename`` and ``caption``; default ``benchmarks/naming_corpus.jsonl``)
+and reports the time per item plus any output differences.
+
+Usage::
+
+    python benchmarks/bench_naming.py [--corpus path.jsonl] [--rounds 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from naming_rules import NamingRules  # noqa: E402
+
+
+# ---- legacy implementations (as they were in bot.py) ----
+
+_LEGACY_AD_PATTERNS = [
+    r"@\w+",
+    r"www\.[\w\.]+",
+    r"http[s]?://\S+",
+    r"[\u4e00-\u9fa5]*广告[\u4e00-\u9fa5]*",
+    r"[\u4e00-\u9fa5]*推广[\u4e00-\u9fa5]*",
+    r"[\u4e00-\u9fa5]*官网[\u4e00-\u9fa5]*",
+    r"\[.*?\]",
+    r"\(.*?\)",
+    r"VIP",
+    r"高清",
+    r"超清",
+    r"蓝光",
+    r"HD",
+    r"4K",
+    r"1080[pP]",
+    r"720[pP]",
+]
+
+
+def legacy_clean(name: str) -> str:
+    for pattern in _LEGACY_AD_PATTERNS:
+        name = re.sub(pattern, "", name, flags=re.IGNORECASE)
+    name = re.sub(r"([_-])\d{8,}$", "", name)
+    name = re.sub(r"[^\w\u4e00-\u9fa5\-_\s\.]", "", name)
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def legacy_looks_like_music(text: str) -> bool:
+    if not text:
+        return False
+    t = text.strip()
+    if not t:
+        return False
+    markers = [
+        "歌曲", "歌名", "曲名", "专辑", "音乐id", "网易云音乐", "kbps", "via @music_v1bot",
+        "#flac", "#mp3", "#m4a", "#wav", "#ogg", "#aac", "#alac", "#ape",
+    ]
+    tl = t.lower()
+    hit = 0
+    for m in markers:
+        if m.lower() in tl:
+            hit += 1
+    return hit >= 2
+
+
+def legacy_extract_audio_title(text: str) -> str:
+    if not text:
+        return ""
+    import re
+
+    lines = [ln.strip() for ln in text.replace("\r", "").split("\n") if ln.strip()]
+    patterns = [
+        re.compile(r"^(歌曲|歌名|曲名|曲目)\s*[:：]\s*(.+)$"),
+        re.compile(r"^(Song|Title)\s*[:：]\s*(.+)$", re.IGNORECASE),
+    ]
+    for ln in lines:
+        for p in patterns:
+            m = p.match(ln)
+            if m:
+                return (m.group(2) or "").strip()
+    if lines:
+        first = lines[0]
+        bad = ["专辑", "大小", "音乐ID", "via", "kbps", "MB", "#网易云音乐", "网易云音乐"]
+        if " - " in first and not any(b in first for b in bad):
+            return first.strip()
+    return ""
+
+
+def legacy_extract_audio_ext(text: str) -> str:
+    if not text:
+        return ""
+    import re
+
+    m = re.search(r"#\s*(flac|mp3|m4a|wav|ogg|aac|alac|ape)\b", text, re.IGNORECASE)
+    if m:
+        return "." + m.group(1).lower()
+    return ""
+
+
+def legacy_pipeline(filename: str, caption: str) -> tuple:
+    return (
+        legacy_clean(os.path.splitext(filename)[0]),
+        legacy_looks_like_music(caption),
+        legacy_extract_audio_title(caption),
+        legacy_extract_audio_ext(caption),
+    )
+
+
+def engine_pipeline(rules: NamingRules, filename: str, caption: str) -> tuple:
+    return (
+        rules.clean(os.path.splitext(filename)[0]),
+        rules.looks_like_music(caption),
+        rules.extract_audio_title(caption),
+        rules.extract_audio_ext(caption),
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--corpus", default=os.path.join(ROOT, "benchmarks", "naming_corpus.jsonl"))
+    ap.add_argument("--rounds", type=int, default=2000)
+    args = ap.parse_args()
+
+    corpus = []
+    with open(args.corpus, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                d = json.loads(line)
+                corpus.append((d.get("filename", ""), d.get("caption", "")))
+
+    rules = NamingRules()
+
+    diffs = [
+        (fn, legacy_pipeline(fn, cap), engine_pipeline(rules, fn, cap))
+        for fn, cap in corpus
+        if legacy_pipeline(fn, cap) != engine_pipeline(rules, fn, cap)
+    ]
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for fn, cap in corpus:
+            legacy_pipeline(fn, cap)
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for fn, cap in corpus:
+            engine_pipeline(rules, fn, cap)
+    engine_s = time.perf_counter() - t0
+
+    n = args.rounds * len(corpus)
+    print(f"corpus: {len(corpus)} items x {args.rounds} rounds")
+    print(f"legacy  {legacy_s / n * 1e6:7.2f} us/item")
+    print(f"engine  {engine_s / n * 1e6:7.2f} us/item  (x{legacy_s / max(engine_s, 1e-9):.2f})")
+    print(f"output differences: {len(diffs)}")
+    for fn, old, new in diffs:
+        print(f"  {fn!r}\n    legacy: {old}\n    engine: {new}")
+
+
+if __name__ == "__main__":
+    main()
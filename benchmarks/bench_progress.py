@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: per-chunk progress overhead, legacy callback vs. counter + sampler.
+
+A stand-in client delivers chunks as fast as the loop allows (no network, no
+disk), invoking ``progress_callback`` the way Telethon's ``download_media``
+does. We compare CPU time per GB for:
+
+- legacy: the previous async callback (clock reads, speed/ETA math and
+  formatting, pause check, throttled dashboard call) on every chunk;
+- sampler: ``TransferProgress`` (counter store) + one shared
+  ``ProgressSampler`` doing rate estimation and stall bookkeeping.
+
+Usage::
+
+    python benchmarks/bench_progress.py [--downloads 8] [--mb 256] [--chunk-kb 128]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import inspect
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progress_sampler import ProgressSampler, TransferProgress  # noqa: E402
+from rate_estimator import RateTracker  # noqa: E402
+
+
+class StandInClient:
+    """Mimics the part of TelegramClient.download_media that drives progress."""
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.chunk = b"\0" * chunk_size
+
+    async def download_media(self, media, file, progress_callback=None):
+        size = int(media)
+        done = 0
+        n = 0
+        while done < size:
+            done += self.chunk_size
+            n += 1
+            if progress_callback:
+                r = progress_callback(done, size)
+                if inspect.isawaitable(r):
+                    await r
+            if n % 8 == 0:
+                # Telethon yields on every network read; yield now and then.
+                await asyncio.sleep(0)
+
+
+async def _noop_dashboard(chat_id: int) -> None:
+    return None
+
+
+async def run_legacy(client: StandInClient, downloads: int, size: int) -> None:
+    async def one(i: int):
+        info = {"downloaded": 0, "paused": False, "state": "queued"}
+        file_size = size
+        last_update_ts = 0.0
+        last_bytes = 0
+        last_ts = time.time()
+        last_progress_mono = time.monotonic()
+        last_progress_bytes = 0
+
+        async def progress_callback(current, total):
+            nonlocal last_update_ts, last_bytes, last_ts, last_progress_mono, last_progress_bytes
+            downloaded = int(current)
+            info["downloaded"] = downloaded
+            last_progress_mono = time.monotonic()
+            last_progress_bytes = downloaded
+            while info.get("paused", False):
+                await asyncio.sleep(0.5)
+            info["state"] = "downloading"
+            now = time.time()
+            dt = max(now - last_ts, 1e-6)
+            speed_bps = (downloaded - last_bytes) / dt
+            last_bytes = downloaded
+            last_ts = now
+            if speed_bps <= 0:
+                info["speed_str"] = "-"
+                info["eta_str"] = "-"
+            else:
+                speed_mb = speed_bps / (1024 * 1024)
+                info["speed_str"] = (
+                    f"{speed_mb:.2f} MB/s" if speed_mb >= 1 else f"{(speed_bps/1024):.1f} KB/s"
+                )
+                eta = max(file_size - downloaded, 0) / speed_bps
+                if eta < 60:
+                    info["eta_str"] = f"{int(eta)}秒"
+                elif eta < 3600:
+                    info["eta_str"] = f"{int(eta/60)}分{int(eta%60)}秒"
+                else:
+                    info["eta_str"] = f"{int(eta / 3600)}时{int((eta % 3600) / 60)}分"
+            if now - last_update_ts > 1.5:
+                last_update_ts = now
+                await _noop_dashboard(0)
+
+        await client.download_media(size, None, progress_callback=progress_callback)
+
+    await asyncio.gather(*(one(i) for i in range(downloads)))
+
+
+async def run_sampler(client: StandInClient, downloads: int, size: int, interval_s: float) -> None:
+    tracker = RateTracker()
+    sampler = ProgressSampler(interval_s=interval_s)
+
+    async def one(i: int):
+        info = {"downloaded": 0, "state": "downloading"}
+        progress = TransferProgress(0)
+        last = {"bytes": 0, "ts": time.monotonic()}
+
+        def on_sample(downloaded: int, now: float) -> None:
+            info["downloaded"] = downloaded
+            tracker.update(i, downloaded, now)
+            if downloaded != last["bytes"]:
+                last["bytes"] = downloaded
+                last["ts"] = now
+
+        tracker.start(i, 0, 0)
+        sampler.register(i, progress, on_sample)
+        try:
+            await client.download_media(size, None, progress_callback=progress)
+        finally:
+            sampler.unregister(i)
+            tracker.finish(i)
+
+    await asyncio.gather(*(one(i) for i in range(downloads)))
+
+
+def _measure(coro_factory) -> tuple[float, float]:
+    wall0 = time.perf_counter()
+    cpu0 = time.process_time()
+    asyncio.run(coro_factory())
+    return time.process_time() - cpu0, time.perf_counter() - wall0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--downloads", type=int, default=8)
+    ap.add_argument("--mb", type=int, default=256, help="size of each download in MB")
+    ap.add_argument("--chunk-kb", type=int, default=128)
+    ap.add_argument("--interval", type=float, default=0.5, help="sampler interval (s)")
+    args = ap.parse_args()
+
+    size = args.mb * 1024 * 1024
+    chunk = args.chunk_kb * 1024
+    client = StandInClient(chunk)
+    total_gb = args.downloads * size / (1024**3)
+    chunks = args.downloads * ((size + chunk - 1) // chunk)
+
+    # Baseline: delivering chunks with no progress tracking at all.
+    async def _bare():
+        await asyncio.gather(*(client.download_media(size, None) for _ in range(args.downloads)))
+
+    bare_cpu, _ = _measure(_bare)
+    legacy_cpu, legacy_wall = _measure(lambda: run_legacy(client, args.downloads, size))
+    sampler_cpu, sampler_wall = _measure(
+        lambda: run_sampler(client, args.downloads, size, args.interval)
+    )
+
+    def _row(name: str, cpu: float, wall: float) -> str:
+        over = max(cpu - bare_cpu, 0.0)
+        return (
+            f"{name:<8} cpu={cpu*1000:8.1f} ms  wall={wall*1000:8.1f} ms  "
+            f"overhead={over/total_gb*1000:7.1f} ms/GB  ({over/chunks*1e6:5.2f} us/chunk)"
+        )
+
+    print(
+        f"{args.downloads} downloads x {args.mb} MB, {args.chunk_kb} KB chunks "
+        f"({chunks} callbacks, {total_gb:.2f} GB)"
+    )
+    print(f"bare     cpu={bare_cpu*1000:8.1f} ms")
+    print(_row("legacy", legacy_cpu, legacy_wall))
+    print(_row("sampler", sampler_cpu, sampler_wall))
+    saved = max(legacy_cpu - sampler_cpu, 0.0) / total_gb
+    print(f"CPU saved by sampler: {saved*1000:.1f} ms per GB downloaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Startup benchmark: import, app creation, start and time to first message handled.
+
+Each run is a fresh interpreter (so module import is measured cold), with
+``telethon.TelegramClient`` replaced by ``FakeTelegramClient`` and all paths
+in a temporary directory. Phases:
+
+- import: ``import bot`` (Telethon is imported beforehand to patch it); must
+  not touch disk or network, which the run checks;
+- create_app: logging setup and environment validation;
+- start: ``await app.start()``; connect/login (``--connect-ms`` of simulated
+  latency), library directory checks, naming rules and name index warm-up
+  run concurrently, so ``start`` should be close to ``settings + max(...)``
+  rather than their sum;
+- first message: a ``/start`` command is dispatched as soon as ``start()``
+  returns; reported from interpreter start until its handler has replied.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--runs 5] [--connect-ms 300] [--library-files 2000] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+T0 = time.perf_counter()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+PHASES = ("import", "create_app", "start", "first_message")
+APP_TIMINGS = ("settings", "connect", "library")
+
+
+def _child(args) -> None:
+    import asyncio
+    import logging
+
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    from fake_telegram import FakeNetwork, FakeTelegramClient
+
+    workdir = args.workdir
+    os.environ.update(
+        {
+            "API_ID": "1",
+            "API_HASH": "bench",
+            "BOT_TOKEN": "1:bench",
+            "MUSIC_PATH": os.path.join(workdir, "Music"),
+            "VIDEO_PATH": os.path.join(workdir, "Video"),
+            "DOWNLOAD_PATH": os.path.join(workdir, "Download"),
+            "CACHE_PATH": os.path.join(workdir, "cache"),
+            "LOG_DIR": os.path.join(workdir, "logs"),
+        }
+    )
+    FakeTelegramClient.network = FakeNetwork(connect_latency_s=args.connect_ms / 1000.0)
+    import telethon
+
+    telethon.TelegramClient = FakeTelegramClient  # type: ignore[misc]
+
+    out = {}
+    t = time.perf_counter()
+    import bot
+
+    out["import"] = time.perf_counter() - t
+    if os.path.isdir(os.path.join(workdir, "cache")):
+        raise SystemExit("import bot created the cache directory")
+
+    t = time.perf_counter()
+    app = bot.create_app()
+    out["create_app"] = time.perf_counter() - t
+    for h in bot.log_queue.handlers:
+        if type(h) is logging.StreamHandler:
+            h.setLevel(logging.WARNING)
+
+    async def run() -> None:
+        t = time.perf_counter()
+        client = await app.start()
+        out["start"] = time.perf_counter() - t
+        await client.dispatch_message(client.make_text(1000, "/start"), is_private=True)
+        out["first_message"] = time.perf_counter() - T0
+        out["replies"] = client.stats.sends
+        await app.stop()
+
+    asyncio.run(run())
+    for key in APP_TIMINGS:
+        out[key] = app.timings.get(key, 0.0)
+    bot.log_queue.stop()
+    print(json.dumps(out))
+
+
+def _populate(workdir: str, files: int) -> None:
+    for sub in ("Music", "Video", "Download"):
+        d = os.path.join(workdir, sub)
+        os.makedirs(d, exist_ok=True)
+        for i in range(files // 3):
+            open(os.path.join(d, f"existing_{i:05d}.flac"), "wb").close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--connect-ms", type=float, default=300.0, help="simulated connect + login latency")
+    ap.add_argument("--library-files", type=int, default=2000, help="files pre-created in the library dirs")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--workdir", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    runs = []
+    for _ in range(max(1, args.runs)):
+        workdir = tempfile.mkdtemp(prefix="teleflux-startup-")
+        _populate(workdir, args.library_files)
+        proc = subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__), "--child",
+                "--workdir", workdir, "--connect-ms", str(args.connect_ms),
+            ],
+            capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    result = {
+        key: round(statistics.median(r[key] for r in runs) * 1000, 1)
+        for key in PHASES + APP_TIMINGS
+    }
+    result["serial_ms"] = round(sum(result[k] for k in APP_TIMINGS), 1)
+    result["runs"] = len(runs)
+
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"runs: {len(runs)}  connect latency: {args.connect_ms:.0f} ms  library files: {args.library_files}")
+    print(
+        f"import {result['import']:.1f} ms  create_app {result['create_app']:.1f} ms"
+        f"  start {result['start']:.1f} ms  first message {result['first_message']:.1f} ms (from process start)"
+    )
+    print(
+        f"start phases: settings {result['settings']:.1f} ms  connect {result['connect']:.1f} ms"
+        f"  library {result['library']:.1f} ms  (serial sum {result['serial_ms']:.1f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: TaskManager start/finish churn (lock + task per chat vs. loop timers).
+
+Also checks the debounce semantics both implementations must share, including
+the races around a task starting while a cleanup is pending or running.
+
+Usage::
+
+    python benchmarks/bench_task_manager.py [--chats 2000] [--cycles 20] [--delay 0.05]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import DefaultDict, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_manager import RefreshCallback, TaskManager  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+class LegacyTaskManager:
+    """Previous implementation: global asyncio.Lock + one sleeping task per idle chat."""
+
+    def __init__(self, refresh_ui: Optional[RefreshCallback] = None, *, cleanup_delay_s: float = 5.0):
+        self._lock = asyncio.Lock()
+        self._active: DefaultDict[int, int] = defaultdict(int)
+        self._cleanup_tasks: Dict[int, asyncio.Task] = {}
+
+        self.refresh_ui: Optional[RefreshCallback] = refresh_ui
+        self.cleanup_delay_s = float(cleanup_delay_s)
+
+    async def snapshot(self) -> dict:
+        """Get a snapshot of current task counts for status reporting."""
+        async with self._lock:
+            active = dict(self._active)
+            pending_cleanup = sorted(
+                [cid for cid, t in self._cleanup_tasks.items() if t and not t.done()]
+            )
+
+        return {
+            "active": active,
+            "pending_cleanup": pending_cleanup,
+            "cleanup_delay_s": self.cleanup_delay_s,
+        }
+
+    async def task_started(self, chat_id: int) -> None:
+        """Must be called before/when a task is scheduled for a chat."""
+        async with self._lock:
+            self._active[chat_id] += 1
+            # New work arrived: cancel any pending cleanup.
+            t = self._cleanup_tasks.pop(chat_id, None)
+            if t and not t.done():
+                t.cancel()
+
+    async def task_finished(self, chat_id: int) -> int:
+        """Must be called when a task reaches a terminal state.
+
+        Returns
+        -------
+        int
+            Remaining active task count for this chat.
+        """
+        async with self._lock:
+            self._active[chat_id] -= 1
+            if self._active[chat_id] < 0:
+                self._active[chat_id] = 0
+            remaining = self._active[chat_id]
+
+            # Schedule delayed cleanup only when chat becomes idle.
+            if remaining == 0:
+                # Replace any pending task (shouldn't exist if counts are correct).
+                old = self._cleanup_tasks.pop(chat_id, None)
+                if old and not old.done():
+                    old.cancel()
+                self._cleanup_tasks[chat_id] = asyncio.create_task(self._delayed_cleanup(chat_id))
+
+            return remaining
+
+    async def _delayed_cleanup(self, chat_id: int) -> None:
+        try:
+            await asyncio.sleep(self.cleanup_delay_s)
+
+            async with self._lock:
+                # Double-check: only cleanup if still idle.
+                if self._active.get(chat_id, 0) != 0:
+                    return
+
+            if self.refresh_ui is not None:
+                await self.refresh_ui(chat_id, True)
+        except asyncio.CancelledError:
+            # Expected when new tasks arrive during the debounce window.
+            return
+        finally:
+            # Remove bookkeeping entry if it still points to this task.
+            cur = asyncio.current_task()
+            async with self._lock:
+                if self._cleanup_tasks.get(chat_id) is cur:
+                    self._cleanup_tasks.pop(chat_id, None)
+
+
+async def verify_semantics(cls) -> None:
+    calls = []
+
+    async def refresh(chat_id: int, is_cleanup: bool) -> None:
+        calls.append(chat_id)
+        await asyncio.sleep(0.05)
+        calls.append(-chat_id)
+
+    tm = cls(refresh, cleanup_delay_s=0.05)
+
+    # 1) Idle for the full delay -> exactly one cleanup.
+    await tm.task_started(1)
+    await tm.task_finished(1)
+    await asyncio.sleep(0.15)
+    assert calls == [1, -1], calls
+
+    # 2) New task during the delay window cancels the cleanup.
+    calls.clear()
+    await tm.task_started(2)
+    await tm.task_finished(2)
+    await asyncio.sleep(0.02)
+    await tm.task_started(2)
+    await asyncio.sleep(0.1)
+    assert calls == [], calls
+    snap = await tm.snapshot()
+    assert snap["active"].get(2) == 1 and 2 not in snap["pending_cleanup"], snap
+
+    # 3) Cancelled cleanup re-arms when the chat goes idle again.
+    await tm.task_finished(2)
+    await asyncio.sleep(0.15)
+    assert calls == [2, -2], calls
+
+    # 4) New task while refresh_ui is running cancels the running cleanup.
+    calls.clear()
+    await tm.task_started(3)
+    await tm.task_finished(3)
+    await asyncio.sleep(0.07)
+    assert calls == [3], calls
+    await tm.task_started(3)
+    await asyncio.sleep(0.1)
+    assert calls == [3], calls
+    snap = await tm.snapshot()
+    assert snap["pending_cleanup"] == [], snap
+
+    # 5) Extra finish never drives the count negative.
+    assert await tm.task_finished(3) == 0
+    assert await tm.task_finished(3) == 0
+    await asyncio.sleep(0.15)
+
+
+async def churn(cls, chats: int, cycles: int, delay: float) -> tuple:
+    cleanups = 0
+
+    async def refresh(chat_id: int, is_cleanup: bool) -> None:
+        nonlocal cleanups
+        cleanups += 1
+
+    tm = cls(refresh, cleanup_delay_s=delay)
+    peak_tasks = 0
+    t0 = time.perf_counter()
+    for _ in range(cycles):
+        for cid in range(chats):
+            await tm.task_started(cid)
+        for cid in range(chats):
+            await tm.task_finished(cid)
+        peak_tasks = max(peak_tasks, len(asyncio.all_tasks()))
+        # Let part of the debounce window pass so cancellations are exercised.
+        await asyncio.sleep(delay / 4)
+    elapsed = time.perf_counter() - t0
+    await asyncio.sleep(delay * 2)
+    return elapsed, peak_tasks, cleanups
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--chats", type=int, default=2000)
+    ap.add_argument("--cycles", type=int, default=20)
+    ap.add_argument("--delay", type=float, default=0.05)
+    args = ap.parse_args()
+
+    for cls in (LegacyTaskManager, TaskManager):
+        asyncio.run(verify_semantics(cls))
+        print(f"{cls.__name__:<18} debounce semantics OK")
+
+    ops = args.chats * args.cycles * 2
+    print(f"churn: {args.chats} chats x {args.cycles} cycles ({ops} start/finish calls)")
+    for cls in (LegacyTaskManager, TaskManager):
+        elapsed, peak, cleanups = asyncio.run(churn(cls, args.chats, args.cycles, args.delay))
+        print(
+            f"{cls.__name__:<18} {elapsed*1000:8.1f} ms  {elapsed/ops*1e6:6.2f} us/op  "
+            f"peak tasks={peak:<6} cleanups={cleanups}"
+        )
+
+
+if __name__ == "__main__":
+    main()
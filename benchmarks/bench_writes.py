@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Write path: chunk-by-chunk writes vs write coalescing (``write_buffer``).
+
+Writes ``--mb`` MB to a file in ``--dir`` in chunks the size Telethon
+delivers (128 and 512 KB by default):
+
+- ``per-chunk``: one ``write()`` per chunk (the previous ``.downloading``
+  write path);
+- ``coalesced NMB``: through :class:`write_buffer.CoalescingWriter` with
+  N MB buffers from a shared :class:`write_buffer.BufferPool`.
+
+Reports ``write()`` syscalls (counted on the raw file) and throughput.
+Point ``--dir`` at a NAS mount to measure the real effect. On local disks
+the page cache absorbs small writes, and ``--latency-us`` adds a fixed cost
+per syscall to model a network file system round trip. ``--fsync``
+includes the final ``fsync`` in the timing.
+
+Usage::
+
+    python benchmarks/bench_writes.py [--dir /mnt/nas/tmp] [--mb 256] [--chunk-kb 128,512]
+        [--buffer-mb 4,16] [--latency-us 0] [--fsync] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from write_buffer import BufferPool, CoalescingWriter  # noqa: E402
+
+
+class _CountingFile:
+    """Unbuffered file that counts write() calls and optionally adds latency."""
+
+    def __init__(self, path: str, latency_s: float):
+        self.f = open(path, "wb", buffering=0)
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def write(self, data) -> int:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self.f.write(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def _run(path: str, total: int, chunk: bytes, pool, latency_s: float, fsync: bool) -> dict:
+    raw = _CountingFile(path, latency_s)
+    f = CoalescingWriter(raw, pool) if pool is not None else raw
+    t0 = time.perf_counter()
+    written = 0
+    view = memoryview(chunk)
+    while written < total:
+        n = min(len(chunk), total - written)
+        f.write(view[:n])
+        written += n
+    f.flush()
+    if fsync:
+        os.fsync(raw.f.fileno())
+    dt = time.perf_counter() - t0
+    f.close()
+    assert os.path.getsize(path) == total
+    os.remove(path)
+    return {"syscalls": raw.calls, "throughput_mb_s": round(total / dt / 1e6, 1), "seconds": round(dt, 3)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--dir", default=None, help="directory to write in (default: a temp dir)")
+    ap.add_argument("--mb", type=int, default=256)
+    ap.add_argument("--chunk-kb", default="128,512", help="comma-separated chunk sizes")
+    ap.add_argument("--buffer-mb", default="4,16", help="comma-separated coalescing buffer sizes")
+    ap.add_argument("--latency-us", type=float, default=0.0, help="extra cost per write() syscall")
+    ap.add_argument("--fsync", action="store_true", help="fsync at the end (inside the timing)")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args()
+
+    workdir = args.dir or tempfile.mkdtemp(prefix="teleflux-writes-")
+    path = os.path.join(workdir, "bench.downloading")
+    total = args.mb * 1024 * 1024
+    latency_s = args.latency_us / 1e6
+    rows = []
+    for chunk_kb in (int(x) for x in args.chunk_kb.split(",") if x.strip()):
+        chunk = os.urandom(chunk_kb * 1024)
+        rows.append({"chunk_kb": chunk_kb, "mode": "per-chunk", **_run(path, total, chunk, None, latency_s, args.fsync)})
+        for buffer_mb in (int(x) for x in args.buffer_mb.split(",") if x.strip()):
+            pool = BufferPool(buffer_mb * 1024 * 1024, 1)
+            res = _run(path, total, chunk, pool, latency_s, args.fsync)
+            rows.append({"chunk_kb": chunk_kb, "mode": f"coalesced {buffer_mb}MB", **res})
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False))
+        return
+    print(f"{args.mb} MB to {workdir}, latency/syscall {args.latency_us:g} us, fsync {'on' if args.fsync else 'off'}")
+    print(f"{'chunk':>7}  {'mode':<16} {'syscalls':>9} {'MB/s':>9} {'s':>8}")
+    for r in rows:
+        print(
+            f"{r['chunk_kb']:>5}KB  {r['mode']:<16} {r['syscalls']:>9} {r['throughput_mb_s']:>9.1f} {r['seconds']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the parts of Telethon's TelegramClient that TeleFlux uses.
+
+No network and no credentials: "downloads" are generated bytes paced by a
+configurable per-chunk latency and bandwidth, so the whole bot (event
+handlers, naming, scheduling, dashboard, disk writes) can be driven end to end
+in a benchmark.
+
+Covered surface:
+
+- ``TelegramClient(session, api_id, api_hash, proxy=...)`` (several
+  instances act as separate sessions, each with its own session bandwidth,
+  e.g. the bot's extra download sessions), ``start()``,
+  ``loop``, ``on(builder)``, ``add_event_handler()``,
+  ``run_until_disconnected()``, ``connect()``, ``disconnect()``, ``set_proxy()``;
+- ``download_media(media, file=..., progress_callback=...)`` and
+  ``iter_download(media, offset=...)``;
+- ``get_messages(chat, ids=...)`` / ``get_messages(chat, limit=..., offset_id=...)``;
+- ``send_message(chat, text, buttons=..., file=...)``, plus ``edit`` and
+  ``delete`` on the returned messages;
+- event dispatch: :meth:`FakeTelegramClient.dispatch_message` (NewMessage)
+  and :meth:`FakeTelegramClient.dispatch_callback` (CallbackQuery).
+
+Fault injection (:class:`FakeNetwork`): per-transfer bandwidth, an aggregate
+per-session bandwidth cap, per-chunk latency, stalls (a transfer stops
+delivering data), FloodWait on edits/sends and RPC errors during downloads.
+Fake messages use real ``telethon.tl.types`` document attributes, so naming
+and type detection run unmodified.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telethon import events
+from telethon.errors import FloodWaitError, RPCError
+from telethon.tl.types import DocumentAttributeAudio, DocumentAttributeFilename, DocumentAttributeVideo
+
+
+@dataclass
+class FakeNetwork:
+    """Knobs for simulated transfers and RPCs."""
+
+    chunk_size: int = 128 * 1024
+    chunk_latency_s: float = 0.0
+    # Per-transfer bandwidth (bytes/s, 0 = unlimited)
+    bandwidth_bps: float = 0.0
+    # Aggregate bandwidth of the session (bytes/s, 0 = unlimited)
+    session_bandwidth_bps: float = 0.0
+    # Probability that a transfer stalls (stops delivering data) half-way
+    stall_rate: float = 0.0
+    # Probability that a transfer fails with an RPC error half-way
+    error_rate: float = 0.0
+    # Probability that an edit / send raises FloodWait, and its duration
+    flood_rate: float = 0.0
+    flood_seconds: int = 1
+    # Latency of message RPCs (send/edit/delete/get_messages)
+    rpc_latency_s: float = 0.0
+    # Time start() takes to "connect and log in"
+    connect_latency_s: float = 0.0
+    seed: int = 1
+    # "Server side" chat history (chat_id -> id -> message), shared by every
+    # session, so extra download sessions can fetch messages the bot received
+    messages: Dict[int, Dict[int, Any]] = field(default_factory=dict)
+
+
+@dataclass
+class FakeStats:
+    sends: int = 0
+    edits: int = 0
+    deletes: int = 0
+    get_messages: int = 0
+    floods: int = 0
+    downloads: int = 0
+    bytes_served: int = 0
+    stalls: int = 0
+    errors: int = 0
+    chunks: int = 0
+    connects: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+class _File:
+    def __init__(self, size: int, name: Optional[str]):
+        self.size = size
+        self.name = name
+
+
+class _Document:
+    def __init__(self, doc_id: int, size: int, mime_type: str, attributes: list, dc_id: int):
+        self.id = doc_id
+        self.size = size
+        self.mime_type = mime_type
+        self.attributes = attributes
+        self.dc_id = dc_id
+
+
+class _Media:
+    def __init__(self, document: _Document):
+        self.document = document
+
+
+class FakeMessage:
+    """Message as TeleFlux sees it (incoming files/text and the bot's own messages)."""
+
+    def __init__(
+        self,
+        client: "FakeTelegramClient",
+        chat_id: int,
+        msg_id: int,
+        text: str = "",
+        *,
+        sender_id: Optional[int] = None,
+        media: Optional[_Media] = None,
+        reply_to_msg_id: Optional[int] = None,
+        buttons: Any = None,
+    ):
+        self._client = client
+        self.chat_id = chat_id
+        self.id = msg_id
+        self.message = text
+        self.raw_text = text
+        self.sender_id = sender_id
+        self.media = media
+        self.reply_to_msg_id = reply_to_msg_id
+        self.buttons = buttons
+        self.date = datetime.now(tz=timezone.utc)
+        doc = media.document if media is not None else None
+        name = None
+        if doc is not None:
+            for a in doc.attributes:
+                if isinstance(a, DocumentAttributeFilename):
+                    name = a.file_name
+        self.file = _File(doc.size, name) if doc is not None else None
+        self.deleted = False
+
+    async def edit(self, text: str, buttons: Any = None, **kwargs) -> "FakeMessage":
+        await self._client._rpc("edit")
+        self.message = self.raw_text = text
+        self.buttons = buttons
+        return self
+
+    async def delete(self) -> None:
+        await self._client._rpc("delete", flood=False)
+        self.deleted = True
+        self._client._forget(self)
+
+
+class _Event:
+    def __init__(self, client: "FakeTelegramClient", chat_id: int, sender_id: int, is_private: bool):
+        self.client = client
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.is_private = is_private
+
+    async def respond(self, text: str = "", buttons: Any = None, file: Any = None, **kwargs):
+        return await self.client.send_message(self.chat_id, text, buttons=buttons, file=file)
+
+
+class FakeNewMessageEvent(_Event):
+    def __init__(self, client, message: FakeMessage, is_private: bool):
+        super().__init__(client, message.chat_id, message.sender_id or 0, is_private)
+        self.message = message
+        self.raw_text = message.raw_text
+
+
+class FakeCallbackEvent(_Event):
+    def __init__(self, client, chat_id: int, sender_id: int, data: bytes, message: FakeMessage, is_private: bool):
+        super().__init__(client, chat_id, sender_id, is_private)
+        self.data = data
+        self.message = message
+        self.answers: List[str] = []
+
+    async def answer(self, text: str = "", alert: bool = False, **kwargs) -> None:
+        self.answers.append(text)
+
+    async def edit(self, text: str, buttons: Any = None, **kwargs):
+        return await self.message.edit(text, buttons=buttons)
+
+
+def install_network(network: FakeNetwork) -> None:
+    """Use ``network`` for every client of this process (initializer for worker processes)."""
+    FakeTelegramClient.network = network
+
+
+class FakeTelegramClient:
+    """Drop-in for ``telethon.TelegramClient`` in benchmarks (see module docstring)."""
+
+    # Set before the bot creates its client; every instance shares it.
+    network = FakeNetwork()
+
+    def __init__(self, session: Any = None, api_id: Any = None, api_hash: Any = None, **kwargs):
+        self.session = session
+        self.proxy = kwargs.get("proxy")
+        self.net = type(self).network
+        self.stats = FakeStats()
+        self._rng = random.Random(self.net.seed)
+        self._handlers: List[Tuple[Any, Callable]] = []
+        self._messages: Dict[int, Dict[int, FakeMessage]] = self.net.messages
+        self._ids = itertools.count(1)
+        self._doc_ids = itertools.count(1000)
+        self._bw_next = 0.0
+        self._disconnected: Optional[asyncio.Event] = None
+        self.connected = False
+        self.bot_token: Optional[str] = None
+
+    # ----- lifecycle -----
+
+    def start(self, bot_token: Optional[str] = None, **kwargs):
+        """Like Telethon: a coroutine inside a running loop, otherwise run to completion."""
+        coro = self._start(bot_token)
+        if self.loop.is_running():
+            return coro
+        return self.loop.run_until_complete(coro)
+
+    async def _start(self, bot_token: Optional[str]) -> "FakeTelegramClient":
+        if self.net.connect_latency_s > 0:
+            await asyncio.sleep(self.net.connect_latency_s)
+        self.bot_token = bot_token
+        self.connected = True
+        return self
+
+    async def connect(self) -> None:
+        if self.net.connect_latency_s > 0:
+            await asyncio.sleep(self.net.connect_latency_s)
+        self.connected = True
+        self.stats.connects += 1
+
+    def set_proxy(self, proxy: Any) -> None:
+        self.proxy = proxy
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.get_event_loop()
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def disconnect(self) -> None:
+        self.connected = False
+        if self._disconnected is not None:
+            self._disconnected.set()
+
+    async def _wait_disconnected(self) -> None:
+        self._disconnected = asyncio.Event()
+        if not self.connected:
+            return
+        await self._disconnected.wait()
+
+    def run_until_disconnected(self):
+        if self.loop.is_running():
+            return self._wait_disconnected()
+        return self.loop.run_until_complete(self._wait_disconnected())
+
+    # ----- handlers / dispatch -----
+
+    def on(self, builder):
+        if inspect.isclass(builder):
+            builder = builder()
+
+        def decorator(fn):
+            self._handlers.append((builder, fn))
+            return fn
+
+        return decorator
+
+    def add_event_handler(self, fn, builder=None) -> None:
+        self.on(builder or events.Raw)(fn)
+
+    def _store(self, msg: FakeMessage) -> None:
+        self._messages.setdefault(msg.chat_id, {})[msg.id] = msg
+
+    def _forget(self, msg: FakeMessage) -> None:
+        self._messages.get(msg.chat_id, {}).pop(msg.id, None)
+
+    async def _run_handlers(self, kind, event, text: Optional[str]) -> None:
+        for builder, fn in list(self._handlers):
+            if not isinstance(builder, kind):
+                continue
+            pattern = getattr(builder, "pattern", None)
+            if pattern is not None:
+                target = text if kind is events.NewMessage else event.data
+                if target is None or not pattern(target):
+                    continue
+            try:
+                await fn(event)
+            except events.StopPropagation:
+                break
+
+    def dispatch_message(self, message: FakeMessage, *, is_private: bool = True) -> asyncio.Task:
+        """Deliver a NewMessage update (each update runs in its own task, like Telethon)."""
+        self._store(message)
+        ev = FakeNewMessageEvent(self, message, is_private)
+        return asyncio.get_running_loop().create_task(
+            self._run_handlers(events.NewMessage, ev, message.raw_text)
+        )
+
+    def dispatch_callback(
+        self, chat_id: int, message: FakeMessage, data: str, *, sender_id: int = 1, is_private: bool = True
+    ) -> asyncio.Task:
+        ev = FakeCallbackEvent(self, chat_id, sender_id, data.encode("utf-8"), message, is_private)
+        return asyncio.get_running_loop().create_task(
+            self._run_handlers(events.CallbackQuery, ev, None)
+        )
+
+    # ----- message factories -----
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def make_text(self, chat_id: int, text: str, *, sender_id: int = 1) -> FakeMessage:
+        return FakeMessage(self, chat_id, self.next_id(), text, sender_id=sender_id)
+
+    def make_file(
+        self,
+        chat_id: int,
+        file_name: str,
+        size: int,
+        *,
+        kind: str = "document",
+        caption: str = "",
+        sender_id: int = 1,
+        mime_type: Optional[str] = None,
+        title: Optional[str] = None,
+        performer: Optional[str] = None,
+        dc_id: int = 4,
+    ) -> FakeMessage:
+        attrs: list = [DocumentAttributeFilename(file_name=file_name)]
+        if kind == "audio":
+            attrs.append(DocumentAttributeAudio(duration=180, title=title, performer=performer))
+            mime_type = mime_type or "audio/flac"
+        elif kind == "video":
+            attrs.append(DocumentAttributeVideo(duration=1200, w=1920, h=1080))
+            mime_type = mime_type or "video/mp4"
+        doc = _Document(next(self._doc_ids), int(size), mime_type or "application/octet-stream", attrs, dc_id)
+        return FakeMessage(
+            self, chat_id, self.next_id(), caption, sender_id=sender_id, media=_Media(doc)
+        )
+
+    # ----- RPCs -----
+
+    async def _rpc(self, op: str, *, flood: bool = True) -> None:
+        if self.net.rpc_latency_s:
+            await asyncio.sleep(self.net.rpc_latency_s)
+        if flood and self.net.flood_rate and self._rng.random() < self.net.flood_rate:
+            self.stats.floods += 1
+            raise FloodWaitError(request=None, capture=self.net.flood_seconds)
+        if op == "edit":
+            self.stats.edits += 1
+        elif op == "send":
+            self.stats.sends += 1
+        elif op == "delete":
+            self.stats.deletes += 1
+
+    async def send_message(self, entity: int, message: str = "", buttons: Any = None, file: Any = None, **kwargs):
+        await self._rpc("send")
+        msg = FakeMessage(self, int(entity), self.next_id(), message, sender_id=0, buttons=buttons)
+        self._store(msg)
+        return msg
+
+    async def send_file(self, entity: int, file: Any, caption: str = "", **kwargs):
+        return await self.send_message(entity, caption, file=file)
+
+    async def get_messages(self, entity: int, limit: Optional[int] = None, *, ids: Any = None, offset_id: int = 0, **kwargs):
+        await self._rpc("get_messages", flood=False)
+        self.stats.get_messages += 1
+        chat = self._messages.get(int(entity), {})
+        if ids is not None:
+            if isinstance(ids, (list, tuple)):
+                return [chat.get(int(i)) for i in ids]
+            return chat.get(int(ids))
+        older = sorted((m for mid, m in chat.items() if not offset_id or mid < offset_id), key=lambda m: -m.id)
+        return older[: limit or 1]
+
+    # ----- transfers -----
+
+    async def _pace(self, n: int, started: float, served: int) -> None:
+        net = self.net
+        delay = net.chunk_latency_s
+        loop_now = time.monotonic()
+        if net.bandwidth_bps:
+            # 单个传输的带宽：按累计字节计算应到达时间
+            due = started + (served + n) / net.bandwidth_bps
+            delay = max(delay, due - loop_now)
+        if net.session_bandwidth_bps:
+            self._bw_next = max(self._bw_next, loop_now) + n / net.session_bandwidth_bps
+            delay = max(delay, self._bw_next - loop_now)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            # 真实下载在每次网络读取时都会让出事件循环
+            await asyncio.sleep(0)
+
+    async def _chunks(self, media: Any, offset: int = 0):
+        doc = getattr(media, "document", media)
+        size = int(getattr(doc, "size", 0) or 0)
+        net = self.net
+        stall_at = error_at = None
+        if net.stall_rate and self._rng.random() < net.stall_rate:
+            stall_at = size // 2
+        elif net.error_rate and self._rng.random() < net.error_rate:
+            error_at = size // 2
+        self.stats.downloads += 1
+        chunk = b"\0" * net.chunk_size
+        pos = offset
+        started = time.monotonic()
+        served = 0
+        while pos < size:
+            if stall_at is not None and pos >= stall_at:
+                self.stats.stalls += 1
+                await asyncio.Event().wait()  # 永不返回：交给卡住检测处理
+            if error_at is not None and pos >= error_at:
+                self.stats.errors += 1
+                raise RPCError(request=None, message="FAKE_DOWNLOAD_ERROR", code=500)
+            n = min(net.chunk_size, size - pos)
+            await self._pace(n, started, served)
+            served += n
+            pos += n
+            self.stats.chunks += 1
+            self.stats.bytes_served += n
+            yield chunk if n == net.chunk_size else chunk[:n]
+
+    async def iter_download(self, media: Any, offset: int = 0, **kwargs):
+        async for data in self._chunks(media, offset):
+            yield data
+
+    async def download_media(self, media: Any, file: Any = None, progress_callback=None, **kwargs):
+        doc = getattr(media, "document", media)
+        total = int(getattr(doc, "size", 0) or 0)
+        done = 0
+        async for data in self._chunks(media):
+            if hasattr(file, "write"):
+                r = file.write(data)
+                if inspect.isawaitable(r):
+                    await r
+            done += len(data)
+            if progress_callback is not None:
+                # 与 Telethon 一致：写入文件对象时按 f.tell() 上报进度
+                r = progress_callback(file.tell() if hasattr(file, "write") else done, total)
+                if inspect.isawaitable(r):
+                    await r
+        if callable(getattr(file, "flush", None)):
+            file.flush()
+        return file
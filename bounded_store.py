@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Small bounded key/value store with TTL and LRU eviction.
+
+Long-running instances accumulate per-chat/per-message state (duplicate
+prompts the user never answered, "recent status" history of every chat that
+ever used the bot). :class:`BoundedTTLStore` keeps such state bounded:
+
+- every entry expires ``ttl_s`` seconds after it was last written;
+- at most ``max_items`` entries are kept; the least recently written entry is
+  evicted first;
+- :meth:`BoundedTTLStore.sweep` drops expired entries proactively and returns
+  how many were removed, so a periodic task can report evictions.
+
+Reads do not extend an entry's lifetime. Expired entries are never returned,
+even before the next sweep.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class BoundedTTLStore(Generic[K, V]):
+    """Mapping with TTL (since last write) and LRU size bound."""
+
+    def __init__(self, *, max_items: int, ttl_s: float, name: str = ""):
+        self.max_items = max(1, int(max_items))
+        self.ttl_s = float(ttl_s)
+        self.name = name
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(list(self._data.keys()))
+
+    def _expired(self, ts: float, now: float) -> bool:
+        return now - ts > self.ttl_s
+
+    def _lookup(self, key: K, now: float):
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        ts, value = item
+        if self._expired(ts, now):
+            del self._data[key]
+            self.evicted_ttl += 1
+            return _MISSING
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return self._lookup(key, time.monotonic()) is not _MISSING  # type: ignore[arg-type]
+
+    def get(self, key: K, default=None):
+        value = self._lookup(key, time.monotonic())
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: K) -> V:
+        value = self._lookup(key, time.monotonic())
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+            self.evicted_lru += 1
+
+    def touch(self, key: K) -> None:
+        """Mark ``key`` as freshly written (after mutating its value in place)."""
+        item = self._data.get(key)
+        if item is not None:
+            self[key] = item[1]
+
+    def setdefault(self, key: K, factory: Callable[[], V]) -> V:
+        """Return the live value for ``key`` or store ``factory()``; refreshes TTL/LRU."""
+        value = self._lookup(key, time.monotonic())
+        if value is _MISSING:
+            value = factory()
+        self[key] = value
+        return value
+
+    def pop(self, key: K, default=None):
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+        ts, value = item
+        if self._expired(ts, time.monotonic()):
+            self.evicted_ttl += 1
+            return default
+        return value
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop expired entries; return how many were removed."""
+        now = time.monotonic() if now is None else now
+        # Entries are ordered by last write, so expired ones are at the front.
+        removed = 0
+        while self._data:
+            key, (ts, _) = next(iter(self._data.items()))
+            if not self._expired(ts, now):
+                break
+            del self._data[key]
+            removed += 1
+        self.evicted_ttl += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "max_items": self.max_items,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+        }
@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+"""Download concurrency split into per-file-type lanes.
+
+A single limiter shared by every download lets a few multi-GB videos hold all
+slots while small audio files queue behind them. :class:`LaneLimiter` keeps
+one lane per file type (``audio``, ``video``, ``other``) with its own limit,
+an optional cap per chat, and a global ceiling on top.
+
+Lending: when a lane is at its own limit it may still start a transfer on
+capacity that the other lanes do not currently need (their running transfers
+plus waiters that their chat cap lets start, up to their limits). A lane below
+its limit always gets the next free slot before a borrower does. Borrowed
+slots return to the pool when the borrowing transfer finishes.
+
+Like the previous limiter this is a counter plus an ``asyncio.Condition``, so
+all limits can be changed while downloads are running.
+
+Preemption (:class:`PreemptionPolicy`, off by default): when a small file has
+waited longer than ``wait_s`` and no slot frees up, the largest running
+transfer that is big enough and has run for ``min_run_s`` is suspended (its
+``on_suspend`` callback pauses it at the next chunk, keeping its offset) and
+its slot is lent to the small file. When the borrower finishes the slot goes
+to the next waiting small file, or back to the suspended transfer once it has
+been suspended for ``max_suspend_s`` or nobody small is waiting. Each
+transfer is preempted at most ``max_preemptions`` times.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+LANES = ("audio", "video", "other")
+
+
+def default_lane_limits(global_limit: int) -> Dict[str, int]:
+    """Audio may use every slot; video and other leave one for audio."""
+    g = max(1, int(global_limit))
+    return {"audio": g, "video": max(1, g - 1), "other": max(1, g - 1)}
+
+
+def lane_for(file_type: str) -> str:
+    return file_type if file_type in LANES else "other"
+
+
+@dataclass
+class LaneStats:
+    limit: int
+    running: int
+    waiting: int
+    suspended: int = 0
+
+    @property
+    def borrowed(self) -> int:
+        return max(0, self.running - self.limit)
+
+
+@dataclass
+class PreemptionPolicy:
+    """When and how often large transfers give way to waiting small files."""
+
+    enabled: bool = False
+    # files up to this size may borrow a slot; transfers from this size may lend theirs
+    small_max_bytes: int = 64 << 20
+    large_min_bytes: int = 512 << 20
+    # a small file must have waited this long before a transfer is suspended for it
+    wait_s: float = 15.0
+    # anti-thrash: a transfer runs at least this long between suspensions ...
+    min_run_s: float = 60.0
+    # ... is suspended at most this many times ...
+    max_preemptions: int = 3
+    # ... and stops lending its slot to further small files after this long
+    max_suspend_s: float = 300.0
+    # transfers suspended at the same time
+    max_suspended: int = 1
+    check_interval_s: float = 1.0
+
+
+class _Slot:
+    """One transfer's claim on the limiter; ``async with`` acquires and releases it.
+
+    ``on_suspend`` / ``on_resume`` (plain callables) make the transfer
+    eligible for preemption; they must pause / resume it at a chunk boundary.
+    """
+
+    __slots__ = (
+        "limiter",
+        "lane",
+        "chat_id",
+        "size",
+        "on_suspend",
+        "on_resume",
+        "granted",
+        "since",
+        "waiting_since",
+        "suspended_since",
+        "preemptions",
+        "loaned_from",
+        "lent_to",
+    )
+
+    def __init__(
+        self,
+        limiter: "LaneLimiter",
+        lane: str,
+        chat_id: Optional[int],
+        size: int = 0,
+        on_suspend: Optional[Callable[[], None]] = None,
+        on_resume: Optional[Callable[[], None]] = None,
+    ):
+        self.limiter = limiter
+        self.lane = lane
+        self.chat_id = chat_id
+        self.size = max(0, int(size or 0))
+        self.on_suspend = on_suspend
+        self.on_resume = on_resume
+        self.granted = False
+        self.since = 0.0
+        self.waiting_since = 0.0
+        self.suspended_since: Optional[float] = None
+        self.preemptions = 0
+        # borrower: the suspended transfer whose slot it uses; lender: the borrower
+        self.loaned_from: Optional["_Slot"] = None
+        self.lent_to: Optional["_Slot"] = None
+
+    @property
+    def suspended(self) -> bool:
+        return self.suspended_since is not None
+
+    async def __aenter__(self) -> "_Slot":
+        await self.limiter._acquire_slot(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.limiter.release(self)
+
+
+class LaneLimiter:
+    """Per-lane + per-chat + global concurrency limits, adjustable at runtime.
+
+    Parameters
+    ----------
+    global_limit:
+        Ceiling on all running transfers.
+    lane_limits:
+        Own limit of each lane; missing lanes use :func:`default_lane_limits`.
+    per_chat_limit:
+        Default cap per chat (0 = no cap).
+    chat_limits:
+        Per-chat overrides of ``per_chat_limit``.
+    lending:
+        Allow busy lanes to use capacity other lanes do not need.
+    preemption:
+        Let waiting small files borrow the slot of a large transfer.
+    """
+
+    def __init__(
+        self,
+        global_limit: int,
+        lane_limits: Optional[Mapping[str, int]] = None,
+        *,
+        per_chat_limit: int = 0,
+        chat_limits: Optional[Mapping[int, int]] = None,
+        lending: bool = True,
+        preemption: Optional[PreemptionPolicy] = None,
+    ):
+        self._global = max(1, int(global_limit))
+        self._limits = default_lane_limits(self._global)
+        self._limits.update({lane_for(k): max(1, int(v)) for k, v in (lane_limits or {}).items()})
+        self._per_chat = max(0, int(per_chat_limit or 0))
+        self._chat_limits: Dict[int, int] = {int(k): max(0, int(v)) for k, v in (chat_limits or {}).items()}
+        self.lending = bool(lending)
+        self._running: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._waiting: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._chat_running: Dict[int, int] = {}
+        self._total = 0
+        self._cond = asyncio.Condition()
+        self.preemption = preemption or PreemptionPolicy()
+        self.preemptions = 0
+        self._queue: List[_Slot] = []
+        self._active: Set[_Slot] = set()
+        self._preempt_task: Optional[asyncio.Task] = None
+
+    # ----- admission -----
+
+    def chat_limit(self, chat_id: Optional[int]) -> int:
+        if chat_id is None:
+            return 0
+        return self._chat_limits.get(chat_id, self._per_chat)
+
+    def _can_start(self, lane: str, chat_id: Optional[int]) -> bool:
+        if self._total >= self._global:
+            return False
+        cap = self.chat_limit(chat_id)
+        if cap and self._chat_running.get(chat_id, 0) >= cap:
+            return False
+        if self._running[lane] < self._limits[lane]:
+            return True
+        if not self.lending:
+            return False
+        # 其他通道当前需要的容量：运行中的 + 可以启动的等待者（不超过各自上限）
+        needed = sum(
+            max(self._running[y], min(self._limits[y], self._running[y] + self._startable_waiters(y)))
+            for y in LANES
+            if y != lane
+        )
+        return self._running[lane] + needed < self._global
+
+    def _startable_waiters(self, lane: str) -> int:
+        """Waiters of ``lane`` that their chat cap would let start.
+
+        Waiters held back only by their chat's cap do not need lane capacity,
+        so they must not keep other lanes from borrowing it.
+        """
+        n = 0
+        free: Dict[Optional[int], int] = {}
+        for w in self._queue:
+            if w.lane != lane or w.granted:
+                continue
+            cap = self.chat_limit(w.chat_id)
+            if not cap:
+                n += 1
+                continue
+            left = free.get(w.chat_id)
+            if left is None:
+                left = cap - self._chat_running.get(w.chat_id, 0)
+            if left > 0:
+                n += 1
+            free[w.chat_id] = left - 1
+        return n
+
+    def _charge(self, slot: _Slot, n: int) -> None:
+        """Add ``n`` (+1/-1) to the lane and chat counters of ``slot`` (not the total)."""
+        self._running[slot.lane] = max(0, self._running[slot.lane] + n)
+        if slot.chat_id is not None:
+            c = self._chat_running.get(slot.chat_id, 0) + n
+            if c > 0:
+                self._chat_running[slot.chat_id] = c
+            else:
+                self._chat_running.pop(slot.chat_id, None)
+
+    async def _acquire_slot(self, slot: _Slot) -> None:
+        async with self._cond:
+            slot.waiting_since = time.monotonic()
+            self._queue.append(slot)
+            self._waiting[slot.lane] += 1
+            self._ensure_preempt_task()
+            try:
+                await self._cond.wait_for(lambda: slot.granted or self._can_start(slot.lane, slot.chat_id))
+            except BaseException:
+                # 取消时可能已被借出槽位：按正常释放归还
+                if slot.granted:
+                    self._release_locked(slot)
+                raise
+            finally:
+                self._waiting[slot.lane] -= 1
+                self._queue.remove(slot)
+            if not slot.granted:
+                slot.granted = True
+                self._charge(slot, 1)
+                self._total += 1
+            slot.since = time.monotonic()
+            self._active.add(slot)
+            # 等待者减少可能让其他通道可以借用
+            self._cond.notify_all()
+
+    def _release_locked(self, slot: _Slot) -> None:
+        self._active.discard(slot)
+        if slot.suspended:
+            # 被让行的任务提前结束（取消/失败）：借用者直接保留该槽位，计数已在借出时转移
+            if slot.lent_to is not None:
+                slot.lent_to.loaned_from = None
+            slot.lent_to = None
+            slot.suspended_since = None
+            self._cond.notify_all()
+            return
+        self._charge(slot, -1)
+        lender = slot.loaned_from
+        slot.loaned_from = None
+        if lender is not None:
+            lender.lent_to = None
+            self._return_loan(lender)
+        else:
+            self._total = max(0, self._total - 1)
+        self._cond.notify_all()
+
+    def _return_loan(self, lender: _Slot) -> None:
+        """A borrower finished: pass the slot to the next small waiter or give it back."""
+        p = self.preemption
+        now = time.monotonic()
+        if p.enabled and now - (lender.suspended_since or now) < p.max_suspend_s:
+            for w in self._queue:
+                if not w.granted and self._is_small(w) and self._chat_allows(w, lender):
+                    self._lend(lender, w)
+                    return
+        lender.suspended_since = None
+        lender.since = now
+        self._charge(lender, 1)
+        self._call(lender.on_resume)
+
+    async def release(self, slot: _Slot) -> None:
+        async with self._cond:
+            self._release_locked(slot)
+
+    async def acquire(
+        self,
+        lane: str,
+        chat_id: Optional[int] = None,
+        *,
+        size: int = 0,
+        on_suspend: Optional[Callable[[], None]] = None,
+        on_resume: Optional[Callable[[], None]] = None,
+    ) -> _Slot:
+        """Wait for a slot; pass the returned slot to :meth:`release`."""
+        slot = self.slot(lane, chat_id, size=size, on_suspend=on_suspend, on_resume=on_resume)
+        await self._acquire_slot(slot)
+        return slot
+
+    def slot(
+        self,
+        lane: str,
+        chat_id: Optional[int] = None,
+        *,
+        size: int = 0,
+        on_suspend: Optional[Callable[[], None]] = None,
+        on_resume: Optional[Callable[[], None]] = None,
+    ) -> _Slot:
+        """``async with limiter.slot("video", chat_id, size=n): ...``"""
+        return _Slot(self, lane_for(lane), chat_id, size, on_suspend, on_resume)
+
+    # ----- preemption -----
+
+    def _is_small(self, slot: _Slot) -> bool:
+        return 0 < slot.size <= self.preemption.small_max_bytes
+
+    def _chat_allows(self, borrower: _Slot, lender: _Slot) -> bool:
+        cap = self.chat_limit(borrower.chat_id)
+        if not cap or borrower.chat_id == lender.chat_id:
+            return True
+        return self._chat_running.get(borrower.chat_id, 0) < cap
+
+    @staticmethod
+    def _call(cb: Optional[Callable[[], None]]) -> None:
+        if cb is None:
+            return
+        try:
+            cb()
+        except Exception as e:
+            logger.warning("Preemption callback failed: %s", e)
+
+    def _lend(self, lender: _Slot, borrower: _Slot) -> None:
+        # 槽位从 lender 转给 borrower：通道/聊天计数随之转移，总数不变
+        self._charge(borrower, 1)
+        borrower.granted = True
+        borrower.loaned_from = lender
+        lender.lent_to = borrower
+
+    def _preempt_once(self) -> bool:
+        """Suspend one large transfer for the longest-waiting small file; True if done."""
+        p = self.preemption
+        if not p.enabled:
+            return False
+        if sum(1 for s in self._active if s.suspended) >= p.max_suspended:
+            return False
+        now = time.monotonic()
+        victims = sorted(
+            (
+                s
+                for s in self._active
+                if not s.suspended
+                and s.loaned_from is None
+                and s.on_suspend is not None
+                and s.size >= p.large_min_bytes
+                and s.preemptions < p.max_preemptions
+                and now - s.since >= p.min_run_s
+            ),
+            key=lambda s: s.size,
+            reverse=True,
+        )
+        if not victims:
+            return False
+        for w in self._queue:
+            if w.granted or not self._is_small(w) or now - w.waiting_since < p.wait_s:
+                continue
+            if self._can_start(w.lane, w.chat_id):
+                continue
+            for v in victims:
+                if self._chat_allows(w, v):
+                    self._charge(v, -1)
+                    v.suspended_since = now
+                    v.preemptions += 1
+                    self.preemptions += 1
+                    self._call(v.on_suspend)
+                    self._lend(v, w)
+                    self._cond.notify_all()
+                    return True
+        return False
+
+    def _ensure_preempt_task(self) -> None:
+        if not self.preemption.enabled:
+            return
+        if self._preempt_task is None or self._preempt_task.done():
+            self._preempt_task = asyncio.get_running_loop().create_task(self._preempt_loop())
+
+    async def _preempt_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(0.05, self.preemption.check_interval_s))
+            async with self._cond:
+                if not self._queue or not self.preemption.enabled:
+                    self._preempt_task = None
+                    return
+                self._preempt_once()
+
+    def stop(self) -> None:
+        if self._preempt_task is not None:
+            self._preempt_task.cancel()
+            self._preempt_task = None
+
+    # ----- configuration -----
+
+    async def configure(
+        self,
+        *,
+        global_limit: Optional[int] = None,
+        lane_limits: Optional[Mapping[str, int]] = None,
+        per_chat_limit: Optional[int] = None,
+        chat_limits: Optional[Mapping[int, int]] = None,
+        lending: Optional[bool] = None,
+        preemption: Optional[PreemptionPolicy] = None,
+    ) -> None:
+        """Change limits; waiters are re-evaluated immediately."""
+        async with self._cond:
+            if global_limit is not None:
+                self._global = max(1, int(global_limit))
+            if lane_limits is not None:
+                self._limits = default_lane_limits(self._global)
+                self._limits.update({lane_for(k): max(1, int(v)) for k, v in lane_limits.items()})
+            if per_chat_limit is not None:
+                self._per_chat = max(0, int(per_chat_limit))
+            if chat_limits is not None:
+                self._chat_limits = {int(k): max(0, int(v)) for k, v in chat_limits.items()}
+            if lending is not None:
+                self.lending = bool(lending)
+            if preemption is not None:
+                self.preemption = preemption
+                if self._queue:
+                    self._ensure_preempt_task()
+            self._cond.notify_all()
+
+    async def set_limit(self, new_limit: int) -> None:
+        await self.configure(global_limit=new_limit)
+
+    # ----- introspection -----
+
+    def get_limit(self) -> int:
+        return self._global
+
+    def get_running(self) -> int:
+        return self._total
+
+    def get_waiting(self) -> int:
+        return sum(self._waiting.values())
+
+    def get_suspended(self) -> int:
+        return sum(1 for s in self._active if s.suspended)
+
+    @property
+    def per_chat_limit(self) -> int:
+        return self._per_chat
+
+    @property
+    def chat_limits(self) -> Dict[int, int]:
+        return dict(self._chat_limits)
+
+    def chat_running(self, chat_id: int) -> int:
+        return self._chat_running.get(chat_id, 0)
+
+    def lanes(self) -> Dict[str, LaneStats]:
+        suspended = {lane: 0 for lane in LANES}
+        for s in self._active:
+            if s.suspended:
+                suspended[s.lane] += 1
+        return {
+            lane: LaneStats(self._limits[lane], self._running[lane], self._waiting[lane], suspended[lane])
+            for lane in LANES
+        }
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Debounced "move the dashboard to the bottom" policy.
+
+Deleting the dashboard message and sending a fresh one for every new task is
+expensive: forwarding 50 files costs 50 deletes + 50 sends and quickly runs
+into FloodWait. The policy below decides *when* a repost is worth it:
+
+1) The dashboard must have been scrolled away by at least ``min_scrolled``
+   messages (otherwise it is still visible and an in-place edit is enough).
+2) Reposts are rate limited to one per ``min_interval_s`` per chat.
+3) Requests arriving in a burst (a batch of forwarded files) are coalesced
+   into a single repost that fires ``batch_window_s`` after the first one.
+
+The policy only keeps counters and loop timers; the actual send/delete is
+performed by the ``repost`` callback supplied by the caller.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+RepostCallback = Callable[[int], Awaitable[None]]
+
+
+class DashboardRepostPolicy:
+    """Decide whether a chat's dashboard should be re-sent at the bottom.
+
+    Parameters
+    ----------
+    repost:
+        Async callback: await repost(chat_id). Must send the new dashboard
+        message and call :meth:`note_reposted` on success.
+    min_interval_s:
+        Minimum seconds between two reposts in the same chat.
+    min_scrolled:
+        Number of messages that must appear below the dashboard before a
+        repost is considered.
+    batch_window_s:
+        Debounce window used to coalesce a burst of new tasks.
+    """
+
+    def __init__(
+        self,
+        repost: Optional[RepostCallback] = None,
+        *,
+        min_interval_s: float = 20.0,
+        min_scrolled: int = 3,
+        batch_window_s: float = 2.0,
+    ):
+        self.repost: Optional[RepostCallback] = repost
+        self.min_interval_s = max(0.0, float(min_interval_s))
+        self.min_scrolled = max(1, int(min_scrolled))
+        self.batch_window_s = max(0.0, float(batch_window_s))
+
+        self._scrolled: Dict[int, int] = {}
+        self._last_repost: Dict[int, float] = {}
+        self._pending: Dict[int, asyncio.TimerHandle] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "scrolled": dict(self._scrolled),
+            "pending": sorted(self._pending.keys()),
+            "min_interval_s": self.min_interval_s,
+            "min_scrolled": self.min_scrolled,
+        }
+
+    def note_message(self, chat_id: int, count: int = 1) -> None:
+        """A message appeared below the dashboard in this chat."""
+        self._scrolled[chat_id] = self._scrolled.get(chat_id, 0) + max(0, int(count))
+
+    def note_reposted(self, chat_id: int) -> None:
+        """The dashboard is (again) the newest message of the chat."""
+        self._scrolled[chat_id] = 0
+        self._last_repost[chat_id] = time.monotonic()
+
+    def forget(self, chat_id: int) -> None:
+        h = self._pending.pop(chat_id, None)
+        if h is not None:
+            h.cancel()
+        self._scrolled.pop(chat_id, None)
+        self._last_repost.pop(chat_id, None)
+
+    def request(self, chat_id: int) -> bool:
+        """New work arrived: schedule a repost if the dashboard is out of sight.
+
+        Returns True if a repost is (or already was) scheduled; False means the
+        caller should simply edit the existing message in place.
+        """
+        if chat_id in self._pending:
+            return True
+        if self._scrolled.get(chat_id, 0) < self.min_scrolled:
+            return False
+
+        now = time.monotonic()
+        last = self._last_repost.get(chat_id)
+        delay = self.batch_window_s
+        if last is not None:
+            delay = max(delay, last + self.min_interval_s - now)
+
+        loop = asyncio.get_running_loop()
+        self._pending[chat_id] = loop.call_later(delay, self._fire, chat_id)
+        return True
+
+    def _fire(self, chat_id: int) -> None:
+        self._pending.pop(chat_id, None)
+        # Double-check: the chat may have been reposted/cleaned meanwhile.
+        if self._scrolled.get(chat_id, 0) < self.min_scrolled:
+            return
+        if self.repost is None:
+            return
+        asyncio.get_running_loop().create_task(self._run(chat_id))
+
+    async def _run(self, chat_id: int) -> None:
+        try:
+            await self.repost(chat_id)
+        except Exception as e:
+            logger.warning("任务面板置底失败：chat_id=%s，原因=%s", chat_id, e)
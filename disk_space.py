@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Disk-space admission for downloads.
+
+Before a transfer starts it reserves its remaining bytes on the target file
+system. It is admitted only if
+
+    free (statvfs) - outstanding reservations - min_free >= size
+
+Otherwise it waits until a reservation is released or the cached free space
+is refreshed. A reservation's outstanding bytes shrink as the transfer
+writes (``progress`` callable), because those bytes are already gone from
+the free space ``statvfs`` reports. Without this, a batch of videos is
+admitted at once, fills the volume, and every job fails halfway.
+
+Free space is cached per file system (keyed by ``st_dev``, so Music/Video
+on one volume share a budget) and refreshed at most every ``refresh_s``
+from a worker thread, plus right after a reservation is released. It is
+never checked per chunk.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class _Filesystem:
+    __slots__ = ("dev", "label", "free", "checked", "reservations", "changed")
+
+    def __init__(self, dev: int, label: str):
+        self.dev = dev
+        # 首个使用该文件系统的目录，用于 statvfs 与显示
+        self.label = label
+        self.free = 0
+        self.checked = 0.0
+        self.reservations: Set["SpaceReservation"] = set()
+        self.changed = asyncio.Event()
+
+    def outstanding(self) -> int:
+        return sum(r.outstanding() for r in self.reservations)
+
+
+class SpaceReservation:
+    """Bytes held for one transfer; pass it back to :meth:`DiskSpaceGate.release`."""
+
+    __slots__ = ("fs", "size", "progress")
+
+    def __init__(self, fs: Optional[_Filesystem], size: int, progress: Optional[Callable[[], int]]):
+        self.fs = fs
+        self.size = size
+        self.progress = progress
+
+    def outstanding(self) -> int:
+        written = self.progress() if self.progress is not None else 0
+        return max(0, self.size - written)
+
+
+class DiskSpaceGate:
+    """Per-file-system free-space budget.
+
+    Parameters
+    ----------
+    enabled:
+        When False, :meth:`reserve` admits immediately.
+    min_free_bytes:
+        Headroom that admitted transfers must leave free.
+    refresh_s:
+        Maximum age of the cached free space.
+    """
+
+    def __init__(self, *, enabled: bool = True, min_free_bytes: int = 0, refresh_s: float = 5.0):
+        self.enabled = enabled
+        self.min_free_bytes = max(0, int(min_free_bytes))
+        self.refresh_s = max(0.5, float(refresh_s))
+        self._filesystems: Dict[int, _Filesystem] = {}
+        self._dev_by_path: Dict[str, int] = {}
+
+    async def _filesystem(self, path: str) -> _Filesystem:
+        dev = self._dev_by_path.get(path)
+        if dev is None:
+            dev = (await asyncio.to_thread(os.stat, path)).st_dev
+            self._dev_by_path[path] = dev
+        fs = self._filesystems.get(dev)
+        if fs is None:
+            fs = self._filesystems[dev] = _Filesystem(dev, path)
+        return fs
+
+    async def _refresh(self, fs: _Filesystem) -> None:
+        now = time.monotonic()
+        if fs.checked and now - fs.checked < self.refresh_s:
+            return
+        st = await asyncio.to_thread(os.statvfs, fs.label)
+        fs.free = st.f_bavail * st.f_frsize
+        fs.checked = time.monotonic()
+
+    def available(self, fs: _Filesystem) -> int:
+        """Free bytes not yet promised to admitted transfers (after headroom)."""
+        return fs.free - fs.outstanding() - self.min_free_bytes
+
+    async def reserve(
+        self,
+        path: str,
+        size: int,
+        *,
+        progress: Optional[Callable[[], int]] = None,
+        on_wait: Optional[Callable[[int], None]] = None,
+    ) -> SpaceReservation:
+        """Wait until ``size`` bytes fit on the file system of directory ``path``.
+
+        ``progress()`` returns the bytes written since admission. While
+        waiting, ``on_wait(available_bytes)`` is called after every check.
+        If the file system cannot be inspected the transfer is admitted
+        unchecked.
+        """
+        size = max(0, int(size))
+        if not self.enabled:
+            return SpaceReservation(None, size, progress)
+        try:
+            fs = await self._filesystem(path)
+            while True:
+                await self._refresh(fs)
+                available = self.available(fs)
+                if available >= size:
+                    break
+                if on_wait is not None:
+                    on_wait(available)
+                try:
+                    await asyncio.wait_for(fs.changed.wait(), self.refresh_s)
+                except asyncio.TimeoutError:
+                    pass
+        except OSError as e:
+            logger.warning("Cannot check free space of %s, admitting without reservation: %s", path, e)
+            return SpaceReservation(None, size, progress)
+        r = SpaceReservation(fs, size, progress)
+        fs.reservations.add(r)
+        return r
+
+    def release(self, r: SpaceReservation) -> None:
+        fs = r.fs
+        if fs is None or r not in fs.reservations:
+            return
+        fs.reservations.discard(r)
+        # 写入完成或删除了部分文件：下次检查重新 statvfs，并唤醒等待者
+        fs.checked = 0.0
+        changed, fs.changed = fs.changed, asyncio.Event()
+        changed.set()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "path": fs.label,
+                "free": fs.free,
+                "reserved": fs.outstanding(),
+                "transfers": len(fs.reservations),
+            }
+            for fs in self._filesystems.values()
+        ]
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""Structured download lifecycle events and their aggregation.
+
+``teleflux.log`` is free text meant for humans. For statistics TeleFlux also
+writes one compact JSON object per lifecycle transition (``queued``,
+``started``, ``paused``, ``resumed``, ``stalled``, ``completed``, ``failed``,
+``cancelled``) to day-partitioned files under ``<CACHE_PATH>/events``::
+
+    events-20240131.jsonl
+    {"ts":1706700000.1,"ev":"completed","id":1,"chat":42,"type":"audio","dc":4,"size":8388608,"bytes":8388608,"dur":3.2}
+
+The day partition is the time index: a query only opens the files of the days
+it covers. Days that are over never change, so their aggregate is computed
+once and cached next to the data (``summary-20240131.json``); a 30-day
+``/stats`` therefore reads 30 small summaries plus at most two partial days.
+
+Writes are buffered in memory and appended from a worker thread by a periodic
+flush, so emitting an event never touches the disk on the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+EVENT_TYPES = (
+    "queued",
+    "started",
+    "paused",
+    "resumed",
+    "stalled",
+    "completed",
+    "failed",
+    "cancelled",
+)
+
+_EVENTS_PREFIX = "events-"
+_SUMMARY_PREFIX = "summary-"
+
+
+def _day_key(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y%m%d")
+
+
+def _day_start(key: str) -> float:
+    return datetime.strptime(key, "%Y%m%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+@dataclass
+class DcStats:
+    completed: int = 0
+    failed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class EventStats:
+    """Mergeable aggregate of lifecycle events."""
+
+    counts: Dict[str, int] = field(default_factory=dict)
+    bytes: int = 0
+    transfer_s: float = 0.0
+    queue_wait_s: float = 0.0
+    queue_wait_n: int = 0
+    dcs: Dict[str, DcStats] = field(default_factory=dict)
+
+    def add(self, ev: Dict[str, Any]) -> None:
+        name = ev.get("ev")
+        if not name:
+            return
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if name == "started" and "wait" in ev:
+            self.queue_wait_s += float(ev["wait"])
+            self.queue_wait_n += 1
+        if name in ("completed", "failed"):
+            nbytes = int(ev.get("bytes", 0) or 0)
+            dur = float(ev.get("dur", 0.0) or 0.0)
+            self.bytes += nbytes
+            self.transfer_s += dur
+            dc = self.dcs.setdefault(str(ev.get("dc", "?")), DcStats())
+            dc.bytes += nbytes
+            dc.seconds += dur
+            if name == "completed":
+                dc.completed += 1
+            else:
+                dc.failed += 1
+
+    def merge(self, other: "EventStats") -> "EventStats":
+        for k, v in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + v
+        self.bytes += other.bytes
+        self.transfer_s += other.transfer_s
+        self.queue_wait_s += other.queue_wait_s
+        self.queue_wait_n += other.queue_wait_n
+        for k, d in other.dcs.items():
+            mine = self.dcs.setdefault(k, DcStats())
+            mine.completed += d.completed
+            mine.failed += d.failed
+            mine.bytes += d.bytes
+            mine.seconds += d.seconds
+        return self
+
+    @property
+    def completed(self) -> int:
+        return self.counts.get("completed", 0)
+
+    @property
+    def failed(self) -> int:
+        return self.counts.get("failed", 0)
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        done = self.completed + self.failed
+        return self.completed / done if done else None
+
+    @property
+    def throughput(self) -> float:
+        """Average per-transfer throughput (bytes per transfer-second)."""
+        return self.bytes / self.transfer_s if self.transfer_s > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "counts": dict(self.counts),
+            "bytes": self.bytes,
+            "transfer_s": round(self.transfer_s, 3),
+            "queue_wait_s": round(self.queue_wait_s, 3),
+            "queue_wait_n": self.queue_wait_n,
+            "dcs": {k: [d.completed, d.failed, d.bytes, round(d.seconds, 3)] for k, d in self.dcs.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "EventStats":
+        st = cls(
+            counts={str(k): int(v) for k, v in (d.get("counts") or {}).items()},
+            bytes=int(d.get("bytes", 0)),
+            transfer_s=float(d.get("transfer_s", 0.0)),
+            queue_wait_s=float(d.get("queue_wait_s", 0.0)),
+            queue_wait_n=int(d.get("queue_wait_n", 0)),
+        )
+        for k, v in (d.get("dcs") or {}).items():
+            st.dcs[str(k)] = DcStats(int(v[0]), int(v[1]), int(v[2]), float(v[3]))
+        return st
+
+
+class DownloadEventLog:
+    """Buffered, day-partitioned JSON-lines event log.
+
+    Parameters
+    ----------
+    directory:
+        Where ``events-*.jsonl`` and ``summary-*.json`` files live.
+    retention_days:
+        Day files older than this are deleted (0 keeps everything).
+    flush_interval_s:
+        How often buffered events are appended to disk.
+    """
+
+    def __init__(self, directory: str, *, retention_days: int = 90, flush_interval_s: float = 2.0):
+        self.directory = directory
+        self.retention_days = max(0, int(retention_days))
+        self.flush_interval_s = max(0.1, float(flush_interval_s))
+        self._buffer: List[Tuple[str, str]] = []
+        self._summaries: Dict[str, EventStats] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._pruned_day = ""
+        self.written = 0
+
+    # ----- writing -----
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """Record one lifecycle transition (non-blocking)."""
+        ts = time.time()
+        rec = {"ts": round(ts, 3), "ev": event}
+        for k, v in fields.items():
+            if v is not None:
+                rec[k] = round(v, 3) if isinstance(v, float) else v
+        self._buffer.append((_day_key(ts), json.dumps(rec, ensure_ascii=False, separators=(",", ":"))))
+
+    def _path(self, prefix: str, day: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{prefix}{day}{ext}")
+
+    def _append(self, batch: List[Tuple[str, str]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        by_day: Dict[str, List[str]] = {}
+        for day, line in batch:
+            by_day.setdefault(day, []).append(line)
+        for day, lines in by_day.items():
+            with open(self._path(_EVENTS_PREFIX, day, ".jsonl"), "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def _prune(self, today: str) -> None:
+        if not self.retention_days:
+            return
+        cutoff = (
+            datetime.strptime(today, "%Y%m%d") - timedelta(days=self.retention_days)
+        ).strftime("%Y%m%d")
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            for prefix in (_EVENTS_PREFIX, _SUMMARY_PREFIX):
+                if name.startswith(prefix) and name[len(prefix):len(prefix) + 8] < cutoff:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if self._buffer:
+                batch, self._buffer = self._buffer, []
+                try:
+                    await asyncio.to_thread(self._append, batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    logger.warning("写入下载事件日志失败（丢弃 %s 条）：%s", len(batch), e)
+            today = _day_key(time.time())
+            if today != self._pruned_day:
+                self._pruned_day = today
+                await asyncio.to_thread(self._prune, today)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            await self.flush()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    # ----- aggregation -----
+
+    def _scan(self, day: str, since: float, until: float) -> EventStats:
+        st = EventStats()
+        try:
+            with open(self._path(_EVENTS_PREFIX, day, ".jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ev = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since <= float(ev.get("ts", 0)) < until:
+                        st.add(ev)
+        except FileNotFoundError:
+            pass
+        return st
+
+    def _day_summary(self, day: str) -> EventStats:
+        """Aggregate of a finished day, computed once and cached on disk."""
+        cached = self._summaries.get(day)
+        if cached is not None:
+            return cached
+        path = self._path(_SUMMARY_PREFIX, day, ".json")
+        st: Optional[EventStats] = None
+        try:
+            with open(path, encoding="utf-8") as f:
+                st = EventStats.from_dict(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("读取事件汇总失败，将重新统计：%s（%s）", path, e)
+        if st is None:
+            st = self._scan(day, float("-inf"), float("inf"))
+            if os.path.exists(self._path(_EVENTS_PREFIX, day, ".jsonl")):
+                try:
+                    with open(path, "w", encoding="utf-8") as f:
+                        json.dump(st.to_dict(), f, separators=(",", ":"))
+                except OSError as e:
+                    logger.warning("写入事件汇总失败：%s（%s）", path, e)
+        self._summaries[day] = st
+        return st
+
+    def _aggregate(self, since: float, until: float, today: str) -> EventStats:
+        total = EventStats()
+        day = _day_key(since)
+        last = _day_key(until)
+        while day <= last:
+            start = _day_start(day)
+            end = start + 86400
+            if day < today and since <= start and end <= until:
+                total.merge(self._day_summary(day))
+            else:
+                total.merge(self._scan(day, since, until))
+            day = _day_key(end)
+        return total
+
+    async def stats(self, period_s: float, now: Optional[float] = None) -> EventStats:
+        """Aggregate events of the last ``period_s`` seconds."""
+        await self.flush()
+        now = time.time() if now is None else now
+        return await asyncio.to_thread(self._aggregate, now - period_s, now, _day_key(now))
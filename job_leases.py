@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""Job leases on shared storage, so several TeleFlux instances split the work.
+
+Two containers that share a library and sit in the same group chats both
+see every file. Before downloading, an instance claims a lease for the file
+in a directory on the shared volume. The lease is one small JSON file per
+job, named after a hash of the job key (the Telegram document id), holding
+the owner, an expiry time, the target paths and the last reported offset.
+
+- Claim: ``O_CREAT | O_EXCL`` create. Exactly one instance wins, and the
+  others see the current holder.
+- Renew: the owner rewrites the file (temp file + ``os.replace``) every
+  ``ttl_s / 3`` with a new expiry and its current offset.
+- Takeover: an expired lease is first renamed aside. Only one instance's
+  rename succeeds. If the owner renewed it in the meantime it is put back.
+  Otherwise a new lease is created that keeps the previous target paths and
+  offset, so the new owner resumes the same ``.downloading`` file.
+- Done: on success the owner marks the lease ``done`` and keeps it for
+  ``done_ttl_s``, so instances that were waiting report the file as
+  finished instead of downloading it again.
+
+Lock files rather than SQLite: SQLite's WAL mode needs shared memory and is
+not safe on network file systems (SMB/NFS), which is where a NAS library
+usually lives. ``O_EXCL`` and ``rename`` are atomic there. Expiry uses
+wall-clock time, so instance clocks must be in sync (NTP). All methods do
+blocking file I/O; call them via ``asyncio.to_thread``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def default_instance_id() -> str:
+    # 容器的主机名各不相同；同一实例重启后主机名不变，可直接收回自己的租约
+    return socket.gethostname()
+
+
+@dataclass
+class JobLease:
+    key: str
+    owner: str
+    expires: float
+    final_path: str = ""
+    temp_path: str = ""
+    size: int = 0
+    offset: int = 0
+    state: str = "active"  # active | done
+    # 接管时记录上一持有者
+    previous_owner: str = ""
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires
+
+
+class LeaseDirectory:
+    """Lease files in ``path`` for this instance (``instance_id``).
+
+    Parameters
+    ----------
+    path:
+        Directory on the shared volume (created on first use).
+    instance_id:
+        Unique per instance; see :func:`default_instance_id`.
+    ttl_s:
+        Lease lifetime without renewal.
+    done_ttl_s:
+        How long a finished job stays visible to other instances.
+    """
+
+    def __init__(self, path: str, instance_id: str, *, ttl_s: float = 60.0, done_ttl_s: float = 3600.0):
+        self.path = path
+        self.instance_id = instance_id
+        self.ttl_s = max(5.0, float(ttl_s))
+        self.done_ttl_s = float(done_ttl_s)
+        self._dir_ready = False
+        # 本进程中正在持有的任务；同一实例的第二个任务（转发到多个聊天、确认重复后）须排在其后
+        self._held: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def renew_interval_s(self) -> float:
+        return self.ttl_s / 3.0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lease")
+
+    def _ensure_dir(self) -> None:
+        if not self._dir_ready:
+            os.makedirs(self.path, exist_ok=True)
+            self._dir_ready = True
+
+    def _read_file(self, path: str) -> Optional[JobLease]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return JobLease(**data)
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError):
+            # 另一实例刚创建、尚未写完：按文件时间视为一个未知持有者的租约
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return None
+            return JobLease(key="", owner="?", expires=mtime + self.ttl_s)
+
+    def _write(self, lease: JobLease) -> None:
+        path = self._file(lease.key)
+        tmp = f"{path}.{self.instance_id}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(lease), f)
+        os.replace(tmp, path)
+
+    def read(self, key: str) -> Optional[JobLease]:
+        return self._read_file(self._file(key))
+
+    def holds(self, key: str) -> bool:
+        """True while a job of this process holds the lease for ``key``."""
+        return key in self._held
+
+    def claim(self, key: str, *, final_path: str, temp_path: str, size: int) -> Optional[JobLease]:
+        """Claim ``key`` for this instance; returns the lease now in force.
+
+        ``lease.owner == instance_id`` means this instance owns the job (when
+        taken over, or left over from before a restart, ``final_path`` /
+        ``temp_path`` / ``offset`` are the previous holder's). Otherwise
+        another instance holds it (``state`` ``active``) or has finished it
+        (``done``). None means another job of this process holds it; retry
+        once that job has finished.
+        """
+        with self._lock:
+            if key in self._held:
+                return None
+            lease = self._claim(key, final_path, temp_path, size)
+            if lease.owner == self.instance_id:
+                self._held.add(key)
+            return lease
+
+    def _claim(self, key: str, final_path: str, temp_path: str, size: int) -> JobLease:
+        self._ensure_dir()
+        path = self._file(key)
+        base = JobLease(key, self.instance_id, 0.0, final_path, temp_path, int(size))
+        for _ in range(5):
+            now = time.time()
+            base.expires = now + self.ttl_s
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(asdict(base), f)
+                return base
+
+            cur = self._read_file(path)
+            if cur is None:
+                continue
+            if cur.owner == self.instance_id and not cur.expired(now):
+                if cur.state == "active":
+                    # 本实例重启前持有、尚未过期的租约（本进程没有任务持有它）：续用其路径与偏移
+                    cur.expires = now + self.ttl_s
+                    self._write(cur)
+                    return cur
+                # 本实例已完成过该文件，又收到了新的下载请求（覆盖/加序号）：按新任务认领
+                self._write(base)
+                return base
+            if not cur.expired(now):
+                return cur
+
+            # 过期：先改名移开（只有一个实例能成功），确认期间未被续约再接管
+            stale = f"{path}.{self.instance_id}.stale"
+            try:
+                os.rename(path, stale)
+            except FileNotFoundError:
+                continue
+            moved = self._read_file(stale)
+            if moved is not None and not moved.expired():
+                try:
+                    os.link(stale, path)
+                except FileExistsError:
+                    pass
+                os.unlink(stale)
+                return moved
+            os.unlink(stale)
+            if moved is not None and moved.state == "active" and moved.owner != "?":
+                base.final_path = moved.final_path or final_path
+                base.temp_path = moved.temp_path or temp_path
+                base.offset = moved.offset
+                base.previous_owner = moved.owner
+        # 竞争过于激烈：视为被他人持有，稍后重试
+        return self._read_file(path) or JobLease(key, "?", time.time() + self.ttl_s)
+
+    def renew(self, key: str, *, offset: int) -> bool:
+        """Extend our lease; False if it is no longer ours (taken over after expiring)."""
+        cur = self.read(key)
+        if cur is None or cur.owner != self.instance_id or cur.state != "active":
+            self._held.discard(key)
+            return False
+        cur.expires = time.time() + self.ttl_s
+        cur.offset = int(offset)
+        self._write(cur)
+        return True
+
+    def complete(self, key: str) -> None:
+        self._held.discard(key)
+        cur = self.read(key)
+        if cur is None or cur.owner != self.instance_id:
+            return
+        cur.state = "done"
+        cur.offset = cur.size
+        cur.expires = time.time() + self.done_ttl_s
+        self._write(cur)
+
+    def release(self, key: str) -> None:
+        """Give up our lease (failed/cancelled); waiting instances may claim the job."""
+        self._held.discard(key)
+        cur = self.read(key)
+        if cur is not None and cur.owner == self.instance_id:
+            try:
+                os.unlink(self._file(key))
+            except FileNotFoundError:
+                pass
+
+    def sweep(self) -> int:
+        """Remove expired lease files; returns how many were removed."""
+        if not os.path.isdir(self.path):
+            return 0
+        now = time.time()
+        removed = 0
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(".lease"):
+                continue
+            lease = self._read_file(entry.path)
+            # 过期很久（超过一个 TTL）才删除，避免与正在接管的实例竞争
+            if lease is not None and lease.expires + self.ttl_s < now:
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Cheap tail/follow for the bot's log file.
+
+``/log`` used to read the whole ``teleflux.log`` (up to 5 MB) line by line to
+keep the last N lines, and every ``/log follow`` session repeated that every
+two seconds.
+
+- :func:`tail_lines` seeks to the end and reads backwards in blocks until it
+  has N lines, so its cost depends on N, not on the file size.
+- :class:`LogTailer` follows one file for any number of subscribers. A single
+  polling task remembers the byte offset and reads only what was appended.
+  ``RotatingFileHandler`` rollovers are detected by inode change or the file
+  shrinking below the offset; the tailer then continues from the start of the
+  new file. Subscribers wait for a version number to change and render the
+  shared buffer of recent lines.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def tail_lines(path: str, n: int, *, block_size: int = 8192) -> List[str]:
+    """Last ``n`` lines of ``path`` (UTF-8, undecodable bytes replaced).
+
+    Raises ``FileNotFoundError`` when the file does not exist.
+    """
+    n = max(1, int(n))
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        chunks: List[bytes] = []
+        newlines = 0
+        # 多读一行：第一块里的首行可能不完整
+        while pos > 0 and newlines <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-n:]
+
+
+class LogTailer:
+    """Follow one log file and broadcast new lines to subscribers.
+
+    Parameters
+    ----------
+    path:
+        File to follow.
+    keep_lines:
+        Number of recent lines kept for rendering.
+    interval_s:
+        Poll period while at least one subscriber is active.
+    """
+
+    def __init__(self, path: str, *, keep_lines: int = 80, interval_s: float = 2.0):
+        self.path = path
+        self.keep_lines = max(1, int(keep_lines))
+        self.interval_s = max(0.2, float(interval_s))
+        self.lines: Deque[str] = deque(maxlen=self.keep_lines)
+        self.version = 0
+        self.rotations = 0
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._partial = b""
+        self._subscribers = 0
+        self._task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    # ----- reading (worker thread) -----
+
+    def _prime(self) -> Tuple[List[str], Optional[int], int]:
+        try:
+            st = os.stat(self.path)
+            return tail_lines(self.path, self.keep_lines), st.st_ino, st.st_size
+        except FileNotFoundError:
+            return [], None, 0
+
+    def _read_new(self, inode: Optional[int], offset: int) -> Tuple[bytes, Optional[int], int, bool]:
+        """Return (appended bytes, inode, new offset, rotated)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return b"", None, 0, inode is not None
+        rotated = inode is not None and (st.st_ino != inode or st.st_size < offset)
+        if rotated or inode is None:
+            offset = 0
+        if st.st_size == offset:
+            return b"", st.st_ino, offset, rotated
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        return data, st.st_ino, offset + len(data), rotated
+
+    # ----- polling -----
+
+    def _apply(self, data: bytes) -> bool:
+        if not data:
+            return False
+        data = self._partial + data
+        parts = data.split(b"\n")
+        self._partial = parts.pop()
+        if not parts:
+            return False
+        for raw in parts:
+            self.lines.append(raw.decode("utf-8", errors="replace").rstrip("\r"))
+        return True
+
+    def _bump(self) -> None:
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _run(self) -> None:
+        try:
+            lines, self._inode, self._offset = await asyncio.to_thread(self._prime)
+            self.lines.clear()
+            self.lines.extend(lines)
+            self._partial = b""
+            self._bump()
+            while self._subscribers > 0:
+                await asyncio.sleep(self.interval_s)
+                try:
+                    data, inode, offset, rotated = await asyncio.to_thread(
+                        self._read_new, self._inode, self._offset
+                    )
+                except Exception as e:
+                    logger.debug("log tail read failed: %s", e)
+                    continue
+                if rotated:
+                    self.rotations += 1
+                    self._partial = b""
+                self._inode, self._offset = inode, offset
+                if self._apply(data):
+                    self._bump()
+        finally:
+            # 取消后又有新订阅时，_task 已指向新任务，不能清掉
+            if self._task is asyncio.current_task():
+                self._task = None
+
+    # ----- subscribers -----
+
+    def subscribe(self) -> None:
+        self._subscribers += 1
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self) -> None:
+        self._subscribers = max(0, self._subscribers - 1)
+        if self._subscribers == 0 and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    async def wait_change(self, seen_version: int, timeout: Optional[float] = None) -> int:
+        """Wait until :attr:`version` differs from ``seen_version`` (or timeout)."""
+        if self.version != seen_version:
+            return self.version
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.version
+
+    def text(self, n: Optional[int] = None) -> str:
+        lines = list(self.lines)
+        if n is not None:
+            lines = lines[-n:]
+        return "\n".join(lines)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Opt-in event-loop instrumentation: slow callbacks, per-handler time, stack sampling.
+
+When the bot feels sluggish the question is *what* holds the event loop: NAS
+writes, naming regexes, dashboard rendering or Telethon itself. Two tools:
+
+- :class:`SlowCallbackMonitor` wraps ``asyncio.Handle._run`` (the same hook
+  asyncio's debug mode uses for ``slow_callback_duration``). Every callback
+  the loop runs is timed and attributed to a name: for task steps, the
+  innermost coroutine frame that belongs to the application (so a step inside
+  Telethon's update dispatcher shows up as ``handle_file``), otherwise the
+  callback's qualified name. It keeps cumulative time, count and maximum per
+  name, logs callbacks that exceed ``threshold_s`` and records loop lag
+  measurements fed from a lag probe.
+- :class:`StackSampler` samples the loop thread's Python stack from a
+  separate thread for a fixed duration and writes the result in the "folded"
+  format (``frame;frame;frame count`` per line) that flamegraph.pl,
+  speedscope and inferno read directly.
+
+Both cost nothing unless enabled; the monitor adds roughly a microsecond per
+callback while installed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HandlerStats:
+    __slots__ = ("count", "total_s", "max_s", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.slow = 0
+
+
+def _app_frame_name(code, app_roots: Tuple[str, ...]) -> Optional[str]:
+    fn = code.co_filename
+    if fn.startswith(app_roots):
+        return getattr(code, "co_qualname", code.co_name)
+    return None
+
+
+class SlowCallbackMonitor:
+    """Time every event-loop callback and attribute it to a handler name.
+
+    Parameters
+    ----------
+    threshold_s:
+        Callbacks running longer than this are logged (and counted as slow).
+    app_roots:
+        Source directories considered "application" code when attributing task
+        steps; defaults to this module's directory.
+    lag_threshold_s:
+        Loop lag above this is logged by :meth:`note_lag`.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold_s: float = 0.1,
+        app_roots: Iterable[str] = (),
+        lag_threshold_s: Optional[float] = None,
+    ):
+        self.threshold_s = float(threshold_s)
+        self.lag_threshold_s = float(lag_threshold_s if lag_threshold_s is not None else threshold_s)
+        roots = tuple(os.path.abspath(r) + os.sep for r in app_roots) or (
+            os.path.dirname(os.path.abspath(__file__)) + os.sep,
+        )
+        self._app_roots = roots
+        # 第三方包即使位于应用目录下（例如虚拟环境）也不算作应用代码
+        self._skip = ("site-packages", "dist-packages")
+        self.stats: Dict[str, HandlerStats] = {}
+        self.started_at = time.monotonic()
+        self.lag_max_s = 0.0
+        self.lag_samples = 0
+        self.lag_over = 0
+        self._orig_run = None
+
+    # ----- naming -----
+
+    def _task_name(self, task) -> str:
+        coro = task.get_coro()
+        outer = getattr(coro, "__qualname__", None) or type(coro).__name__
+        best = None
+        depth = 0
+        while coro is not None and depth < 32:
+            code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+            if code is not None and not any(s in code.co_filename for s in self._skip):
+                name = _app_frame_name(code, self._app_roots)
+                if name is not None:
+                    best = name
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+            depth += 1
+        return best or outer
+
+    def _callback_name(self, handle) -> str:
+        cb = handle._callback
+        owner = getattr(cb, "__self__", None)
+        if isinstance(owner, asyncio.Task):
+            return self._task_name(owner)
+        name = getattr(cb, "__qualname__", None)
+        if name is None:
+            inner = getattr(cb, "func", None)  # functools.partial
+            name = getattr(inner, "__qualname__", None) or type(cb).__name__
+        return name
+
+    # ----- install -----
+
+    @property
+    def installed(self) -> bool:
+        return self._orig_run is not None
+
+    def install(self) -> None:
+        if self._orig_run is not None:
+            return
+        orig = asyncio.events.Handle._run
+        monitor = self
+        perf = time.perf_counter
+
+        def _run(handle):
+            # 先取名字：任务执行完一步后协程链会变化
+            try:
+                name = monitor._callback_name(handle)
+            except Exception:
+                name = "?"
+            t0 = perf()
+            try:
+                return orig(handle)
+            finally:
+                monitor._record(name, perf() - t0)
+
+        self._orig_run = orig
+        asyncio.events.Handle._run = _run  # type: ignore[method-assign]
+        logger.info("事件循环监控已启用：慢回调阈值 %.0f ms", self.threshold_s * 1000)
+
+    def uninstall(self) -> None:
+        if self._orig_run is not None:
+            asyncio.events.Handle._run = self._orig_run  # type: ignore[method-assign]
+            self._orig_run = None
+
+    # ----- accounting -----
+
+    def _record(self, name: str, dt: float) -> None:
+        st = self.stats.get(name)
+        if st is None:
+            st = self.stats[name] = HandlerStats()
+        st.count += 1
+        st.total_s += dt
+        if dt > st.max_s:
+            st.max_s = dt
+        if dt >= self.threshold_s:
+            st.slow += 1
+            logger.warning("慢回调：%s 占用事件循环 %.0f ms", name, dt * 1000)
+
+    def note_lag(self, lag_s: float) -> None:
+        self.lag_samples += 1
+        if lag_s > self.lag_max_s:
+            self.lag_max_s = lag_s
+        if lag_s >= self.lag_threshold_s:
+            self.lag_over += 1
+            logger.warning("事件循环延迟 %.0f ms", lag_s * 1000)
+
+    def reset(self) -> None:
+        self.stats.clear()
+        self.started_at = time.monotonic()
+        self.lag_max_s = 0.0
+        self.lag_samples = 0
+        self.lag_over = 0
+
+    def top(self, n: int = 15) -> List[Tuple[str, HandlerStats]]:
+        return sorted(self.stats.items(), key=lambda kv: kv[1].total_s, reverse=True)[:n]
+
+
+class StackSampler:
+    """Sample one thread's Python stack and aggregate folded stacks.
+
+    Parameters
+    ----------
+    thread_id:
+        ``threading.get_ident()`` of the thread to sample (the loop thread).
+    interval_s:
+        Sampling period.
+    """
+
+    def __init__(self, thread_id: int, *, interval_s: float = 0.005):
+        self.thread_id = thread_id
+        self.interval_s = max(0.001, float(interval_s))
+        self.samples = 0
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        name = getattr(code, "co_qualname", code.co_name)
+        return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def sample(self, duration_s: float) -> Dict[str, int]:
+        """Blocking: sample for ``duration_s`` and return ``{folded_stack: count}``."""
+        folded: Dict[str, int] = {}
+        labels: Dict[object, str] = {}
+        deadline = time.monotonic() + duration_s
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = self._frame_label(frame).replace(";", ":")
+                    stack.append(label)
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                folded[key] = folded.get(key, 0) + 1
+                self.samples += 1
+            time.sleep(self.interval_s)
+        return folded
+
+    @staticmethod
+    def write_folded(folded: Dict[str, int], path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(folded.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {count}\n")
+
+    async def profile_to_file(self, duration_s: float, path: str) -> int:
+        """Sample from a worker thread, write ``path``; returns the number of samples."""
+        before = self.samples
+        folded = await asyncio.to_thread(self.sample, duration_s)
+        await asyncio.to_thread(self.write_folded, folded, path)
+        return self.samples - before
+
+
+def loop_thread_id() -> int:
+    """Ident of the thread running the current event loop (call from the loop)."""
+    return threading.get_ident()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Recent-message cache for caption lookback.
+
+Music bots often send the "song info" text as a separate message right before
+(or as the reply target of) the audio file. Resolving it with
+``client.get_messages`` costs up to two RPCs per incoming file, so a burst of
+30 forwarded files adds ~60 round-trips before the first download starts.
+
+Two pieces live here:
+
+- :class:`RecentMessageCache` keeps a bounded ring buffer of recent *text*
+  messages per chat, fed from the ``events.NewMessage`` stream we already
+  receive. Entries are compact (id, sender, timestamp, text) and capped by
+  count and age; the number of chats is LRU-bounded. The cache also tracks
+  from which point in time its view of a chat is complete, so a lookback is
+  only answered locally when the cache can actually prove the answer.
+- :class:`MessageFetchBatcher` is the RPC fallback for cache misses. Requests
+  for the same chat arriving within a short window are merged into a single
+  ``get_messages`` call (one ``ids=[...]`` call for replies, one history call
+  covering all lookbacks).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class CachedMessage:
+    """Compact copy of a text message (attribute names mirror Telethon's Message)."""
+
+    id: int
+    sender_id: Optional[int]
+    ts: float
+    message: str
+
+    # Only text messages are cached.
+    media = None
+
+    @property
+    def date(self) -> datetime:
+        return datetime.fromtimestamp(self.ts, tz=timezone.utc)
+
+
+def _msg_ts(message) -> Optional[float]:
+    d = getattr(message, "date", None)
+    if d is None:
+        return None
+    try:
+        return d.timestamp()
+    except Exception:
+        return None
+
+
+class _ChatBuffer:
+    __slots__ = ("entries", "covered_from")
+
+    def __init__(self, size: int, covered_from: float):
+        self.entries: Deque[CachedMessage] = deque(maxlen=size)
+        # Every text message with ts >= covered_from is present in `entries`.
+        self.covered_from = covered_from
+
+
+class RecentMessageCache:
+    """Bounded per-chat cache of recent text messages.
+
+    Parameters
+    ----------
+    per_chat:
+        Maximum number of text messages kept per chat.
+    max_age_s:
+        Entries older than this (by message date) are dropped.
+    max_chats:
+        Maximum number of chats tracked; least recently active chats are evicted.
+    """
+
+    def __init__(self, *, per_chat: int = 50, max_age_s: float = 600.0, max_chats: int = 1000):
+        self.per_chat = max(1, int(per_chat))
+        self.max_age_s = float(max_age_s)
+        self.max_chats = max(1, int(max_chats))
+        self._chats: "OrderedDict[int, _ChatBuffer]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(len(b.entries) for b in self._chats.values())
+
+    def _expire(self, buf: _ChatBuffer, now: float) -> None:
+        limit = now - self.max_age_s
+        entries = buf.entries
+        while entries and entries[0].ts < limit:
+            old = entries.popleft()
+            buf.covered_from = max(buf.covered_from, old.ts)
+
+    def add(self, chat_id: int, message) -> None:
+        """Observe a new message from the event stream."""
+        ts = _msg_ts(message)
+        if ts is None:
+            ts = time.time()
+
+        buf = self._chats.get(chat_id)
+        if buf is None:
+            # Nothing before this message has been observed.
+            buf = _ChatBuffer(self.per_chat, ts)
+            self._chats[chat_id] = buf
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+
+        if getattr(message, "media", None) is not None:
+            return
+        text = (getattr(message, "message", "") or "").strip()
+        if not text:
+            return
+        mid = getattr(message, "id", None)
+        if mid is None:
+            return
+
+        entries = buf.entries
+        if len(entries) == entries.maxlen:
+            buf.covered_from = max(buf.covered_from, entries[0].ts)
+        entries.append(CachedMessage(int(mid), getattr(message, "sender_id", None), ts, text))
+        self._expire(buf, time.time())
+
+    def get(self, chat_id: int, msg_id: int) -> Optional[CachedMessage]:
+        """Return a cached text message by id (None on miss)."""
+        buf = self._chats.get(chat_id)
+        if buf is not None:
+            for m in reversed(buf.entries):
+                if m.id == msg_id:
+                    self.hits += 1
+                    return m
+        self.misses += 1
+        return None
+
+    def before(
+        self, chat_id: int, msg_id: int, limit: int, *, since_ts: float
+    ) -> Optional[List[CachedMessage]]:
+        """Text messages older than ``msg_id`` with date >= ``since_ts``, newest first.
+
+        Returns None if the cache cannot guarantee it saw every message in that
+        window (bot restarted, entries evicted, chat unknown): the caller
+        should fall back to an RPC.
+        """
+        buf = self._chats.get(chat_id)
+        if buf is None:
+            self.misses += 1
+            return None
+        self._expire(buf, time.time())
+        if buf.covered_from > since_ts:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        out: List[CachedMessage] = []
+        for m in reversed(buf.entries):
+            if m.id >= msg_id:
+                continue
+            if m.ts < since_ts or len(out) >= limit:
+                break
+            out.append(m)
+        return out
+
+    def forget(self, chat_id: int) -> None:
+        self._chats.pop(chat_id, None)
+
+
+FetchIds = Callable[[int, List[int]], Awaitable[Any]]
+FetchBefore = Callable[[int, int, int], Awaitable[Any]]
+
+
+class MessageFetchBatcher:
+    """Merge ``get_messages`` fallbacks for files arriving together.
+
+    Parameters
+    ----------
+    fetch_ids:
+        Async callable ``(chat_id, ids) -> messages`` (e.g. ``client.get_messages(chat, ids=ids)``).
+    fetch_before:
+        Async callable ``(chat_id, offset_id, limit) -> messages`` returning
+        messages older than ``offset_id``, newest first.
+    window_s:
+        How long to wait for more requests before issuing the RPC.
+    max_history:
+        Upper bound for the merged history request's ``limit``.
+    """
+
+    def __init__(
+        self,
+        fetch_ids: FetchIds,
+        fetch_before: FetchBefore,
+        *,
+        window_s: float = 0.05,
+        max_history: int = 100,
+    ):
+        self.fetch_ids = fetch_ids
+        self.fetch_before = fetch_before
+        self.window_s = max(0.0, float(window_s))
+        self.max_history = max(1, int(max_history))
+        self._ids: Dict[int, Dict[int, List[asyncio.Future]]] = {}
+        self._before: Dict[int, List[Tuple[int, int, asyncio.Future]]] = {}
+        self.rpc_calls = 0
+
+    async def get(self, chat_id: int, msg_id: int):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        pending = self._ids.get(chat_id)
+        if pending is None:
+            pending = self._ids[chat_id] = {}
+            loop.call_later(self.window_s, lambda: loop.create_task(self._flush_ids(chat_id)))
+        pending.setdefault(int(msg_id), []).append(fut)
+        return await fut
+
+    async def before(self, chat_id: int, msg_id: int, limit: int) -> list:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        pending = self._before.get(chat_id)
+        if pending is None:
+            pending = self._before[chat_id] = []
+            loop.call_later(self.window_s, lambda: loop.create_task(self._flush_before(chat_id)))
+        pending.append((int(msg_id), max(1, int(limit)), fut))
+        return await fut
+
+    async def _flush_ids(self, chat_id: int) -> None:
+        pending = self._ids.pop(chat_id, {})
+        if not pending:
+            return
+        try:
+            self.rpc_calls += 1
+            res = await self.fetch_ids(chat_id, sorted(pending))
+            if not isinstance(res, (list, tuple)):
+                res = [res]
+            by_id = {getattr(m, "id", None): m for m in res if m is not None}
+            for mid, futs in pending.items():
+                for f in futs:
+                    if not f.done():
+                        f.set_result(by_id.get(mid))
+        except Exception as e:
+            for futs in pending.values():
+                for f in futs:
+                    if not f.done():
+                        f.set_exception(e)
+
+    async def _flush_before(self, chat_id: int) -> None:
+        pending = self._before.pop(chat_id, [])
+        if not pending:
+            return
+        top = max(mid for mid, _, _ in pending)
+        low = min(mid for mid, _, _ in pending)
+        limit = min(self.max_history, max(lim for _, lim, _ in pending) + (top - low))
+        try:
+            self.rpc_calls += 1
+            res = list(await self.fetch_before(chat_id, top, limit) or [])
+            for mid, lim, f in pending:
+                if not f.done():
+                    f.set_result([m for m in res if (getattr(m, "id", 0) or 0) < mid][:lim])
+        except Exception as e:
+            for _, _, f in pending:
+                if not f.done():
+                    f.set_exception(e)
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""Minimal Prometheus metrics for TeleFlux (no extra dependency).
+
+The only way to watch the bot used to be ``/status`` in Telegram. This module
+provides just enough of the Prometheus client model to export the numbers we
+care about, served over plain HTTP from the bot's own event loop:
+
+- :class:`Counter`, :class:`Gauge` and :class:`Histogram` with optional labels;
+  a gauge can also be backed by a function that is evaluated at scrape time, so
+  values that already live elsewhere (limiter state, queue depth, throughput)
+  cost nothing between scrapes;
+- :class:`MetricsRegistry` renders the text exposition format (version 0.0.4);
+- :class:`LoopLagProbe` measures event-loop lag by how late a periodic timer
+  fires;
+- :class:`MetricsServer` answers ``GET /metrics`` with ``asyncio.start_server``.
+
+Updating a metric is a dict lookup plus an addition; nothing is formatted
+until Prometheus scrapes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+
+    def _key(self, labelvalues: Iterable[object]) -> LabelValues:
+        key = tuple(str(v) for v in labelvalues)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+        return key
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(suffix, label string, value) tuples for the exposition output."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set.
+
+    ``function`` reads an unlabelled total kept elsewhere (e.g. by another
+    thread) at scrape time; it must never decrease.
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function = function
+        if not self.labelnames:
+            self._values[()] = 0.0
+
+    def inc(self, amount: float = 1.0, *labelvalues: object) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = self._key(labelvalues) if labelvalues or self.labelnames else ()
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labelvalues: object) -> float:
+        return self._values.get(self._key(labelvalues), 0.0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        values = self._values
+        if self._function is not None:
+            try:
+                values = {(): float(self._function())}
+            except Exception as e:
+                logger.debug("metric %s callback failed: %s", self.name, e)
+        return [("", _label_str(self.labelnames, key), v) for key, v in sorted(values.items())]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        function: Optional[Callable[[], object]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function = function
+        if not self.labelnames and function is None:
+            self._values[()] = 0.0
+
+    def set(self, value: float, *labelvalues: object) -> None:
+        self._values[self._key(labelvalues)] = float(value)
+
+    def set_function(self, function: Callable[[], object]) -> None:
+        """Evaluate ``function`` at scrape time.
+
+        It returns a number for unlabelled gauges, or a mapping of label value
+        tuples (or a single string for one label) to numbers.
+        """
+        self._function = function
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        values = dict(self._values)
+        if self._function is not None:
+            try:
+                res = self._function()
+            except Exception as e:
+                logger.debug("metric %s callback failed: %s", self.name, e)
+                res = None
+            if isinstance(res, dict):
+                for k, v in res.items():
+                    k = k if isinstance(k, tuple) else (k,)
+                    values[self._key(k)] = float(v)
+            elif res is not None:
+                values[()] = float(res)
+        return [("", _label_str(self.labelnames, key), v) for key, v in sorted(values.items())]
+
+
+class _HistogramChild:
+    __slots__ = ("bucket_counts", "sum", "count")
+
+    def __init__(self, nbuckets: int):
+        self.bucket_counts = [0] * nbuckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (bounds in ascending order, +Inf implied)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(float(b) for b in buckets))
+        self._children: Dict[LabelValues, _HistogramChild] = {}
+        if not self.labelnames:
+            self._children[()] = _HistogramChild(len(self.buckets))
+
+    def observe(self, value: float, *labelvalues: object) -> None:
+        key = self._key(labelvalues) if labelvalues or self.labelnames else ()
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = _HistogramChild(len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                child.bucket_counts[i] += 1
+                break
+        child.sum += value
+        child.count += 1
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        out: List[Tuple[str, str, float]] = []
+        for key, child in sorted(self._children.items()):
+            acc = 0
+            for bound, n in zip(self.buckets, child.bucket_counts):
+                acc += n
+                le = f'le="{_format_value(bound)}"'
+                out.append(("_bucket", _label_str(self.labelnames, key, le), acc))
+            out.append(("_bucket", _label_str(self.labelnames, key, 'le="+Inf"'), child.count))
+            out.append(("_sum", _label_str(self.labelnames, key), child.sum))
+            out.append(("_count", _label_str(self.labelnames, key), child.count))
+        return out
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        function: Optional[Callable[[], float]] = None,
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, function=function))  # type: ignore[return-value]
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        function: Optional[Callable[[], object]] = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function=function))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets=buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagProbe:
+    """Measure event-loop lag as the delay of a periodic ``call_later`` timer.
+
+    Parameters
+    ----------
+    interval_s:
+        Probe period.
+    on_lag:
+        Called with each lag measurement in seconds.
+    """
+
+    def __init__(self, interval_s: float = 0.5, on_lag: Optional[Callable[[float], None]] = None):
+        self.interval_s = max(0.01, float(interval_s))
+        self.on_lag = on_lag
+        self.last_lag_s = 0.0
+        self.max_lag_s = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected = 0.0
+
+    def start(self) -> None:
+        if self._handle is not None:
+            return
+        self._arm(asyncio.get_running_loop())
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _arm(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._expected = loop.time() + self.interval_s
+        self._handle = loop.call_later(self.interval_s, self._fire, loop)
+
+    def _fire(self, loop: asyncio.AbstractEventLoop) -> None:
+        lag = max(0.0, loop.time() - self._expected)
+        self.last_lag_s = lag
+        self.max_lag_s = max(self.max_lag_s, lag)
+        if self.on_lag is not None:
+            try:
+                self.on_lag(lag)
+            except Exception as e:
+                logger.debug("loop lag callback failed: %s", e)
+        self._arm(loop)
+
+
+class MetricsServer:
+    """Serve ``GET /metrics`` for a registry from the running event loop."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, registry: MetricsRegistry, *, host: str = "0.0.0.0", port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = int(port)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.scrapes = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Prometheus 指标已启用：http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            # 丢弃请求头
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+                if not line or line in (b"\r\n", b"\n"):
+                    break
+            parts = request_line.decode("latin-1").split()
+            method = parts[0] if parts else ""
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else ""
+
+            if method not in ("GET", "HEAD"):
+                status, body, ctype = "405 Method Not Allowed", b"method not allowed\n", "text/plain"
+            elif path == "/metrics":
+                t0 = time.perf_counter()
+                body = self.registry.render().encode("utf-8")
+                self.scrapes += 1
+                logger.debug("metrics rendered in %.1f ms", (time.perf_counter() - t0) * 1000)
+                status, ctype = "200 OK", self.CONTENT_TYPE
+            elif path in ("/", "/healthz"):
+                status, body, ctype = "200 OK", b"ok\n", "text/plain"
+            else:
+                status, body, ctype = "404 Not Found", b"not found\n", "text/plain"
+
+            head = (
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            writer.write(head if method == "HEAD" else head + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.debug("metrics request failed: %s", e)
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
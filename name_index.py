@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""In-memory index of file names per target directory.
+
+Duplicate detection used to ``os.path.exists`` every file and probe
+``name_1``, ``name_2``, ... one stat at a time. On a large library mounted over
+SMB that is one network round-trip per probe. It was also racy: two concurrent
+downloads that format to the same name both passed the check and wrote the same
+``.downloading`` file.
+
+:class:`DirectoryNameIndex` lists a directory once with ``os.scandir`` (in a
+worker thread) and answers name lookups from memory. It is refreshed when the
+directory mtime changes (checked at most every ``check_interval_s``) and after
+``max_age_s`` regardless. On top of the on-disk names it keeps a reservation
+table for in-flight downloads:
+
+- :meth:`DirectoryNameIndex.reserve` is check-and-claim in one synchronous
+  step, so on a single event loop two jobs can never get the same name;
+- :meth:`DirectoryNameIndex.reserve_next` allocates ``name_N`` using a
+  per-name counter, so repeated "加序号" collisions are O(1) amortized;
+- :meth:`DirectoryNameIndex.release` drops the reservation and, when the
+  download completed, records the final name.
+
+The index never adopts a new directory mtime without rescanning: our own
+writes (``.downloading`` files, renames) and changes made by others in the
+same interval look alike, so any mtime change triggers a rescan on the next
+check. Callers that need certainty about one file (e.g. a partial
+``.downloading`` to resume) should stat it instead of asking the index.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryNameIndex:
+    """Names present in (or reserved for) one directory."""
+
+    def __init__(self, path: str, *, check_interval_s: float = 2.0, max_age_s: float = 300.0):
+        self.path = path
+        self.check_interval_s = float(check_interval_s)
+        self.max_age_s = float(max_age_s)
+
+        self._names: Set[str] = set()
+        self._reserved: Set[str] = set()
+        self._next_counter: Dict[str, int] = {}
+        self._mtime_ns: Optional[int] = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._refreshing: Optional[asyncio.Future] = None
+
+    # ----- refresh -----
+
+    def _dir_mtime_ns(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self) -> tuple:
+        mtime = self._dir_mtime_ns()
+        names: Set[str] = set()
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    names.add(entry.name)
+        except FileNotFoundError:
+            pass
+        return names, mtime
+
+    def _needs_check(self, now: float) -> bool:
+        return self._mtime_ns is None or now - self._checked_at >= self.check_interval_s
+
+    async def ensure_fresh(self) -> None:
+        """Rebuild the index if the directory changed (stat/scandir run in a thread)."""
+        now = time.monotonic()
+        if not self._needs_check(now):
+            return
+        if self._refreshing is not None:
+            await asyncio.shield(self._refreshing)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._refreshing = fut
+        try:
+            mtime = await asyncio.to_thread(self._dir_mtime_ns)
+            stale = (
+                self._mtime_ns is None
+                or mtime != self._mtime_ns
+                or now - self._built_at >= self.max_age_s
+            )
+            if stale:
+                names, mtime = await asyncio.to_thread(self._scan)
+                self._names = names
+                self._built_at = time.monotonic()
+                self._next_counter.clear()
+                logger.info("已建立目录索引：%s（%s 个文件）", self.path, len(names))
+            self._mtime_ns = mtime
+            self._checked_at = time.monotonic()
+        finally:
+            self._refreshing = None
+            fut.set_result(None)
+
+    # ----- lookups / reservations -----
+
+    def exists(self, name: str) -> bool:
+        return name in self._names or name in self._reserved
+
+    def on_disk(self, name: str) -> bool:
+        return name in self._names
+
+    def is_reserved(self, name: str) -> bool:
+        return name in self._reserved
+
+    def reserve(self, name: str, *, allow_existing: bool = False) -> bool:
+        """Claim ``name`` for an in-flight download.
+
+        Fails if another download holds it, or (unless ``allow_existing`` –
+        the overwrite case) if the file already exists.
+        """
+        if name in self._reserved:
+            return False
+        if not allow_existing and name in self._names:
+            return False
+        self._reserved.add(name)
+        return True
+
+    def reserve_next(self, name: str) -> str:
+        """Reserve and return the first free ``stem_N.ext`` for ``name``."""
+        stem, ext = os.path.splitext(name)
+        counter = self._next_counter.get(name, 1)
+        while True:
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+            if self.reserve(candidate):
+                self._next_counter[name] = counter
+                return candidate
+
+    def release(self, name: str, *, committed: bool) -> None:
+        """Drop the reservation; ``committed`` means the file now exists on disk."""
+        self._reserved.discard(name)
+        if committed:
+            self._names.add(name)
+            self._names.discard(name + ".downloading")
+
+
+class NameIndexRegistry:
+    """One :class:`DirectoryNameIndex` per target directory."""
+
+    def __init__(self, **index_kwargs):
+        self._index_kwargs = index_kwargs
+        self._indexes: Dict[str, DirectoryNameIndex] = {}
+
+    def get(self, path: str) -> DirectoryNameIndex:
+        key = os.path.abspath(path)
+        idx = self._indexes.get(key)
+        if idx is None:
+            idx = self._indexes[key] = DirectoryNameIndex(key, **self._index_kwargs)
+        return idx
+
+    async def fresh(self, path: str) -> DirectoryNameIndex:
+        idx = self.get(path)
+        await idx.ensure_fresh()
+        return idx
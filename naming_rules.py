@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""Precompiled naming rules for TeleFlux.
+
+File naming used to run a dozen separate ``re.sub`` passes per file, recompile
+patterns inside nested helpers on every call, and scan captions once per
+marker. All of that is static data, so this module compiles it once:
+
+- all ad/noise patterns are merged into a single alternation;
+- music caption markers and ``#flac``-style format tags are each matched by a
+  single regex in one pass over the text;
+- title-line patterns, the title blacklist, generic placeholder names and the
+  MIME -> extension table are prepared up front.
+
+Rules can be extended without code changes through a JSON file (by default
+``<CACHE_PATH>/naming_rules.json``). Lists in the file are appended to the
+built-in rules; set ``"replace_defaults": true`` to use only the file's lists.
+Example::
+
+    {
+      "music_markers": ["via @another_music_bot", "QQ音乐"],
+      "title_patterns": ["^(单曲|Track)\\\\s*[:：]\\\\s*(.+)$"],
+      "ad_patterns": ["无损音乐群"]
+    }
+
+Title patterns must capture the title in group 2 (group 1 is the label).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Pattern, Set
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_AD_PATTERNS: List[str] = [
+    r"@\w+",
+    r"www\.[\w\.]+",
+    r"http[s]?://\S+",
+    r"[\u4e00-\u9fa5]*广告[\u4e00-\u9fa5]*",
+    r"[\u4e00-\u9fa5]*推广[\u4e00-\u9fa5]*",
+    r"[\u4e00-\u9fa5]*官网[\u4e00-\u9fa5]*",
+    r"\[.*?\]",
+    r"\(.*?\)",
+    r"VIP",
+    r"高清",
+    r"超清",
+    r"蓝光",
+    r"HD",
+    r"4K",
+    r"1080[pP]",
+    r"720[pP]",
+]
+
+DEFAULT_AUDIO_TAGS: List[str] = ["flac", "mp3", "m4a", "wav", "ogg", "aac", "alac", "ape"]
+
+# 典型关键字段：歌曲/专辑/音乐ID/码率/平台标签（格式标签 #flac 等由 audio_tags 提供）
+DEFAULT_MUSIC_MARKERS: List[str] = [
+    "歌曲",
+    "歌名",
+    "曲名",
+    "专辑",
+    "音乐id",
+    "网易云音乐",
+    "kbps",
+    "via @music_v1bot",
+]
+
+DEFAULT_TITLE_PATTERNS: List[str] = [
+    r"^(歌曲|歌名|曲名|曲目)\s*[:：]\s*(.+)$",
+    r"(?i)^(Song|Title)\s*[:：]\s*(.+)$",
+]
+
+# 第一行像“xxx - yyy”但包含这些字段时，不当作标题
+DEFAULT_TITLE_BLACKLIST: List[str] = [
+    "专辑",
+    "大小",
+    "音乐ID",
+    "via",
+    "kbps",
+    "MB",
+    "#网易云音乐",
+    "网易云音乐",
+]
+
+DEFAULT_GENERIC_AUDIO_NAMES: List[str] = [
+    "music.mp3",
+    "music.flac",
+    "music.m4a",
+    "audio.mp3",
+    "audio.flac",
+    "audio.m4a",
+    "file.mp3",
+    "file.flac",
+    "file.m4a",
+    "unknown.mp3",
+    "unknown.flac",
+    "unknown.m4a",
+]
+
+DEFAULT_MIME_EXTENSIONS: Dict[str, str] = {
+    "audio/flac": ".flac",
+    "audio/x-flac": ".flac",
+    "audio/mpeg": ".mp3",
+    "audio/mp3": ".mp3",
+    "audio/aac": ".aac",
+    "audio/mp4": ".m4a",
+    "audio/x-m4a": ".m4a",
+    "audio/ogg": ".ogg",
+    "audio/wav": ".wav",
+    "audio/x-wav": ".wav",
+    "audio/x-ape": ".ape",
+    "audio/ape": ".ape",
+    "audio/alac": ".m4a",
+}
+
+# 以下规则与来源无关，直接编译为模块常量
+_TRAILING_STAMP_RE = re.compile(r"([_-])\d{8,}$")
+_SPECIAL_CHARS_RE = re.compile(r"[^\w\u4e00-\u9fa5\-_\s\.]")
+_SPACES_RE = re.compile(r"\s+")
+YEAR_RE = re.compile(r"(19|20)\d{2}")
+SEASON_RE = re.compile(r"[Ss](\d{1,2})")
+EPISODE_RE = re.compile(r"[Ee](\d{1,3})")
+
+
+@dataclass
+class NamingRules:
+    """Rule data plus the regexes compiled from it (see :meth:`compile`)."""
+
+    ad_patterns: List[str] = field(default_factory=lambda: list(DEFAULT_AD_PATTERNS))
+    audio_tags: List[str] = field(default_factory=lambda: list(DEFAULT_AUDIO_TAGS))
+    music_markers: List[str] = field(default_factory=lambda: list(DEFAULT_MUSIC_MARKERS))
+    music_marker_threshold: int = 2
+    title_patterns: List[str] = field(default_factory=lambda: list(DEFAULT_TITLE_PATTERNS))
+    title_blacklist: List[str] = field(default_factory=lambda: list(DEFAULT_TITLE_BLACKLIST))
+    generic_audio_names: List[str] = field(
+        default_factory=lambda: list(DEFAULT_GENERIC_AUDIO_NAMES)
+    )
+    mime_extensions: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_MIME_EXTENSIONS))
+
+    def __post_init__(self) -> None:
+        self.compile()
+
+    def compile(self) -> "NamingRules":
+        """(Re)build the compiled matchers; call after mutating the rule lists."""
+        self._ad_re: Pattern[str] = re.compile(
+            "|".join(f"(?:{p})" for p in self.ad_patterns) or r"(?!)", re.IGNORECASE
+        )
+        tags = "|".join(re.escape(t.lower()) for t in self.audio_tags) or r"(?!)"
+        # "#flac" / "# flac" → 扩展名；标签本身也算作音乐文案标记
+        self._ext_tag_re: Pattern[str] = re.compile(rf"#\s*({tags})\b", re.IGNORECASE)
+        markers = [m.lower() for m in self.music_markers] + [f"#{t.lower()}" for t in self.audio_tags]
+        # 每个位置做零宽前瞻，重叠的标记（“歌曲名”中的 歌曲/曲名）各自计数；
+        # 同一位置只捕获最长的标记，它的前缀标记（音乐 / 音乐id）另行补记
+        markers = sorted(set(markers), key=len, reverse=True)
+        self._marker_re: Pattern[str] = re.compile(
+            "(?=(" + ("|".join(re.escape(m) for m in markers) or r"(?!)") + "))", re.IGNORECASE
+        )
+        self._marker_prefixes: Dict[str, FrozenSet[str]] = {
+            m: frozenset(p for p in markers if m.startswith(p)) for m in markers
+        }
+        self._audio_tag_re: Pattern[str] = re.compile(
+            "|".join(re.escape(f"#{t.lower()}") for t in self.audio_tags) or r"(?!)",
+            re.IGNORECASE,
+        )
+        self._title_res: List[Pattern[str]] = [re.compile(p) for p in self.title_patterns]
+        self._title_bad_re: Optional[Pattern[str]] = (
+            re.compile("|".join(re.escape(b) for b in self.title_blacklist))
+            if self.title_blacklist
+            else None
+        )
+        self._generic_names = frozenset(n.lower() for n in self.generic_audio_names)
+        self._mime = {k.lower(): v for k, v in self.mime_extensions.items()}
+        return self
+
+    # ----- filename cleanup -----
+
+    def strip_ads(self, name: str) -> str:
+        """Remove ad/noise fragments in a single alternation pass.
+
+        Removing one fragment can expose another (e.g. ``高[VIP]清``), so the
+        pass is repeated until nothing changes; that is rarely more than twice.
+        """
+        while True:
+            out = self._ad_re.sub("", name)
+            if out == name:
+                return out
+            name = out
+
+    def clean(self, name: str) -> str:
+        """Ad removal + trailing timestamp + special characters + whitespace."""
+        name = self.strip_ads(name)
+        # 仅移除尾部连续 8 位以上的数字，避免误伤正常标题里的数字
+        name = _TRAILING_STAMP_RE.sub("", name)
+        name = _SPECIAL_CHARS_RE.sub("", name)
+        return _SPACES_RE.sub(" ", name).strip()
+
+    # ----- caption analysis -----
+
+    def marker_hits(self, text: str) -> int:
+        """Number of distinct music markers found in ``text`` (single scan).
+
+        Same count as testing each marker with ``in``, overlapping ones included.
+        """
+        if not text:
+            return 0
+        found: Set[str] = set()
+        for m in self._marker_re.finditer(text):
+            key = m.group(1).lower()
+            found |= self._marker_prefixes.get(key, frozenset((key,)))
+        return len(found)
+
+    def looks_like_music(self, text: str) -> bool:
+        if not text or not text.strip():
+            return False
+        return self.marker_hits(text) >= self.music_marker_threshold
+
+    def has_audio_tag(self, text: str) -> bool:
+        return bool(text) and self._audio_tag_re.search(text) is not None
+
+    def extract_audio_ext(self, text: str) -> str:
+        if not text:
+            return ""
+        m = self._ext_tag_re.search(text)
+        return "." + m.group(1).lower() if m else ""
+
+    def extract_audio_title(self, text: str) -> str:
+        if not text:
+            return ""
+        lines = [ln.strip() for ln in text.replace("\r", "").split("\n") if ln.strip()]
+        for ln in lines:
+            for p in self._title_res:
+                m = p.match(ln)
+                if m:
+                    return (m.group(2) or "").strip()
+
+        # 兜底：第一行像“xxx - yyy”，且不包含明显非标题字段
+        if lines:
+            first = lines[0]
+            if " - " in first and (self._title_bad_re is None or not self._title_bad_re.search(first)):
+                return first.strip()
+        return ""
+
+    def is_generic_audio_name(self, fn: str) -> bool:
+        return os.path.basename(fn or "").strip().lower() in self._generic_names
+
+    def ext_from_mime(self, mime_type: str) -> str:
+        return self._mime.get((mime_type or "").lower(), "")
+
+
+_LIST_FIELDS = {f.name for f in fields(NamingRules) if f.name not in {"music_marker_threshold", "mime_extensions"}}
+
+
+def naming_rules_from_dict(d: Dict[str, Any]) -> NamingRules:
+    """Build rules from a JSON object; lists extend the defaults unless replace_defaults."""
+    replace = bool(d.get("replace_defaults", False))
+    rules = NamingRules()
+    for name in _LIST_FIELDS:
+        extra = d.get(name)
+        if not isinstance(extra, list):
+            continue
+        extra = [str(x) for x in extra if isinstance(x, str) and x]
+        base = [] if replace else getattr(rules, name)
+        setattr(rules, name, base + [x for x in extra if x not in base])
+    mime = d.get("mime_extensions")
+    if isinstance(mime, dict):
+        base = {} if replace else rules.mime_extensions
+        base.update({str(k): str(v) for k, v in mime.items()})
+        rules.mime_extensions = base
+    thr = d.get("music_marker_threshold")
+    if isinstance(thr, int) and thr >= 1:
+        rules.music_marker_threshold = thr
+    return rules.compile()
+
+
+def load_naming_rules(path: Optional[Path]) -> NamingRules:
+    """Load rules from ``path``; fall back to built-in rules on any problem."""
+    try:
+        if path is None or not path.exists():
+            return NamingRules()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(data, dict):
+            return NamingRules()
+        rules = naming_rules_from_dict(data)
+        logger.info("已加载自定义命名规则：%s", path)
+        return rules
+    except Exception as e:
+        logger.warning("Failed to load naming rules: %s (%s)", path, e)
+        return NamingRules()
@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+"""Download workers in separate processes.
+
+In one process, MTProto decryption, file writes, naming and dashboard
+rendering all share a single event loop, so one core is pegged while the
+others idle. With a :class:`ProcessWorkerPool` each worker process runs its
+own session of the bot's token and its own loop. The bot keeps the UI and
+the scheduler, and only ships job descriptors to the workers.
+
+IPC is a ``multiprocessing`` pipe per worker, read from the event loop
+with ``add_reader`` (no threads). Every message is a small binary frame:
+
+- bot -> worker: ``!BI`` (op, job id), plus a pickled payload for
+  ``OP_START`` (media, offset, path) and ``OP_PROXY``;
+- worker -> bot: ``!BIQ`` (event, job id, bytes received), plus a UTF-8
+  error description for ``EV_ERROR``. ``OP_PROXY`` is acknowledged with
+  ``EV_PROXY`` (value 1 once reconnected, 0 plus the error if not).
+
+Progress frames are sent at most every ``progress_interval_s`` per job. The
+worker writes the ``.downloading`` file itself. The bot renames it once
+``EV_DONE`` arrives. A cancelled job is acknowledged (``EV_CANCELLED``) only
+after the worker has closed the file (which writes out the coalescing
+buffer), so a resume offset read afterwards is final. ``EV_CANCELLED`` for
+a job the bot did not cancel (the worker is stopping) fails the job.
+
+Media objects come from the bot's own messages and are valid for any session
+of the same account, so workers never re-fetch messages.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import pickle
+import struct
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from progress_sampler import TransferProgress
+from write_buffer import BufferPool, open_for_resume
+
+logger = logging.getLogger(__name__)
+
+OP_START, OP_CANCEL, OP_PAUSE, OP_RESUME, OP_PROXY, OP_STOP = range(1, 7)
+EV_READY, EV_PROGRESS, EV_DONE, EV_CANCELLED, EV_ERROR, EV_PROXY = range(1, 7)
+
+_CTL = struct.Struct("!BI")
+_EVT = struct.Struct("!BIQ")
+
+
+class RemoteDownloadError(Exception):
+    """A download failed inside a worker process (or the worker exited)."""
+
+    def __init__(self, remote_type: str, message: str = ""):
+        super().__init__(f"{remote_type}: {message}" if message else remote_type)
+        self.remote_type = remote_type
+
+
+def _describe(e: BaseException) -> bytes:
+    return f"{type(e).__name__}\n{e}".encode("utf-8", "replace")
+
+
+def _parse_error(payload: bytes) -> RemoteDownloadError:
+    remote_type, _, message = payload.decode("utf-8", "replace").partition("\n")
+    return RemoteDownloadError(remote_type or "Error", message)
+
+
+@dataclass
+class WorkerConfig:
+    """Everything a worker process needs; must be picklable (spawn)."""
+
+    index: int
+    session: str
+    bot_token: str
+    # session path -> TelegramClient (e.g. functools.partial(TelegramClient, api_id=..., ...))
+    client_factory: Callable[[str], Any]
+    initializer: Optional[Callable[..., None]] = None
+    initargs: Tuple[Any, ...] = ()
+    progress_interval_s: float = 0.25
+    # 写入合并缓冲区大小（0 = 逐块写入），见 write_buffer
+    write_buffer_bytes: int = 0
+
+
+# ----- worker process side -----
+
+
+def _worker_main(conn, cfg: WorkerConfig) -> None:
+    """Entry point of a worker process."""
+    if cfg.initializer is not None:
+        cfg.initializer(*cfg.initargs)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - worker{cfg.index} - %(levelname)s - %(message)s",
+    )
+    try:
+        asyncio.run(_serve(conn, cfg))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _serve(conn, cfg: WorkerConfig) -> None:
+    loop = asyncio.get_running_loop()
+
+    def send(event: int, job_id: int = 0, value: int = 0, payload: bytes = b"") -> None:
+        try:
+            conn.send_bytes(_EVT.pack(event, job_id, value) + payload)
+        except (BrokenPipeError, OSError):
+            stop.set()
+
+    stop = asyncio.Event()
+    client = cfg.client_factory(cfg.session)
+    try:
+        await client.start(bot_token=cfg.bot_token)
+    except Exception as e:
+        send(EV_ERROR, 0, 0, _describe(e))
+        return
+    send(EV_READY)
+
+    jobs: Dict[int, asyncio.Task] = {}
+    gates: Dict[int, asyncio.Event] = {}
+    buffers = BufferPool(cfg.write_buffer_bytes) if cfg.write_buffer_bytes else None
+
+    async def run_job(job_id: int, job: Dict[str, Any]) -> None:
+        gate = gates[job_id]
+        done = int(job["offset"])
+        last = 0.0
+        try:
+            # 暂停时先写出缓冲区，使磁盘上的文件与已上报的进度一致
+            with open_for_resume(job["path"], done, buffers, flush_when=lambda: not gate.is_set()) as f:
+                async for chunk in client.iter_download(job["media"], offset=done):
+                    f.write(chunk)
+                    done += len(chunk)
+                    now = loop.time()
+                    if now - last >= cfg.progress_interval_s:
+                        send(EV_PROGRESS, job_id, done)
+                        last = now
+                    if not gate.is_set():
+                        send(EV_PROGRESS, job_id, done)
+                        await gate.wait()
+        except asyncio.CancelledError:
+            # 文件已关闭：此后读取的 .downloading 大小即续传偏移
+            send(EV_CANCELLED, job_id, done)
+        except Exception as e:
+            send(EV_ERROR, job_id, done, _describe(e))
+        else:
+            send(EV_DONE, job_id, done)
+        finally:
+            jobs.pop(job_id, None)
+            gates.pop(job_id, None)
+
+    async def reconnect(proxy: Any) -> None:
+        try:
+            client.set_proxy(proxy)
+            await client.disconnect()
+            await client.connect()
+        except Exception as e:
+            logger.error("Worker reconnect failed: %s", e)
+            send(EV_PROXY, 0, 0, _describe(e))
+        else:
+            send(EV_PROXY, 0, 1)
+
+    reconnects: Set[asyncio.Task] = set()
+
+    def on_readable() -> None:
+        while True:
+            try:
+                if not conn.poll():
+                    return
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                # 主进程已退出
+                stop.set()
+                loop.remove_reader(conn.fileno())
+                return
+            op, job_id = _CTL.unpack_from(data)
+            payload = data[_CTL.size :]
+            if op == OP_START:
+                gates[job_id] = asyncio.Event()
+                gates[job_id].set()
+                jobs[job_id] = loop.create_task(run_job(job_id, pickle.loads(payload)))
+            elif op == OP_CANCEL:
+                task = jobs.get(job_id)
+                if task is not None:
+                    task.cancel()
+                else:
+                    send(EV_CANCELLED, job_id)
+            elif op in (OP_PAUSE, OP_RESUME):
+                gate = gates.get(job_id)
+                if gate is not None and op == OP_PAUSE:
+                    gate.clear()
+                elif gate is not None:
+                    gate.set()
+            elif op == OP_PROXY:
+                task = loop.create_task(reconnect(pickle.loads(payload)))
+                reconnects.add(task)
+                task.add_done_callback(reconnects.discard)
+            elif op == OP_STOP:
+                stop.set()
+
+    loop.add_reader(conn.fileno(), on_readable)
+    try:
+        await stop.wait()
+    finally:
+        try:
+            loop.remove_reader(conn.fileno())
+        except Exception:
+            pass
+        for task in list(jobs.values()):
+            task.cancel()
+        await asyncio.gather(*list(jobs.values()), return_exceptions=True)
+        await client.disconnect()
+
+
+# ----- bot side -----
+
+
+class _Job:
+    __slots__ = ("future", "progress", "offset", "cancel_sent")
+
+    def __init__(self, future: asyncio.Future, progress: TransferProgress, offset: int):
+        self.future = future
+        self.progress = progress
+        self.offset = offset
+        # 由本进程发送了 OP_CANCEL；否则 EV_CANCELLED 表示工作进程自行中止（视为失败）
+        self.cancel_sent = False
+
+
+class _WorkerProcess:
+    def __init__(self, cfg: WorkerConfig, ctx):
+        self.cfg = cfg
+        self.name = f"p{cfg.index}"
+        self.conn, self._child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(self._child_conn, cfg), name=f"teleflux-worker-{cfg.index}", daemon=True
+        )
+        self.ready = False
+        self.transfers = 0
+        self.jobs: Dict[int, _Job] = {}
+        self._started: Optional[asyncio.Future] = None
+        self._proxy_ack: Optional[asyncio.Future] = None
+        self._reading = False
+
+    async def start(self, timeout_s: float) -> None:
+        loop = asyncio.get_running_loop()
+        self._started = loop.create_future()
+        self.process.start()
+        self._child_conn.close()
+        loop.add_reader(self.conn.fileno(), self._on_readable)
+        self._reading = True
+        await asyncio.wait_for(self._started, timeout_s)
+        self.ready = True
+
+    def send(self, op: int, job_id: int = 0, payload: bytes = b"") -> None:
+        self.conn.send_bytes(_CTL.pack(op, job_id) + payload)
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                if not self.conn.poll():
+                    return
+                data = self.conn.recv_bytes()
+            except (EOFError, OSError):
+                self._on_exit()
+                return
+            event, job_id, value = _EVT.unpack_from(data)
+            payload = data[_EVT.size :]
+            if job_id == 0:
+                if event == EV_PROXY:
+                    if self._proxy_ack is not None and not self._proxy_ack.done():
+                        if value:
+                            self._proxy_ack.set_result(None)
+                        else:
+                            self._proxy_ack.set_exception(_parse_error(payload))
+                elif self._started is not None and not self._started.done():
+                    if event == EV_READY:
+                        self._started.set_result(None)
+                    else:
+                        self._started.set_exception(_parse_error(payload))
+                continue
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            job.progress.current = max(0, value - job.offset)
+            if event == EV_PROGRESS or job.future.done():
+                continue
+            if event == EV_ERROR:
+                job.future.set_exception(_parse_error(payload))
+            elif event == EV_CANCELLED and not job.cancel_sent:
+                job.future.set_exception(
+                    RemoteDownloadError("WorkerCancelled", f"download worker {self.name} stopped the job")
+                )
+            else:
+                job.future.set_result(value)
+
+    def _on_exit(self) -> None:
+        if self._reading:
+            asyncio.get_running_loop().remove_reader(self.conn.fileno())
+            self._reading = False
+        if self.ready:
+            logger.error("Download worker %s exited (code %s)", self.name, self.process.exitcode)
+        self.ready = False
+        err = RemoteDownloadError("WorkerExited", f"download worker {self.name} exited")
+        if self._started is not None and not self._started.done():
+            self._started.set_exception(err)
+        self.fail_pending(err)
+
+    def fail_pending(self, err: RemoteDownloadError) -> None:
+        """Fail every job and proxy acknowledgement still waiting on this worker."""
+        if self._proxy_ack is not None and not self._proxy_ack.done():
+            self._proxy_ack.set_exception(err)
+        for job in self.jobs.values():
+            if not job.future.done():
+                job.future.set_exception(err)
+
+    @property
+    def connected(self) -> bool:
+        """The pipe is still read (the process has not exited or been closed)."""
+        return self._reading
+
+    async def set_proxy(self, payload: bytes, timeout_s: float) -> None:
+        """Send ``OP_PROXY`` and wait for the worker to reconnect."""
+        self._proxy_ack = asyncio.get_running_loop().create_future()
+        try:
+            self.send(OP_PROXY, 0, payload)
+            await asyncio.wait_for(self._proxy_ack, timeout_s)
+        finally:
+            self._proxy_ack = None
+
+    def close(self) -> None:
+        if self._reading:
+            try:
+                asyncio.get_running_loop().remove_reader(self.conn.fileno())
+            except Exception:
+                pass
+            self._reading = False
+        self.ready = False
+        self.conn.close()
+
+
+class ProcessWorkerPool:
+    """Worker processes that download on behalf of the bot.
+
+    Parameters
+    ----------
+    processes:
+        Number of worker processes (0 = disabled).
+    poll_s:
+        How often a running job relays pause/resume of its
+        :class:`TransferProgress` to the worker.
+    start_timeout_s:
+        Time a worker gets to start and log in.
+    cancel_timeout_s:
+        Time a cancelled job waits for the worker to close its file.
+    proxy_timeout_s:
+        Time a worker gets to reconnect after a proxy change.
+    write_buffer_bytes:
+        Write coalescing buffer size in each worker (0 = write every chunk).
+
+    ``initializer(*initargs)`` runs first in every worker process, like
+    ``multiprocessing.Pool``'s.
+    """
+
+    def __init__(
+        self,
+        processes: int = 0,
+        *,
+        poll_s: float = 0.25,
+        start_timeout_s: float = 60.0,
+        cancel_timeout_s: float = 10.0,
+        proxy_timeout_s: float = 30.0,
+        write_buffer_bytes: int = 0,
+    ):
+        self.processes = max(0, int(processes))
+        self.poll_s = max(0.05, float(poll_s))
+        self.start_timeout_s = float(start_timeout_s)
+        self.cancel_timeout_s = float(cancel_timeout_s)
+        self.proxy_timeout_s = float(proxy_timeout_s)
+        self.write_buffer_bytes = max(0, int(write_buffer_bytes))
+        self.initializer: Optional[Callable[..., None]] = None
+        self.initargs: Tuple[Any, ...] = ()
+        self.workers: List[_WorkerProcess] = []
+        # 帧内的任务编号（uint32，与下载任务编号无关）
+        self._job_ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    def available(self) -> bool:
+        return any(w.ready for w in self.workers)
+
+    async def start(self, *, session_prefix: str, bot_token: str, client_factory: Callable[[str], Any]) -> None:
+        """Spawn the workers and wait until they have logged in; failed ones are left out."""
+        if not self.processes or self.workers:
+            return
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(1, self.processes + 1):
+            cfg = WorkerConfig(
+                index=i,
+                session=f"{session_prefix}{i}",
+                bot_token=bot_token,
+                client_factory=client_factory,
+                initializer=self.initializer,
+                initargs=self.initargs,
+                write_buffer_bytes=self.write_buffer_bytes,
+            )
+            self.workers.append(_WorkerProcess(cfg, ctx))
+        results = await asyncio.gather(
+            *(w.start(self.start_timeout_s) for w in self.workers), return_exceptions=True
+        )
+        for w, r in zip(self.workers, results):
+            if isinstance(r, BaseException):
+                logger.error("Download worker %s failed to start: %s", w.name, r)
+                w.close()
+                if w.process.is_alive():
+                    w.process.terminate()
+            else:
+                logger.info("Download worker %s ready (pid %s)", w.name, w.process.pid)
+
+    def _pick(self) -> _WorkerProcess:
+        ready = [w for w in self.workers if w.ready]
+        if not ready:
+            raise RemoteDownloadError("NoWorker", "no download worker is running")
+        return min(ready, key=lambda w: (len(w.jobs), w.transfers))
+
+    async def download(self, media: Any, offset: int, path: str, progress: TransferProgress) -> int:
+        """Download ``media`` from ``offset`` into ``path`` in a worker; returns bytes on disk.
+
+        ``progress.current`` follows the worker's progress frames, and
+        ``progress.pause()`` / ``resume()`` are relayed to the worker.
+        Cancelling waits (up to ``cancel_timeout_s``) until the worker has
+        closed the file.
+        """
+        w = self._pick()
+        job_id = next(self._job_ids) % 0xFFFFFFFF + 1
+        future = asyncio.get_running_loop().create_future()
+        job = w.jobs[job_id] = _Job(future, progress, offset)
+        w.transfers += 1
+        paused = False
+        try:
+            w.send(OP_START, job_id, pickle.dumps({"media": media, "offset": offset, "path": path}))
+            while not future.done():
+                await asyncio.wait({future}, timeout=self.poll_s)
+                if progress.paused != paused and w.ready:
+                    paused = progress.paused
+                    w.send(OP_PAUSE if paused else OP_RESUME, job_id)
+            return future.result()
+        except asyncio.CancelledError:
+            if not future.done() and w.ready:
+                try:
+                    job.cancel_sent = True
+                    w.send(OP_CANCEL, job_id)
+                    await asyncio.wait_for(asyncio.shield(future), self.cancel_timeout_s)
+                except Exception:
+                    pass
+            raise
+        finally:
+            w.jobs.pop(job_id, None)
+
+    async def set_proxy(self, proxy: Any) -> None:
+        """Reconnect the workers through ``proxy`` (call with no transfers running).
+
+        Returns once every worker has acknowledged the reconnect, so jobs
+        started afterwards never meet a client that is still reconnecting.
+        Workers that fail or do not answer within ``proxy_timeout_s`` are
+        taken out of rotation; workers already out of it (but still running)
+        get another try.
+        """
+        payload = pickle.dumps(proxy)
+
+        async def one(w: _WorkerProcess) -> None:
+            try:
+                await w.set_proxy(payload, self.proxy_timeout_s)
+            except Exception as e:
+                w.ready = False
+                logger.error(
+                    "Download worker %s failed to reconnect, out of rotation until the next proxy switch: %s",
+                    w.name,
+                    e if str(e) else type(e).__name__,
+                )
+            else:
+                w.ready = True
+
+        await asyncio.gather(*(one(w) for w in self.workers if w.connected))
+
+    async def stop(self) -> None:
+        for w in self.workers:
+            if w.connected:
+                try:
+                    w.send(OP_STOP)
+                except Exception:
+                    pass
+            w.ready = False
+        # 退出前继续读取：进行中任务的 EV_CANCELLED / EV_DONE 以及退出（_on_exit）照常处理
+        for w in self.workers:
+            if w.process.pid is None:
+                continue
+            await asyncio.to_thread(w.process.join, 5.0)
+            if w.process.is_alive():
+                w.process.terminate()
+        for w in self.workers:
+            w.fail_pending(RemoteDownloadError("WorkerStopped", f"download worker {w.name} stopped"))
+            w.close()
+        self.workers.clear()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": w.name, "ready": w.ready, "active": len(w.jobs), "transfers": w.transfers}
+            for w in self.workers
+        ]
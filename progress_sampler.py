@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Low-overhead progress tracking for concurrent downloads.
+
+Telethon calls ``progress_callback`` for every chunk. Doing clock reads, rate
+math, pause handling and UI refreshes in there costs CPU proportional to the
+chunk rate, for every concurrent transfer.
+
+This module splits the work in two:
+
+- :class:`TransferProgress` is the per-chunk part. It is a *plain* (non-async)
+  callable, so Telethon does not even create a coroutine per chunk; a call is a
+  single attribute store plus a flag check. Only while paused does it return an
+  awaitable, which Telethon awaits (blocking the transfer at a chunk boundary).
+- :class:`ProgressSampler` is one periodic task shared by all transfers. Every
+  ``interval_s`` it reads each registered counter and hands the value to the
+  owner's ``on_sample`` hook (speed estimation, stall detection, state), then
+  runs an optional ``on_tick`` hook once (UI refresh).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+SampleCallback = Callable[[int, float], None]
+TickCallback = Callable[[], None]
+
+
+class TransferProgress:
+    """Byte counter for one transfer; usable directly as Telethon's progress_callback.
+
+    Parameters
+    ----------
+    base:
+        Bytes already present before this session (resume offset).
+    """
+
+    __slots__ = ("base", "current", "paused", "_holds", "_resumed")
+
+    def __init__(self, base: int = 0):
+        self.base = int(base)
+        self.current = 0
+        self.paused = False
+        self._holds: Set[str] = set()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+
+    def __call__(self, current: int, total: int) -> Optional[Awaitable[bool]]:
+        self.current = current
+        if self.paused:
+            return self._resumed.wait()
+        return None
+
+    @property
+    def downloaded(self) -> int:
+        return self.base + self.current
+
+    def add(self, n: int) -> None:
+        """Counter increment for transfers driven chunk by chunk (iter_download)."""
+        self.current += n
+
+    def pause(self, reason: str = "user") -> None:
+        """Hold the transfer at the next chunk; holders (user, scheduler) pause independently."""
+        self._holds.add(reason)
+        self.paused = True
+        self._resumed.clear()
+
+    def resume(self, reason: str = "user") -> None:
+        """Release one hold; the transfer continues once no holds remain."""
+        self._holds.discard(reason)
+        if not self._holds:
+            self.paused = False
+            self._resumed.set()
+
+    async def wait_resumed(self) -> None:
+        await self._resumed.wait()
+
+
+class ProgressSampler:
+    """Periodically sample all registered transfers from a single task.
+
+    Parameters
+    ----------
+    interval_s:
+        Sampling period in seconds.
+    on_tick:
+        Optional callback run once per sampling round after all transfers were
+        sampled (e.g. schedule dashboard refreshes).
+    """
+
+    def __init__(self, *, interval_s: float = 0.5, on_tick: Optional[TickCallback] = None):
+        self.interval_s = max(0.05, float(interval_s))
+        self.on_tick: Optional[TickCallback] = on_tick
+        self._entries: Dict[Hashable, Tuple[TransferProgress, SampleCallback]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def register(self, key: Hashable, progress: TransferProgress, on_sample: SampleCallback) -> None:
+        self._entries[key] = (progress, on_sample)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unregister(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def sample_now(self) -> None:
+        """Run one sampling round immediately."""
+        now = time.monotonic()
+        for key, (progress, on_sample) in list(self._entries.items()):
+            try:
+                on_sample(progress.downloaded, now)
+            except Exception:
+                logger.exception("进度采样回调失败：key=%s", key)
+        if self.on_tick is not None:
+            try:
+                self.on_tick()
+            except Exception:
+                logger.exception("进度采样 tick 回调失败")
+
+    async def _run(self) -> None:
+        try:
+            while self._entries:
+                await asyncio.sleep(self.interval_s)
+                self.sample_now()
+        except asyncio.CancelledError:
+            return
+        finally:
+            if self._task is asyncio.current_task():
+                self._task = None
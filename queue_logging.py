@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Queue-based logging so the event loop never does log I/O.
+
+With handlers attached directly to the root logger, every ``logger.info`` on
+the event loop formats the record, writes to stdout and to
+``teleflux.log`` (possibly on a NAS mount) and checks for rotation,
+synchronously. Here the root logger gets a single :class:`BoundedQueueHandler`
+instead. It only puts the record on a bounded queue, and a
+``logging.handlers.QueueListener`` thread feeds the real handlers.
+
+If the queue is full (the disk stalls), records are dropped instead of
+blocking the loop. They are counted, and a warning with the number of lost
+records is logged once the queue has room again. :meth:`QueueLogging.stop`
+drains the queue and flushes the handlers at shutdown.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Sequence
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full."""
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+        self._unreported = 0
+        self._lock_drop = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._unreported:
+            with self._lock_drop:
+                lost, self._unreported = self._unreported, 0
+            if lost:
+                notice = logging.LogRecord(
+                    __name__, logging.WARNING, __file__, 0,
+                    "日志队列已满，丢弃了 %s 条日志", (lost,), None,
+                )
+                try:
+                    self.queue.put_nowait(notice)
+                except queue.Full:
+                    with self._lock_drop:
+                        self._unreported += lost
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_drop:
+                self.dropped += 1
+                self._unreported += 1
+
+
+class _DrainingListener(QueueListener):
+    """QueueListener whose stop sentinel waits for room in a full queue.
+
+    The stock ``enqueue_sentinel`` uses ``put_nowait`` and raises
+    ``queue.Full`` at shutdown exactly when the disk stalled. The listener
+    thread keeps draining, so a blocking ``put`` always gets through.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class QueueLogging:
+    """Root logger → bounded queue → listener thread → real handlers.
+
+    Parameters
+    ----------
+    handlers:
+        The handlers that do the actual I/O (stream, rotating file, ...).
+    queue_size:
+        Maximum number of records waiting for the listener.
+    level:
+        Root logger level.
+    """
+
+    def __init__(
+        self,
+        handlers: Sequence[logging.Handler],
+        *,
+        queue_size: int = 10000,
+        level: int = logging.INFO,
+    ):
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.handler = BoundedQueueHandler(self.queue)
+        self.handlers = list(handlers)
+        self.listener = _DrainingListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.level = level
+        self._started = False
+
+    def start(self, root: Optional[logging.Logger] = None) -> "QueueLogging":
+        root = root or logging.getLogger()
+        root.setLevel(self.level)
+        root.addHandler(self.handler)
+        self.listener.start()
+        self._started = True
+        atexit.register(self.stop)
+        return self
+
+    def stop(self) -> None:
+        """Drain queued records and flush the handlers (idempotent)."""
+        if not self._started:
+            return
+        self._started = False
+        logging.getLogger().removeHandler(self.handler)
+        # Nothing new is queued once the handler is gone; stop() waits for the
+        # thread to write out what is left, even when the queue is full
+        self.listener.stop()
+        for h in self.handlers:
+            try:
+                h.flush()
+            except Exception:
+                pass
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "dropped": self.handler.dropped,
+        }
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Smoothed transfer-rate estimation.
+
+Computing speed from the last two progress callbacks makes the displayed
+speed/ETA jump wildly (Telethon delivers chunks in bursts). The estimator here
+keeps a fixed-size ring buffer of (timestamp, cumulative bytes) samples and
+provides two views of the same data:
+
+- an EWMA of the instantaneous rate (responsive, used for the speed column);
+- a windowed average over the whole ring (stable, used for the ETA).
+
+The same structure is reused for aggregates: :class:`RateTracker` feeds every
+per-task byte delta into a per-chat and a global estimator, so chat-level and
+global throughput come for free and are consistent with the task rows.
+
+Nothing here formats strings; rendering code asks for a rate when (and only
+when) it actually draws something.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Dict, Optional
+
+
+class RateEstimator:
+    """Rate estimator over a ring buffer of cumulative byte samples.
+
+    Parameters
+    ----------
+    size:
+        Number of slots in the ring buffer.
+    sample_interval_s:
+        Minimum spacing between committed samples. Updates arriving faster than
+        this only move the pending counter, so per-chunk calls are cheap and
+        the window always spans roughly ``size * sample_interval_s`` seconds.
+    tau_s:
+        Time constant of the EWMA (seconds).
+    stale_after_s:
+        If no bytes arrived for this long, the rate is reported as 0.
+    """
+
+    __slots__ = (
+        "_ts",
+        "_bytes",
+        "_head",
+        "_count",
+        "_size",
+        "sample_interval_s",
+        "tau_s",
+        "stale_after_s",
+        "_ewma",
+        "_pending_bytes",
+        "_last_change_ts",
+    )
+
+    def __init__(
+        self,
+        size: int = 16,
+        *,
+        sample_interval_s: float = 0.5,
+        tau_s: float = 4.0,
+        stale_after_s: float = 10.0,
+    ):
+        self._size = max(2, int(size))
+        self._ts = [0.0] * self._size
+        self._bytes = [0] * self._size
+        self._head = -1
+        self._count = 0
+        self.sample_interval_s = float(sample_interval_s)
+        self.tau_s = max(1e-3, float(tau_s))
+        self.stale_after_s = float(stale_after_s)
+        self._ewma = 0.0
+        self._pending_bytes = 0
+        self._last_change_ts = 0.0
+
+    # ----- feeding -----
+
+    def reset(self, total_bytes: int = 0, now: Optional[float] = None) -> None:
+        """Start over with ``total_bytes`` as the baseline (e.g. resume offset)."""
+        now = time.monotonic() if now is None else now
+        self._head = 0
+        self._count = 1
+        self._ts[0] = now
+        self._bytes[0] = int(total_bytes)
+        self._ewma = 0.0
+        self._pending_bytes = int(total_bytes)
+        self._last_change_ts = now
+
+    def update(self, total_bytes: int, now: Optional[float] = None) -> None:
+        """Record the cumulative byte counter."""
+        now = time.monotonic() if now is None else now
+        if self._count == 0:
+            self.reset(total_bytes, now)
+            return
+        total_bytes = int(total_bytes)
+        if total_bytes != self._pending_bytes:
+            if now - self._last_change_ts >= self.stale_after_s:
+                # Resuming after an idle gap: re-baseline so the gap does not
+                # drag the average down for the whole window.
+                self.reset(self._pending_bytes, now)
+            self._last_change_ts = now
+        self._pending_bytes = total_bytes
+
+        last_ts = self._ts[self._head]
+        dt = now - last_ts
+        if dt < self.sample_interval_s:
+            return
+
+        inst = (total_bytes - self._bytes[self._head]) / dt
+        if inst < 0:
+            inst = 0.0
+        # Time-aware smoothing: irregular sample spacing gets the right weight.
+        alpha = 1.0 - math.exp(-dt / self.tau_s)
+        if self._count == 1 and self._ewma == 0.0:
+            self._ewma = inst
+        else:
+            self._ewma += alpha * (inst - self._ewma)
+
+        self._head = (self._head + 1) % self._size
+        self._ts[self._head] = now
+        self._bytes[self._head] = total_bytes
+        if self._count < self._size:
+            self._count += 1
+
+    def add(self, delta_bytes: int, now: Optional[float] = None) -> None:
+        """Record ``delta_bytes`` on top of the current counter."""
+        base = self._pending_bytes if self._count else 0
+        self.update(base + int(delta_bytes), now)
+
+    # ----- reading -----
+
+    @property
+    def total(self) -> int:
+        return self._pending_bytes
+
+    def _is_stale(self, now: float) -> bool:
+        return self._count == 0 or (now - self._last_change_ts) >= self.stale_after_s
+
+    def ewma(self, now: Optional[float] = None) -> float:
+        """Smoothed instantaneous rate in bytes/s."""
+        now = time.monotonic() if now is None else now
+        if self._is_stale(now):
+            return 0.0
+        return self._ewma
+
+    def window_rate(self, now: Optional[float] = None) -> float:
+        """Average rate over the whole ring buffer in bytes/s."""
+        now = time.monotonic() if now is None else now
+        if self._is_stale(now) or self._count < 2:
+            return 0.0
+        oldest = (self._head - self._count + 1) % self._size
+        span = self._ts[self._head] - self._ts[oldest]
+        if span <= 0:
+            return 0.0
+        return max(0.0, (self._bytes[self._head] - self._bytes[oldest]) / span)
+
+    def eta_s(self, remaining_bytes: int, now: Optional[float] = None) -> Optional[float]:
+        """Seconds to transfer ``remaining_bytes`` (None if the rate is unknown)."""
+        rate = self.window_rate(now) or self.ewma(now)
+        if rate <= 0:
+            return None
+        return max(0, int(remaining_bytes)) / rate
+
+
+class RateTracker:
+    """Per-task estimators plus chat-level and global aggregates."""
+
+    def __init__(self, *, size: int = 16, sample_interval_s: float = 0.5, tau_s: float = 4.0):
+        self._size = size
+        self._sample_interval_s = sample_interval_s
+        self._tau_s = tau_s
+        self._tasks: Dict[int, RateEstimator] = {}
+        self._task_chat: Dict[int, int] = {}
+        self._chats: Dict[int, RateEstimator] = {}
+        self.global_rate = self._new()
+
+    def _new(self) -> RateEstimator:
+        est = RateEstimator(
+            self._size, sample_interval_s=self._sample_interval_s, tau_s=self._tau_s
+        )
+        est.reset(0)
+        return est
+
+    def start(self, task_id: int, chat_id: int, baseline_bytes: int = 0) -> RateEstimator:
+        """Register a task; ``baseline_bytes`` (resume offset) is not counted as throughput."""
+        est = self._new()
+        est.reset(baseline_bytes)
+        self._tasks[task_id] = est
+        self._task_chat[task_id] = chat_id
+        if chat_id not in self._chats:
+            self._chats[chat_id] = self._new()
+        return est
+
+    def update(self, task_id: int, total_bytes: int, now: Optional[float] = None) -> None:
+        est = self._tasks.get(task_id)
+        if est is None:
+            return
+        now = time.monotonic() if now is None else now
+        delta = int(total_bytes) - est.total
+        est.update(total_bytes, now)
+        if delta > 0:
+            chat = self._chats.get(self._task_chat.get(task_id))
+            if chat is not None:
+                chat.add(delta, now)
+            self.global_rate.add(delta, now)
+
+    def task(self, task_id: int) -> Optional[RateEstimator]:
+        return self._tasks.get(task_id)
+
+    def chat(self, chat_id: int) -> Optional[RateEstimator]:
+        return self._chats.get(chat_id)
+
+    def chat_rate(self, chat_id: int, now: Optional[float] = None) -> float:
+        est = self._chats.get(chat_id)
+        return est.ewma(now) if est is not None else 0.0
+
+    def finish(self, task_id: int) -> None:
+        self._tasks.pop(task_id, None)
+        self._task_chat.pop(task_id, None)
+
+    def forget_chat(self, chat_id: int) -> None:
+        """Drop the chat aggregate once the chat has no tasks left."""
+        if chat_id not in self._task_chat.values():
+            self._chats.pop(chat_id, None)
+
+
+def format_speed(bps: float) -> str:
+    if bps <= 0:
+        return "-"
+    mb = bps / (1024 * 1024)
+    return f"{mb:.2f} MB/s" if mb >= 1 else f"{(bps / 1024):.1f} KB/s"
+
+
+def format_eta(eta_s: Optional[float]) -> str:
+    if eta_s is None:
+        return "-"
+    if eta_s < 60:
+        return f"{int(eta_s)}秒"
+    if eta_s < 3600:
+        return f"{int(eta_s / 60)}分{int(eta_s % 60)}秒"
+    h = int(eta_s / 3600)
+    m = int((eta_s % 3600) / 60)
+    return f"{h}时{m}分"
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""Extra Telegram sessions that carry downloads for the bot.
+
+Telegram throttles transfers per session, so a single ``TelegramClient``
+caps total throughput no matter how many downloads run at once. A
+:class:`SessionPool` holds additional logged-in clients (workers); the bot's
+own client keeps handling updates and dashboard edits while downloads are
+spread over the workers.
+
+Two kinds of worker:
+
+- another session of the bot's own token (its own session file): the same
+  account, so media from incoming messages can be downloaded as-is;
+- a different bot token: another account, so the message is re-fetched
+  through that session first. Message ids are per account except in
+  channels and supergroups, so these workers are only used for messages
+  from channels/supergroups that bot can also see, and the re-fetched
+  document must match (id and size). Otherwise another worker (or the
+  caller's own client) downloads it.
+
+Scheduling: the worker with the fewest running transfers wins, with a bonus
+(``affinity_weight`` transfers) for workers that are downloading from, or
+recently downloaded from, the file's DC, or whose home DC it is. Telethon
+keeps an exported authorization and connection per DC for a while, so the
+first file from a DC on a fresh session pays an extra handshake.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from telethon.tl.types import PeerChannel
+
+logger = logging.getLogger(__name__)
+
+
+def shares_message_ids(message: Any) -> bool:
+    """True for channel/supergroup messages, whose ids are the same for every account."""
+    peer = getattr(message, "peer_id", None)
+    if peer is not None:
+        return isinstance(peer, PeerChannel)
+    # 无 peer_id 时按 Telethon 的标记 id 判断（频道/超级群组为 -100xxxxxxxxxx）
+    chat_id = getattr(message, "chat_id", None) or 0
+    return chat_id <= -1000000000000
+
+
+class DownloadWorker:
+    """One extra session.
+
+    Parameters
+    ----------
+    name:
+        Label for logs and ``/status``.
+    client:
+        A ``TelegramClient`` (not started yet).
+    bot_token:
+        Token to log in with.
+    same_account:
+        ``True`` when ``bot_token`` is the bot's own token (media can be
+        used without re-fetching the message).
+    """
+
+    def __init__(self, name: str, client: Any, *, bot_token: str, same_account: bool = True):
+        self.name = name
+        self.client = client
+        self.bot_token = bot_token
+        self.same_account = same_account
+        self.ready = False
+        self.active = 0
+        self.transfers = 0
+        self.failures = 0
+        # dc_id -> 最近一次使用时间（monotonic）/ 正在进行的传输数
+        self._dc_last: Dict[int, float] = {}
+        self._dc_active: Dict[int, int] = {}
+
+    @property
+    def home_dc(self) -> Optional[int]:
+        return getattr(getattr(self.client, "session", None), "dc_id", None)
+
+    def has_affinity(self, dc_id: Optional[int], now: float, ttl_s: float) -> bool:
+        if dc_id is None:
+            return False
+        if dc_id == self.home_dc or self._dc_active.get(dc_id, 0) > 0:
+            return True
+        last = self._dc_last.get(dc_id)
+        return last is not None and now - last < ttl_s
+
+    async def resolve(self, message: Any) -> Optional[Any]:
+        """Media of ``message`` as this session sees it, or None if it cannot access it."""
+        if self.same_account:
+            return getattr(message, "media", None)
+        if not shares_message_ids(message):
+            return None
+        try:
+            own = await self.client.get_messages(message.chat_id, ids=message.id)
+        except Exception as e:
+            logger.warning("Worker %s cannot fetch message %s/%s: %s", self.name, message.chat_id, message.id, e)
+            return None
+        media = getattr(own, "media", None)
+        doc = getattr(getattr(message, "media", None), "document", None)
+        own_doc = getattr(media, "document", None)
+        if (
+            doc is None
+            or own_doc is None
+            or getattr(own_doc, "id", None) != getattr(doc, "id", None)
+            or getattr(own_doc, "size", None) != getattr(doc, "size", None)
+        ):
+            logger.warning(
+                "Worker %s sees a different file for message %s/%s; not using it", self.name, message.chat_id, message.id
+            )
+            return None
+        return media
+
+    def _begin(self, dc_id: Optional[int]) -> None:
+        self.active += 1
+        if dc_id is not None:
+            self._dc_active[dc_id] = self._dc_active.get(dc_id, 0) + 1
+            self._dc_last[dc_id] = time.monotonic()
+
+    def _end(self, dc_id: Optional[int], ok: bool) -> None:
+        self.active = max(0, self.active - 1)
+        self.transfers += 1
+        if not ok:
+            self.failures += 1
+        if dc_id is not None:
+            n = self._dc_active.get(dc_id, 0) - 1
+            if n > 0:
+                self._dc_active[dc_id] = n
+            else:
+                self._dc_active.pop(dc_id, None)
+            self._dc_last[dc_id] = time.monotonic()
+
+
+class _Lease:
+    """``async with pool.lease(message, dc_id) as lease``: ``lease.worker`` / ``lease.media``.
+
+    ``worker`` is None when no worker is ready or the chosen one cannot access
+    the message; the caller then uses its own client and ``message.media``.
+    """
+
+    __slots__ = ("pool", "message", "dc_id", "worker", "media")
+
+    def __init__(self, pool: "SessionPool", message: Any, dc_id: Optional[int]):
+        self.pool = pool
+        self.message = message
+        self.dc_id = dc_id
+        self.worker: Optional[DownloadWorker] = None
+        self.media: Any = None
+
+    async def __aenter__(self) -> "_Lease":
+        worker = self.pool.pick(self.dc_id, foreign_ok=shares_message_ids(self.message))
+        if worker is not None:
+            # 先计入负载，避免并发获取时都选中同一个会话
+            worker._begin(self.dc_id)
+            try:
+                media = await worker.resolve(self.message)
+            except BaseException:
+                worker._end(self.dc_id, ok=False)
+                raise
+            if media is None:
+                worker._end(self.dc_id, ok=False)
+            else:
+                self.worker, self.media = worker, media
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self.worker is not None:
+            self.worker._end(self.dc_id, ok=exc_type is None)
+
+
+class SessionPool:
+    """Download workers plus the load / DC-affinity scheduler.
+
+    Parameters
+    ----------
+    affinity_ttl_s:
+        How long a worker counts as "connected" to a DC after its last
+        transfer from it.
+    affinity_weight:
+        Extra load a worker with DC affinity may carry and still be chosen.
+    """
+
+    def __init__(self, *, affinity_ttl_s: float = 300.0, affinity_weight: float = 1.0):
+        self.affinity_ttl_s = float(affinity_ttl_s)
+        self.affinity_weight = float(affinity_weight)
+        self.workers: List[DownloadWorker] = []
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    def add(self, worker: DownloadWorker) -> None:
+        self.workers.append(worker)
+
+    def ready_workers(self) -> List[DownloadWorker]:
+        return [w for w in self.workers if w.ready]
+
+    def pick(self, dc_id: Optional[int] = None, *, foreign_ok: bool = True) -> Optional[DownloadWorker]:
+        """Least loaded ready worker (DC affinity counts as ``affinity_weight`` less load).
+
+        ``foreign_ok=False`` leaves out workers of other bot tokens.
+        """
+        ready = [w for w in self.ready_workers() if foreign_ok or w.same_account]
+        if not ready:
+            return None
+        now = time.monotonic()
+
+        def key(w: DownloadWorker):
+            affine = w.has_affinity(dc_id, now, self.affinity_ttl_s)
+            return (w.active - (self.affinity_weight if affine else 0.0), not affine, w.active, w.transfers)
+
+        return min(ready, key=key)
+
+    def lease(self, message: Any, dc_id: Optional[int] = None) -> _Lease:
+        return _Lease(self, message, dc_id)
+
+    # ----- lifecycle -----
+
+    async def _start_one(self, w: DownloadWorker) -> None:
+        try:
+            await w.client.start(bot_token=w.bot_token)
+            w.ready = True
+            logger.info("Download session %s ready (home DC %s)", w.name, w.home_dc)
+        except Exception as e:
+            w.ready = False
+            logger.error(
+                "Download session %s failed to start, out of rotation until the next proxy switch or restart: %s",
+                w.name,
+                e,
+            )
+
+    async def start(self) -> None:
+        """Log all workers in concurrently; failed ones are left out of scheduling."""
+        await asyncio.gather(*(self._start_one(w) for w in self.workers))
+
+    async def stop(self) -> None:
+        await asyncio.gather(
+            *(w.client.disconnect() for w in self.workers if w.ready), return_exceptions=True
+        )
+        for w in self.workers:
+            w.ready = False
+
+    async def set_proxy(self, proxy: Any) -> None:
+        """Reconnect every worker through ``proxy`` (call with no transfers running).
+
+        Workers that fail to reconnect, and those that were already out of
+        rotation, get one full start; if that fails too they stay out.
+        """
+
+        async def one(w: DownloadWorker) -> None:
+            w.client.set_proxy(proxy)
+            if w.ready:
+                try:
+                    await w.client.disconnect()
+                    await w.client.connect()
+                    return
+                except Exception as e:
+                    w.ready = False
+                    logger.warning("Download session %s failed to reconnect, retrying: %s", w.name, e)
+            await self._start_one(w)
+
+        await asyncio.gather(*(one(w) for w in self.workers))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": w.name,
+                "ready": w.ready,
+                "active": w.active,
+                "transfers": w.transfers,
+                "failures": w.failures,
+            }
+            for w in self.workers
+        ]
@@ -12,14 +12,26 @@ concurrency-safe way to:
 
 The cleanup callback is typically used to clear the "recent status" area on the
 dashboard and/or to remove terminal task rows after a short grace period.
+
+Everything runs on the single asyncio loop, so no lock is needed: each method
+mutates plain dicts without awaiting in between. The debounce is a
+``loop.call_later`` handle per idle chat (no sleeping task per chat); only when
+the delay actually expires is a task created to run the async callback. A
+handle costs a heap entry, so thousands of chats are cheap.
+
+The manager also keeps per-chat rolling statistics (queue wait, transfer time,
+bytes, completions, failures) in log-bucketed histograms, so ``snapshot()`` can
+tell "Telegram is slow" (transfer time) apart from "our queue is backed up"
+(queue wait).
 """
 
 from __future__ import annotations
 
 import asyncio
 import logging
-from collections import defaultdict
-from typing import Awaitable, Callable, DefaultDict, Dict, Optional
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Union
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +39,128 @@ logger = logging.getLogger(__name__)
 RefreshCallback = Callable[[int, bool], Awaitable[None]]
 
 
+class RollingHistogram:
+    """Log-bucketed histogram over a rolling time window.
+
+    The window is split into ``slots`` sub-windows that are recycled as time
+    passes; each sub-window stores only the buckets that were hit. Memory is
+    bounded by ``slots * buckets`` regardless of the sample count. Bucket
+    boundaries grow by ``ratio`` (default 1.25 → percentiles within ~12%).
+    """
+
+    __slots__ = ("window_s", "slots", "_slot_s", "_ratio_log", "_min", "_buckets", "_epochs")
+
+    def __init__(self, *, window_s: float = 3600.0, slots: int = 6, ratio: float = 1.25, min_value: float = 1e-3):
+        self.window_s = float(window_s)
+        self.slots = max(1, int(slots))
+        self._slot_s = self.window_s / self.slots
+        self._ratio_log = math.log(ratio)
+        self._min = float(min_value)
+        self._buckets: List[Dict[int, int]] = [{} for _ in range(self.slots)]
+        self._epochs: List[int] = [-1] * self.slots
+
+    def _slot(self, now: float) -> Dict[int, int]:
+        epoch = int(now // self._slot_s)
+        i = epoch % self.slots
+        if self._epochs[i] != epoch:
+            self._epochs[i] = epoch
+            self._buckets[i] = {}
+        return self._buckets[i]
+
+    def add(self, value: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        v = max(float(value), self._min)
+        b = int(math.log(v / self._min) / self._ratio_log)
+        slot = self._slot(now)
+        slot[b] = slot.get(b, 0) + 1
+
+    def _merged(self, now: float) -> Dict[int, int]:
+        oldest = int(now // self._slot_s) - self.slots + 1
+        out: Dict[int, int] = {}
+        for epoch, buckets in zip(self._epochs, self._buckets):
+            if epoch < oldest:
+                continue
+            for b, c in buckets.items():
+                out[b] = out.get(b, 0) + c
+        return out
+
+    def count(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        return sum(self._merged(now).values())
+
+    def percentiles(self, qs=(0.5, 0.95, 0.99), now: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """Approximate percentiles (bucket midpoints); None when empty."""
+        now = time.monotonic() if now is None else now
+        merged = self._merged(now)
+        total = sum(merged.values())
+        out: Dict[str, Optional[float]] = {}
+        keys = sorted(merged)
+        for q in qs:
+            name = f"p{int(round(q * 100))}"
+            if total == 0:
+                out[name] = None
+                continue
+            rank = q * total
+            seen = 0
+            for b in keys:
+                seen += merged[b]
+                if seen >= rank:
+                    # Geometric midpoint of the bucket.
+                    out[name] = self._min * math.exp((b + 0.5) * self._ratio_log)
+                    break
+        out["count"] = total
+        return out
+
+
+class RollingCounter:
+    """Sum over the same rolling window layout as :class:`RollingHistogram`."""
+
+    __slots__ = ("_slot_s", "slots", "_values", "_epochs")
+
+    def __init__(self, *, window_s: float = 3600.0, slots: int = 6):
+        self.slots = max(1, int(slots))
+        self._slot_s = float(window_s) / self.slots
+        self._values: List[float] = [0] * self.slots
+        self._epochs: List[int] = [-1] * self.slots
+
+    def add(self, value: float = 1, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        epoch = int(now // self._slot_s)
+        i = epoch % self.slots
+        if self._epochs[i] != epoch:
+            self._epochs[i] = epoch
+            self._values[i] = 0
+        self._values[i] += value
+
+    def total(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        oldest = int(now // self._slot_s) - self.slots + 1
+        return sum(v for e, v in zip(self._epochs, self._values) if e >= oldest)
+
+
+class ChatStats:
+    """Rolling per-chat throughput/latency statistics."""
+
+    __slots__ = ("queue_wait", "transfer", "bytes", "completed", "failed", "last_ts")
+
+    def __init__(self, *, window_s: float = 3600.0, slots: int = 6):
+        self.queue_wait = RollingHistogram(window_s=window_s, slots=slots)
+        self.transfer = RollingHistogram(window_s=window_s, slots=slots)
+        self.bytes = RollingCounter(window_s=window_s, slots=slots)
+        self.completed = RollingCounter(window_s=window_s, slots=slots)
+        self.failed = RollingCounter(window_s=window_s, slots=slots)
+        self.last_ts = 0.0
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "queue_wait_s": self.queue_wait.percentiles(now=now),
+            "transfer_s": self.transfer.percentiles(now=now),
+            "bytes": int(self.bytes.total(now)),
+            "completed": int(self.completed.total(now)),
+            "failed": int(self.failed.total(now)),
+        }
+
+
 class TaskManager:
     """Track active tasks per chat and run a delayed cleanup when idle.
 
@@ -40,40 +174,82 @@ class TaskManager:
         - is_cleanup=True: indicates this is the delayed cleanup operation.
     cleanup_delay_s:
         Seconds to wait after the chat becomes idle before performing cleanup.
+    stats_window_s:
+        Length of the rolling window used for per-chat statistics.
     """
 
-    def __init__(self, refresh_ui: Optional[RefreshCallback] = None, *, cleanup_delay_s: float = 5.0):
-        self._lock = asyncio.Lock()
-        self._active: DefaultDict[int, int] = defaultdict(int)
-        self._cleanup_tasks: Dict[int, asyncio.Task] = {}
+    def __init__(
+        self,
+        refresh_ui: Optional[RefreshCallback] = None,
+        *,
+        cleanup_delay_s: float = 5.0,
+        stats_window_s: float = 3600.0,
+    ):
+        # Only chats with at least one active task are kept.
+        self._active: Dict[int, int] = {}
+        # Pending cleanup per chat: a TimerHandle during the delay window, then
+        # the Task running refresh_ui. Both are cancelled by new work.
+        self._cleanup: Dict[int, Union[asyncio.TimerHandle, asyncio.Task]] = {}
 
         self.refresh_ui: Optional[RefreshCallback] = refresh_ui
         self.cleanup_delay_s = float(cleanup_delay_s)
 
+        self.stats_window_s = float(stats_window_s)
+        self._stats: Dict[int, ChatStats] = {}
+        self._stats_total = ChatStats(window_s=self.stats_window_s)
+
     async def snapshot(self) -> dict:
-        """Get a snapshot of current task counts for status reporting."""
-        async with self._lock:
-            active = dict(self._active)
-            pending_cleanup = sorted(
-                [cid for cid, t in self._cleanup_tasks.items() if t and not t.done()]
-            )
+        """Get a snapshot of current task counts and rolling statistics for status reporting.
 
+        ``stats`` maps chat_id -> {queue_wait_s, transfer_s (p50/p95/p99/count),
+        bytes, completed, failed}; ``stats_total`` aggregates all chats.
+        """
+        now = time.monotonic()
+        # Chats without samples in the window are dropped to keep memory bounded.
+        for cid in [c for c, st in self._stats.items() if now - st.last_ts > self.stats_window_s]:
+            self._stats.pop(cid, None)
         return {
-            "active": active,
-            "pending_cleanup": pending_cleanup,
+            "active": dict(self._active),
+            "pending_cleanup": sorted(self._cleanup),
             "cleanup_delay_s": self.cleanup_delay_s,
+            "stats": {cid: st.to_dict(now) for cid, st in self._stats.items()},
+            "stats_total": self._stats_total.to_dict(now),
+            "stats_window_s": self.stats_window_s,
         }
 
+    def _chat_stats(self, chat_id: int, now: float) -> ChatStats:
+        st = self._stats.get(chat_id)
+        if st is None:
+            st = self._stats[chat_id] = ChatStats(window_s=self.stats_window_s)
+        st.last_ts = now
+        return st
+
+    def record_queue_wait(self, chat_id: int, wait_s: float) -> None:
+        """A task waited ``wait_s`` between being queued and getting a download slot."""
+        now = time.monotonic()
+        for st in (self._chat_stats(chat_id, now), self._stats_total):
+            st.queue_wait.add(wait_s, now)
+
+    def record_transfer(self, chat_id: int, transfer_s: float, nbytes: int, *, ok: bool) -> None:
+        """A transfer ended after ``transfer_s`` with ``nbytes`` received this session."""
+        now = time.monotonic()
+        for st in (self._chat_stats(chat_id, now), self._stats_total):
+            st.bytes.add(max(0, int(nbytes)), now)
+            if ok:
+                st.transfer.add(transfer_s, now)
+                st.completed.add(1, now)
+            else:
+                st.failed.add(1, now)
+
     async def task_started(self, chat_id: int) -> None:
         """Must be called before/when a task is scheduled for a chat."""
-        async with self._lock:
-            self._active[chat_id] += 1
-            cur = self._active[chat_id]
-            # New work arrived: cancel any pending cleanup.
-            t = self._cleanup_tasks.pop(chat_id, None)
-            if t and not t.done():
-                t.cancel()
-            logger.info("任务开始：chat_id=%s，进行中=%s", chat_id, cur)
+        cur = self._active.get(chat_id, 0) + 1
+        self._active[chat_id] = cur
+        # New work arrived: cancel any pending cleanup.
+        pending = self._cleanup.pop(chat_id, None)
+        if pending is not None:
+            pending.cancel()
+        logger.info("任务开始：chat_id=%s，进行中=%s", chat_id, cur)
 
     async def task_finished(self, chat_id: int) -> int:
         """Must be called when a task reaches a terminal state.
@@ -83,46 +259,55 @@ class TaskManager:
         int
             Remaining active task count for this chat.
         """
-        async with self._lock:
-            self._active[chat_id] -= 1
-            if self._active[chat_id] < 0:
-                self._active[chat_id] = 0
-            remaining = self._active[chat_id]
-            logger.info("任务结束：chat_id=%s，剩余=%s", chat_id, remaining)
-
-            # Schedule delayed cleanup only when chat becomes idle.
-            if remaining == 0:
-                # Replace any pending task (shouldn't exist if counts are correct).
-                old = self._cleanup_tasks.pop(chat_id, None)
-                if old and not old.done():
-                    old.cancel()
-                self._cleanup_tasks[chat_id] = asyncio.create_task(self._delayed_cleanup(chat_id))
-
-            return remaining
-
-    async def _delayed_cleanup(self, chat_id: int) -> None:
+        remaining = max(self._active.get(chat_id, 0) - 1, 0)
+        if remaining:
+            self._active[chat_id] = remaining
+        else:
+            self._active.pop(chat_id, None)
+        logger.info("任务结束：chat_id=%s，剩余=%s", chat_id, remaining)
+
+        # Schedule delayed cleanup only when chat becomes idle.
+        if remaining == 0:
+            # Replace any pending cleanup (shouldn't exist if counts are correct).
+            old = self._cleanup.pop(chat_id, None)
+            if old is not None:
+                old.cancel()
+            loop = asyncio.get_running_loop()
+            self._cleanup[chat_id] = loop.call_later(
+                self.cleanup_delay_s, self._cleanup_due, chat_id
+            )
+
+        return remaining
+
+    def _cleanup_due(self, chat_id: int) -> None:
+        self._cleanup.pop(chat_id, None)
+
+        # Double-check: only cleanup if still idle.
+        if self._active.get(chat_id, 0) != 0:
+            logger.info(
+                "清理已跳过：延迟期内有新任务加入。chat_id=%s，当前进行中=%s",
+                chat_id,
+                self._active.get(chat_id, 0),
+            )
+            return
+
+        logger.info("空闲超过 %ss，执行自动清理：chat_id=%s", self.cleanup_delay_s, chat_id)
+        if self.refresh_ui is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._run_cleanup(chat_id))
+        self._cleanup[chat_id] = task
+        task.add_done_callback(lambda t, cid=chat_id: self._cleanup_done(cid, t))
+
+    async def _run_cleanup(self, chat_id: int) -> None:
         try:
-            await asyncio.sleep(self.cleanup_delay_s)
-
-            async with self._lock:
-                # Double-check: only cleanup if still idle.
-                if self._active.get(chat_id, 0) != 0:
-                    logger.info(
-                        "清理已跳过：延迟期内有新任务加入。chat_id=%s，当前进行中=%s",
-                        chat_id,
-                        self._active.get(chat_id, 0),
-                    )
-                    return
-
-            logger.info("空闲超过 %ss，执行自动清理：chat_id=%s", self.cleanup_delay_s, chat_id)
-            if self.refresh_ui is not None:
-                await self.refresh_ui(chat_id, True)
+            await self.refresh_ui(chat_id, True)
         except asyncio.CancelledError:
-            # Expected when new tasks arrive during the debounce window.
+            # Expected when new tasks arrive while the cleanup is running.
             return
-        finally:
-            # Remove bookkeeping entry if it still points to this task.
-            cur = asyncio.current_task()
-            async with self._lock:
-                if self._cleanup_tasks.get(chat_id) is cur:
-                    self._cleanup_tasks.pop(chat_id, None)
+        except Exception as e:
+            logger.warning("自动清理失败：chat_id=%s，原因=%s", chat_id, e)
+
+    def _cleanup_done(self, chat_id: int, task: asyncio.Task) -> None:
+        # Remove bookkeeping entry if it still points to this task.
+        if self._cleanup.get(chat_id) is task:
+            self._cleanup.pop(chat_id, None)
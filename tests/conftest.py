@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""Make the top-level modules (bot helpers live next to bot.py) importable from tests."""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
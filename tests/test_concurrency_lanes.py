@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from concurrency_lanes import LaneLimiter
+
+
+async def _start(limiter, lane, chat_id=None):
+    """Acquire in a task; returns (task, started event, release event)."""
+    started, done = asyncio.Event(), asyncio.Event()
+
+    async def job():
+        async with limiter.slot(lane, chat_id):
+            started.set()
+            await done.wait()
+
+    task = asyncio.create_task(job())
+    await asyncio.sleep(0)
+    return task, started, done
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_busy_lane_borrows_only_unneeded_capacity():
+    async def run():
+        limiter = LaneLimiter(3)  # audio 3, video 2, other 2
+        jobs = [await _start(limiter, "video") for _ in range(3)]
+        await _settle()
+        # 视频通道已满 2 个，第三个借用空闲的音频容量
+        assert [s.is_set() for _, s, _ in jobs] == [True, True, True]
+        assert limiter.lanes()["video"].borrowed == 1
+
+        jobs[2][2].set()
+        await _settle()
+        audio = await _start(limiter, "audio")
+        await _settle()
+        assert audio[1].is_set()
+        # 有音频在运行时，新的视频不能再借用
+        extra = await _start(limiter, "video")
+        await _settle()
+        assert not extra[1].is_set()
+
+        await limiter.configure(lending=False)
+        audio[2].set()
+        await _settle()
+        # 关闭借用后，视频通道不超过自身上限
+        assert not extra[1].is_set()
+        for task, _, done in jobs + [audio, extra]:
+            done.set()
+            task.cancel()
+        await asyncio.gather(*(t for t, _, _ in jobs + [audio, extra]), return_exceptions=True)
+
+    asyncio.run(run())
+
+
+def test_lane_below_its_limit_goes_before_borrowers():
+    async def run():
+        limiter = LaneLimiter(3)
+        videos = [await _start(limiter, "video") for _ in range(2)]
+        audio_holder = await _start(limiter, "audio")
+        await _settle()
+        # 满员后：一个视频和一个音频在等待
+        video_wait = await _start(limiter, "video")
+        audio_wait = await _start(limiter, "audio")
+        await _settle()
+        assert not video_wait[1].is_set() and not audio_wait[1].is_set()
+        audio_holder[2].set()
+        await _settle()
+        assert audio_wait[1].is_set() and not video_wait[1].is_set()
+        for task, _, done in videos + [audio_holder, video_wait, audio_wait]:
+            done.set()
+            task.cancel()
+
+    asyncio.run(run())
+
+
+def test_waiter_blocked_by_its_chat_cap_does_not_block_lending():
+    async def run():
+        limiter = LaneLimiter(4, {"video": 2}, chat_limits={1: 1})
+        audio = await _start(limiter, "audio", chat_id=1)
+        videos = [await _start(limiter, "video", chat_id=2) for _ in range(2)]
+        await _settle()
+        # 聊天 1 已达上限：它的第二个音频只受聊天上限限制
+        capped = await _start(limiter, "audio", chat_id=1)
+        borrower = await _start(limiter, "video", chat_id=2)
+        await _settle()
+        assert not capped[1].is_set()
+        assert borrower[1].is_set()
+        assert limiter.get_running() == 4
+
+        # 放宽聊天上限后，该等待者需要容量，借用就此停止
+        borrower[2].set()
+        await _settle()
+        await limiter.configure(chat_limits={1: 2})
+        await _settle()
+        assert capped[1].is_set()
+        for task, _, done in [audio, capped, borrower] + videos:
+            done.set()
+            task.cancel()
+
+    asyncio.run(run())
+
+
+def test_configure_reevaluates_waiters():
+    async def run():
+        limiter = LaneLimiter(1, lending=False)
+        first = await _start(limiter, "audio", chat_id=7)
+        second = await _start(limiter, "audio", chat_id=7)
+        await _settle()
+        assert first[1].is_set() and not second[1].is_set()
+
+        # 与 bot 一样随全局上限一并传入通道上限（留空 = 按新的全局上限取默认值）
+        await limiter.configure(global_limit=2, lane_limits={}, per_chat_limit=1)
+        await _settle()
+        # 全局上限已放宽，但聊天上限仍只允许一个
+        assert not second[1].is_set()
+        await limiter.configure(chat_limits={7: 0})
+        await _settle()
+        assert second[1].is_set()
+        assert limiter.chat_running(7) == 2
+        for task, _, done in (first, second):
+            done.set()
+        await asyncio.gather(first[0], second[0])
+        assert limiter.get_running() == 0 and limiter.chat_running(7) == 0
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import job_leases
+from job_leases import LeaseDirectory
+
+
+def _claim(d, key, name):
+    return d.claim(key, final_path=f"/lib/{name}", temp_path=f"/lib/{name}.downloading", size=100)
+
+
+def test_second_local_job_waits_instead_of_sharing_the_lease(tmp_path):
+    a = LeaseDirectory(str(tmp_path), "hostA")
+    first = _claim(a, "doc1", "x.mkv")
+    assert first.owner == "hostA" and first.final_path == "/lib/x.mkv"
+    # 同一实例的第二个任务（例如确认“加序号”后）不能复用第一个任务的租约与文件
+    assert _claim(a, "doc1", "x_1.mkv") is None
+    a.complete("doc1")
+    second = _claim(a, "doc1", "x_1.mkv")
+    assert second.owner == "hostA"
+    assert second.final_path == "/lib/x_1.mkv"
+    assert second.state == "active"
+
+
+def test_lease_left_from_before_restart_is_reused(tmp_path):
+    before = LeaseDirectory(str(tmp_path), "hostA")
+    _claim(before, "doc1", "x.mkv")
+    before.renew("doc1", offset=40)
+    after = LeaseDirectory(str(tmp_path), "hostA")
+    lease = _claim(after, "doc1", "other-name.mkv")
+    assert lease.owner == "hostA"
+    assert lease.final_path == "/lib/x.mkv" and lease.offset == 40
+
+
+def test_other_instance_waits_then_takes_over_expired_lease(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_leases.time, "time", lambda: now[0])
+    a = LeaseDirectory(str(tmp_path), "hostA", ttl_s=10)
+    b = LeaseDirectory(str(tmp_path), "hostB", ttl_s=10)
+    _claim(a, "doc1", "x.mkv")
+    a.renew("doc1", offset=30)
+    held = _claim(b, "doc1", "x.mkv")
+    assert held.owner == "hostA" and held.offset == 30
+    now[0] += 11
+    taken = _claim(b, "doc1", "y.mkv")
+    assert taken.owner == "hostB" and taken.previous_owner == "hostA"
+    assert taken.final_path == "/lib/x.mkv" and taken.offset == 30
+    # 原持有者续约失败，不再视为持有
+    assert not a.renew("doc1", offset=50)
+    assert not a.holds("doc1")
+
+
+def test_done_lease_is_reported_to_other_instances(tmp_path):
+    a = LeaseDirectory(str(tmp_path), "hostA")
+    b = LeaseDirectory(str(tmp_path), "hostB")
+    _claim(a, "doc1", "x.mkv")
+    a.complete("doc1")
+    lease = _claim(b, "doc1", "x.mkv")
+    assert lease.owner == "hostA" and lease.state == "done"
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from log_tail import LogTailer
+
+
+def test_resubscribe_keeps_the_new_poll_task(tmp_path):
+    path = tmp_path / "teleflux.log"
+    path.write_text("a\nb\n", encoding="utf-8")
+
+    async def run():
+        tailer = LogTailer(str(path), interval_s=0.2)
+        tailer.subscribe()
+        await asyncio.sleep(0.05)
+        tailer.unsubscribe()
+        # 旧任务的 finally 尚未执行时再次订阅
+        tailer.subscribe()
+        new_task = tailer._task
+        await asyncio.sleep(0.3)
+        assert tailer._task is new_task and not new_task.done()
+        seen = tailer.version
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("c\n")
+        await tailer.wait_change(seen, timeout=2.0)
+        tailer.unsubscribe()
+        return tailer
+
+    tailer = asyncio.run(run())
+    assert list(tailer.lines)[-1] == "c"
+    assert tailer._task is None
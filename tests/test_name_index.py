@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+
+from name_index import DirectoryNameIndex
+
+
+def test_partial_file_from_this_session_is_indexed_after_release(tmp_path):
+    async def run():
+        index = DirectoryNameIndex(str(tmp_path), check_interval_s=0)
+        await index.ensure_fresh()
+        assert index.reserve("a.mkv")
+        (tmp_path / "a.mkv.downloading").write_bytes(b"x" * 10)
+        # 下载失败：保留 .downloading，释放预留
+        index.release("a.mkv", committed=False)
+        await index.ensure_fresh()
+        return index
+
+    index = asyncio.run(run())
+    assert index.on_disk("a.mkv.downloading")
+    assert not index.exists("a.mkv")
+
+
+def test_external_change_after_release_is_picked_up(tmp_path):
+    async def run():
+        index = DirectoryNameIndex(str(tmp_path), check_interval_s=0)
+        await index.ensure_fresh()
+        assert index.reserve("a.flac")
+        (tmp_path / "a.flac").write_bytes(b"x")
+        (tmp_path / "other.flac").write_bytes(b"y")  # 同一时间段内的外部写入
+        index.release("a.flac", committed=True)
+        await index.ensure_fresh()
+        return index
+
+    index = asyncio.run(run())
+    assert index.on_disk("a.flac")
+    assert index.on_disk("other.flac")
+
+
+def test_committed_release_drops_partial_name(tmp_path):
+    async def run():
+        (tmp_path / "b.mkv.downloading").write_bytes(b"x")
+        index = DirectoryNameIndex(str(tmp_path), check_interval_s=60)
+        await index.ensure_fresh()
+        assert index.on_disk("b.mkv.downloading")
+        assert index.reserve("b.mkv")
+        os.rename(tmp_path / "b.mkv.downloading", tmp_path / "b.mkv")
+        index.release("b.mkv", committed=True)
+        return index
+
+    index = asyncio.run(run())
+    assert index.on_disk("b.mkv")
+    assert not index.on_disk("b.mkv.downloading")
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from naming_rules import NamingRules
+
+
+def test_overlapping_markers_are_each_counted():
+    rules = NamingRules()
+    # 歌曲/曲名 重叠，网易云音乐/音乐id 重叠：与逐个 in 检查的结果一致
+    assert rules.marker_hits("歌曲名: 晴天") == 2
+    assert rules.marker_hits("网易云音乐id: 123") == 2
+    assert rules.looks_like_music("歌曲名: 晴天")
+    assert not rules.looks_like_music("专辑")
+
+
+def test_marker_prefix_at_same_position_is_counted():
+    rules = NamingRules(music_markers=["音乐", "音乐id"], audio_tags=[])
+    assert rules.marker_hits("音乐ID: 1") == 2
+    assert rules.marker_hits("音乐") == 1
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from dataclasses import replace
+
+import pytest
+
+from fake_telegram import FakeNetwork, FakeTelegramClient, install_network
+from process_workers import ProcessWorkerPool, RemoteDownloadError
+from progress_sampler import TransferProgress
+
+
+def _pool(network, **kwargs):
+    pool = ProcessWorkerPool(1, start_timeout_s=30, **kwargs)
+    pool.initializer = install_network
+    pool.initargs = (replace(network, messages={}),)
+    return pool
+
+
+async def _start(pool):
+    await pool.start(session_prefix="test-worker-", bot_token="1:test", client_factory=FakeTelegramClient)
+    assert pool.available()
+
+
+def _media(network, size):
+    FakeTelegramClient.network = network
+    return FakeTelegramClient("bot").make_file(1, "x.flac", size, kind="audio").media
+
+
+def test_set_proxy_waits_for_the_worker_to_reconnect():
+    network = FakeNetwork(connect_latency_s=0.3)
+
+    async def run():
+        pool = _pool(network)
+        await _start(pool)
+        try:
+            t0 = time.monotonic()
+            await pool.set_proxy(("socks5", "127.0.0.1", 1080))
+            assert time.monotonic() - t0 >= 0.3 and pool.available()
+            # 未在时限内确认的工作进程退出轮换，下一次切换时再试
+            pool.proxy_timeout_s = 0.05
+            await pool.set_proxy(None)
+            assert not pool.available()
+            pool.proxy_timeout_s = 10
+            await pool.set_proxy(None)
+            assert pool.available()
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_jobs_stopped_by_the_worker_fail(tmp_path):
+    network = FakeNetwork(bandwidth_bps=1 << 20)
+    media = _media(network, 32 << 20)
+
+    async def run():
+        pool = _pool(network)
+        await _start(pool)
+        progress = TransferProgress()
+        task = asyncio.create_task(pool.download(media, 0, str(tmp_path / "x.downloading"), progress))
+        await asyncio.sleep(0.5)
+        await pool.stop()
+        with pytest.raises(RemoteDownloadError):
+            await asyncio.wait_for(task, 5)
+
+    asyncio.run(run())
+
+
+def test_cancelled_job_waits_for_the_worker_and_is_not_a_success(tmp_path):
+    network = FakeNetwork(bandwidth_bps=1 << 20)
+    media = _media(network, 32 << 20)
+    path = tmp_path / "x.downloading"
+
+    async def run():
+        pool = _pool(network)
+        await _start(pool)
+        try:
+            task = asyncio.create_task(pool.download(media, 0, str(path), TransferProgress()))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # 工作进程已关闭文件：部分文件留作续传
+            assert 0 < path.stat().st_size < 32 << 20
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+
+from metrics import MetricsRegistry
+from queue_logging import QueueLogging
+
+
+class _SlowHandler(logging.Handler):
+    """Blocks until released, like a file handler on a stalled disk."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.unblock = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.entered.set()
+        self.unblock.wait(5)
+        self.records.append(record.getMessage())
+
+
+def test_stop_with_full_queue_writes_everything_queued():
+    handler = _SlowHandler()
+    ql = QueueLogging([handler], queue_size=4)
+    root = logging.getLogger("test_queue_logging")
+    root.propagate = False
+    ql.start(root)
+    try:
+        root.warning("record 0")
+        # 监听线程卡在第一条记录上，其余记录填满队列
+        assert handler.entered.wait(5)
+        for i in range(1, 20):
+            root.warning("record %s", i)
+        assert ql.queue.full() and ql.dropped > 0
+        threading.Timer(0.2, handler.unblock.set).start()
+        ql.stop()
+    finally:
+        root.removeHandler(ql.handler)
+    assert ql.queue.empty()
+    assert len(handler.records) + ql.dropped == 20
+
+
+def test_dropped_records_are_exported_as_a_counter():
+    total = [0]
+    registry = MetricsRegistry()
+    registry.counter("teleflux_log_dropped_records_total", "Dropped.", function=lambda: total[0])
+    total[0] = 7
+    out = registry.render()
+    assert "# TYPE teleflux_log_dropped_records_total counter" in out
+    assert "teleflux_log_dropped_records_total 7" in out
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from fake_telegram import FakeNetwork, FakeTelegramClient
+from session_pool import DownloadWorker, SessionPool
+
+CHANNEL = -1001234567890
+
+
+def _pool(net):
+    main = FakeTelegramClient("main")
+    main.net = net
+    main._messages = net.messages
+    pool = SessionPool()
+    foreign = DownloadWorker("other", FakeTelegramClient("other"), bot_token="2:y", same_account=False)
+    foreign.client.net = net
+    foreign.client._messages = net.messages
+    pool.add(foreign)
+    return main, pool, foreign
+
+
+def test_foreign_worker_only_for_channel_messages():
+    async def run():
+        net = FakeNetwork()
+        main, pool, foreign = _pool(net)
+        await pool.start()
+        private = main.make_file(5, "a.flac", 10)
+        main._store(private)
+        async with pool.lease(private, 4) as lease:
+            assert lease.worker is None
+        channel = main.make_file(CHANNEL, "b.flac", 10)
+        main._store(channel)
+        async with pool.lease(channel, 4) as lease:
+            assert lease.worker is foreign
+            assert lease.media.document.id == channel.media.document.id
+
+    asyncio.run(run())
+
+
+def test_foreign_worker_rejects_a_different_file():
+    async def run():
+        net = FakeNetwork()
+        main, pool, foreign = _pool(net)
+        await pool.start()
+        msg = main.make_file(CHANNEL, "b.flac", 10)
+        other = main.make_file(CHANNEL, "c.flac", 20)
+
+        async def get_messages(chat_id, ids=None, **kwargs):
+            return other  # 该账号在同一编号下看到的是另一条消息
+
+        foreign.client.get_messages = get_messages
+        async with pool.lease(msg, 4) as lease:
+            assert lease.worker is None
+        assert foreign.active == 0 and foreign.failures == 1
+
+    asyncio.run(run())
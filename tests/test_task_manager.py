@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from task_manager import TaskManager
+
+DELAY = 0.05
+
+
+def _manager(calls, *, hold_s=0.0):
+    async def refresh(chat_id, is_cleanup):
+        calls.append(("start", chat_id, is_cleanup))
+        await asyncio.sleep(hold_s)
+        calls.append(("end", chat_id))
+
+    return TaskManager(refresh, cleanup_delay_s=DELAY)
+
+
+def test_idle_chat_is_cleaned_up_once_and_forgotten():
+    calls = []
+
+    async def run():
+        tm = _manager(calls)
+        await tm.task_started(1)
+        await tm.task_finished(1)
+        assert (await tm.snapshot())["pending_cleanup"] == [1]
+        await asyncio.sleep(DELAY * 3)
+        return await tm.snapshot()
+
+    snap = asyncio.run(run())
+    assert calls == [("start", 1, True), ("end", 1)]
+    assert snap["active"] == {} and snap["pending_cleanup"] == []
+
+
+def test_new_task_during_delay_cancels_cleanup():
+    calls = []
+
+    async def run():
+        tm = _manager(calls)
+        await tm.task_started(1)
+        await tm.task_finished(1)
+        await asyncio.sleep(DELAY / 3)
+        await tm.task_started(1)
+        await asyncio.sleep(DELAY * 3)
+        during = await tm.snapshot()
+        # 再次空闲后重新计时，清理照常执行一次
+        await tm.task_finished(1)
+        await asyncio.sleep(DELAY * 3)
+        return during, await tm.snapshot()
+
+    during, after = asyncio.run(run())
+    assert during["active"] == {1: 1} and during["pending_cleanup"] == []
+    assert calls == [("start", 1, True), ("end", 1)]
+    assert after["active"] == {} and after["pending_cleanup"] == []
+
+
+def test_new_task_while_cleanup_runs_cancels_it():
+    calls = []
+
+    async def run():
+        tm = _manager(calls, hold_s=DELAY * 4)
+        await tm.task_started(2)
+        await tm.task_finished(2)
+        await asyncio.sleep(DELAY * 2)
+        assert calls == [("start", 2, True)]
+        await tm.task_started(2)
+        await asyncio.sleep(DELAY * 5)
+        return await tm.snapshot()
+
+    snap = asyncio.run(run())
+    assert calls == [("start", 2, True)]
+    assert snap["active"] == {2: 1} and snap["pending_cleanup"] == []
+
+
+def test_many_chats_leave_no_state_behind():
+    calls = []
+
+    async def run():
+        tm = _manager(calls)
+        for cid in range(200):
+            await tm.task_started(cid)
+        for cid in range(200):
+            await tm.task_finished(cid)
+        # 一半聊天在延迟期内又开始新任务，随后结束
+        for cid in range(0, 200, 2):
+            await tm.task_started(cid)
+            await tm.task_finished(cid)
+        # 多余的结束调用不会让计数变成负数
+        assert await tm.task_finished(0) == 0
+        await asyncio.sleep(DELAY * 4)
+        return tm
+
+    tm = asyncio.run(run())
+    assert sorted(call[1] for call in calls if call[0] == "start") == list(range(200))
+    assert tm._active == {} and tm._cleanup == {}
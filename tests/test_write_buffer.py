@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import random
+
+from progress_sampler import TransferProgress
+from write_buffer import BufferPool, open_for_resume
+
+
+def _telethon_loop(f, chunks, progress):
+    # Telethon's _download_file: write, then progress_callback(f.tell(), size), then flush
+    for chunk in chunks:
+        f.write(chunk)
+        progress(f.tell(), None)
+    f.flush()
+
+
+def test_tell_counts_buffered_bytes(tmp_path):
+    path = tmp_path / "a.downloading"
+    chunks = [bytes([i]) * 131072 for i in range(10)]
+    progress = TransferProgress(0)
+    with open_for_resume(str(path), 0, BufferPool(512 * 1024, 1)) as f:
+        _telethon_loop(f, chunks, progress)
+        assert progress.downloaded == 10 * 131072
+    assert path.read_bytes() == b"".join(chunks)
+
+
+def test_tell_without_pool_buffer(tmp_path):
+    path = tmp_path / "a.downloading"
+    path.write_bytes(b"x" * 100)
+    pool = BufferPool(256 * 1024, 1)
+    held = pool.acquire()
+    with open_for_resume(str(path), 100, pool) as f:
+        f.write(b"y" * 50)
+        assert f.tell() == 150
+    pool.release(held)
+    assert path.read_bytes() == b"x" * 100 + b"y" * 50
+
+
+def test_random_chunks_and_resume_offsets(tmp_path):
+    rng = random.Random(7)
+    pool = BufferPool(256 * 1024, 2)
+    for trial in range(40):
+        data = rng.randbytes(rng.randint(0, 1_500_000))
+        off = rng.randint(0, len(data))
+        path = tmp_path / f"{trial}.downloading"
+        path.write_bytes(data[:off])
+        with open_for_resume(str(path), off, pool, flush_when=lambda: rng.random() < 0.05) as f:
+            pos = off
+            while pos < len(data):
+                n = rng.choice([1, 1000, 131072, 524288, 700000])
+                f.write(data[pos : pos + n])
+                pos += n
+                assert f.tell() == min(pos, len(data))
+        assert path.read_bytes() == data
+    assert pool.stats()["in_use"] == 0
+
+
+def test_flush_on_pause(tmp_path):
+    path = tmp_path / "a.downloading"
+    progress = TransferProgress(0)
+    with open_for_resume(str(path), 0, BufferPool(4 << 20, 1), flush_when=lambda: progress.paused) as f:
+        f.write(b"a" * 1000)
+        assert path.stat().st_size == 0
+        progress.pause()
+        f.write(b"b" * 1000)
+        assert path.stat().st_size == 2000
+
+
+def test_fake_client_download_media_uses_tell(tmp_path):
+    from fake_telegram import FakeTelegramClient
+
+    async def run():
+        client = FakeTelegramClient("t")
+        msg = client.make_file(1, "a.bin", 3 * 1024 * 1024 + 5)
+        path = tmp_path / "a.downloading"
+        progress = TransferProgress(0)
+        with open_for_resume(str(path), 0, BufferPool(1 << 20, 1)) as f:
+            await client.download_media(msg.media, file=f, progress_callback=progress)
+        return path.stat().st_size, progress.downloaded
+
+    size, downloaded = asyncio.run(run())
+    assert size == downloaded == 3 * 1024 * 1024 + 5
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Write coalescing for ``.downloading`` files.
+
+Telethon hands over chunks of 128-512 KB. Writing each one straight to the
+file costs a ``write()`` syscall per chunk, and on a NAS mount (SMB/NFS)
+each of those is a network round trip. :class:`CoalescingWriter` copies
+chunks into a large buffer and writes it out in one call once it is full.
+
+- Writes are aligned: the first block is shortened so that every later
+  block starts at a multiple of the buffer size in the file, even when
+  resuming from an arbitrary offset.
+- Buffers come from a :class:`BufferPool`. They are allocated on first use
+  and then reused, so there is no allocation per chunk or per transfer.
+  Memory is capped at ``max_buffers * buffer_size``. A writer that finds
+  the pool exhausted writes chunk by chunk (the previous behaviour).
+- Data is copied via ``memoryview`` slices. A chunk that covers a whole
+  aligned block while the buffer is empty is written directly, without
+  a copy.
+- ``flush()`` / ``close()`` write out what is buffered, so the file size
+  equals the bytes received once the file is closed (cancel, completion)
+  and resume offsets stay exact. ``flush_when`` lets the caller also flush
+  at a pause, so the file is complete while the transfer is held.
+
+Writers are used from one thread (an event loop) and are not thread-safe.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BufferPool:
+    """Reusable ``bytearray`` buffers of ``buffer_size`` bytes.
+
+    Parameters
+    ----------
+    buffer_size:
+        Size of each buffer, which is also the write size and alignment.
+    max_buffers:
+        Upper bound of buffers ever allocated (0 = unbounded).
+    """
+
+    def __init__(self, buffer_size: int, max_buffers: int = 0):
+        self.buffer_size = max(64 * 1024, int(buffer_size))
+        self.max_buffers = max(0, int(max_buffers))
+        self._free: List[bytearray] = []
+        self.allocated = 0
+        # 池已用尽、只能逐块直写的次数
+        self.misses = 0
+
+    def acquire(self) -> Optional[bytearray]:
+        if self._free:
+            return self._free.pop()
+        if self.max_buffers and self.allocated >= self.max_buffers:
+            self.misses += 1
+            return None
+        self.allocated += 1
+        return bytearray(self.buffer_size)
+
+    def release(self, buf: bytearray) -> None:
+        self._free.append(buf)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffer_size": self.buffer_size,
+            "allocated": self.allocated,
+            "in_use": self.allocated - len(self._free),
+            "misses": self.misses,
+        }
+
+
+def _write_all(raw: Any, data: memoryview) -> None:
+    # 非缓冲文件的 write 可能只写入一部分
+    while data:
+        n = raw.write(data)
+        data = data[n:]
+
+
+class CoalescingWriter:
+    """File-like object over an unbuffered file (``open(..., buffering=0)``).
+
+    Parameters
+    ----------
+    raw:
+        The file; closed by :meth:`close`.
+    pool:
+        Buffer source; None writes every chunk directly.
+    offset:
+        File position of the first byte written (resume offset), used for
+        alignment.
+    flush_when:
+        Checked after every ``write()``; when it returns True the buffer is
+        flushed (e.g. ``lambda: progress.paused``).
+    """
+
+    def __init__(
+        self,
+        raw: Any,
+        pool: Optional[BufferPool],
+        *,
+        offset: int = 0,
+        flush_when: Optional[Callable[[], bool]] = None,
+    ):
+        self.raw = raw
+        self.pool = pool
+        self.flush_when = flush_when
+        self._buf = pool.acquire() if pool is not None else None
+        self._view = memoryview(self._buf) if self._buf is not None else None
+        self._offset = int(offset)
+        self._n = 0
+        # write() 系统调用次数（基准测试用）
+        self.syscalls = 0
+
+    def _limit(self) -> int:
+        size = len(self._view)
+        return size - (self._offset % size)
+
+    def write(self, data) -> int:
+        src = memoryview(data).cast("B")
+        total = len(src)
+        view = self._view
+        if view is None:
+            _write_all(self.raw, src)
+            self.syscalls += 1
+            self._offset += total
+            return total
+        pos = 0
+        while pos < total:
+            limit = self._limit()
+            if self._n == 0 and total - pos >= limit:
+                # 整块对齐数据：直接写出，免去复制
+                _write_all(self.raw, src[pos : pos + limit])
+                self.syscalls += 1
+                self._offset += limit
+                pos += limit
+                continue
+            k = min(limit - self._n, total - pos)
+            view[self._n : self._n + k] = src[pos : pos + k]
+            self._n += k
+            pos += k
+            if self._n == limit:
+                self._drain()
+        if self._n and self.flush_when is not None and self.flush_when():
+            self._drain()
+        return total
+
+    def _drain(self) -> None:
+        if self._n:
+            _write_all(self.raw, self._view[: self._n])
+            self.syscalls += 1
+            self._offset += self._n
+            self._n = 0
+
+    def tell(self) -> int:
+        """Bytes written so far including buffered ones (Telethon reports progress with it)."""
+        return self._offset + self._n
+
+    def seekable(self) -> bool:
+        return False
+
+    def fileno(self) -> int:
+        return self.raw.fileno()
+
+    def flush(self) -> None:
+        if self._view is not None:
+            self._drain()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self._buf is not None:
+                self._view.release()
+                self.pool.release(self._buf)
+                self._buf = self._view = None
+            self.raw.close()
+
+    def __enter__(self) -> "CoalescingWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def open_for_resume(
+    path: str,
+    offset: int,
+    pool: Optional[BufferPool],
+    *,
+    flush_when: Optional[Callable[[], bool]] = None,
+) -> CoalescingWriter:
+    """Open ``path`` for writing from ``offset`` (append if > 0, else truncate)."""
+    raw = open(path, "ab" if offset > 0 else "wb", buffering=0)
+    return CoalescingWriter(raw, pool, offset=offset, flush_when=flush_when)